@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Profile, Vehicle, ServiceRecord, Service
+from .models import Profile, Vehicle, ServiceRecord, Service, ReportJob, RecordImport
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
@@ -19,9 +19,9 @@ class VehicleAdmin(admin.ModelAdmin):
 
 @admin.register(ServiceRecord)
 class ServiceRecordAdmin(admin.ModelAdmin):
-    list_display = ('vehicle', 'service_date', 'mechanic', 'odometer_reading', 'total_cost')
+    list_display = ('vehicle', 'service_date', 'service_type', 'mechanic', 'odometer_reading', 'total_cost')
     search_fields = ('vehicle__registration_number', 'mechanic__username', 'issues_reported')
-    list_filter = ('service_date',)
+    list_filter = ('service_date', 'service_type')
 
 
 @admin.register(Service)
@@ -54,3 +54,17 @@ class UserAdmin(BaseUserAdmin):
 
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'format', 'status', 'requested_by', 'rows_written', 'total_rows', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'format')
+    search_fields = ('requested_by__username',)
+
+
+@admin.register(RecordImport)
+class RecordImportAdmin(admin.ModelAdmin):
+    list_display = ('id', 'format', 'status', 'requested_by', 'rows_read', 'rows_inserted', 'rows_rejected', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'format')
+    search_fields = ('requested_by__username', 'file__name')
@@ -3,94 +3,219 @@ Analytics utilities for the vehicle service system.
 Provides data aggregation and analysis functions for dashboards and reports.
 """
 
-from django.db.models import Count, Q, Avg
-from django.db.models.functions import TruncMonth, ExtractYear
+from django.db.models import Count, Q, Sum, F, Case, When, Value, FloatField, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce, ExtractYear, TruncMonth
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime
 from collections import defaultdict
-import json
+
+from . import columnar, turnaround
 
 
 class ServiceAnalytics:
     """Analytics class for service data analysis."""
     
+    # Sort keys accepted by get_mechanic_performance (prefix with '-' for descending)
+    MECHANIC_SORT_FIELDS = {
+        'completion_rate': 'completion_rate',
+        'total_assigned': 'total_assigned',
+        'completed': 'completed',
+        'pending': 'pending',
+        'in_progress': 'in_progress',
+        'name': 'username',
+    }
+    
     @staticmethod
     def get_monthly_service_counts(months=12):
-        """Get service counts for the last N months."""
-        end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=months * 30)
-        
-        from .models import Service
-        
-        # Get services grouped by month using cross-database compatible TruncMonth
-        services = Service.objects.filter(
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date
-        ).annotate(
-            month=TruncMonth('created_at')
-        ).values('month').annotate(count=Count('id')).order_by('month')
+        """Get service counts for the last N calendar months, including the current one."""
+        from .timeseries import calendar, service_time_series
         
-        # Create a complete month range
-        monthly_data = {}
-        current = start_date.replace(day=1)
-        while current <= end_date:
-            month_key = current.strftime('%Y-%m')
-            monthly_data[month_key] = 0
-            current = (current + timedelta(days=32)).replace(day=1)
+        end_date = timezone.localdate()
+        ordinal = end_date.year * 12 + end_date.month - months
+        start_date = end_date.replace(year=ordinal // 12, month=ordinal % 12 + 1, day=1)
         
-        # Fill in actual data
-        for service in services:
-            # Handle both datetime and string format
-            if hasattr(service['month'], 'strftime'):
-                m_key = service['month'].strftime('%Y-%m')
-            else:
-                m_key = service['month']
-            
-            if m_key in monthly_data:
-                monthly_data[m_key] = service['count']
+        snapshot = columnar.get_snapshot()
+        if snapshot is not None:
+            buckets, stop = calendar(start_date, end_date, 'month')
+            boundaries = [
+                int(timezone.make_aware(datetime.combine(day, datetime.min.time())).timestamp())
+                for day in buckets + [stop]
+            ]
+            return {
+                day.strftime('%Y-%m'): count
+                for day, count in zip(buckets, snapshot.bucket_counts(boundaries))
+            }
         
-        return monthly_data
+        series = service_time_series(start_date, end_date, 'month')
+        return {
+            bucket[:7]: count
+            for bucket, count in zip(series['buckets'], series['series']['total'])
+        }
     
     @staticmethod
     def get_service_status_distribution():
         """Get distribution of service statuses."""
-        from .models import Service
+        snapshot = columnar.get_snapshot()
+        if snapshot is not None:
+            return snapshot.status_distribution()
         
-        status_counts = Service.objects.values('status').annotate(count=Count('id'))
-        return {item['status']: item['count'] for item in status_counts}
+        from .models import ServiceRollup
+        
+        status_counts = ServiceRollup.objects.values('status').annotate(
+            total=Sum('count')
+        ).filter(total__gt=0).order_by()
+        return {item['status']: item['total'] for item in status_counts}
     
     @staticmethod
     def get_service_type_distribution():
         """Get distribution of service types."""
-        from .models import Service
+        snapshot = columnar.get_snapshot()
+        if snapshot is not None:
+            return snapshot.service_type_distribution()
         
-        type_counts = Service.objects.values('service_type').annotate(count=Count('id'))
-        return {item['service_type']: item['count'] for item in type_counts}
+        from .models import ServiceRollup
+        
+        type_counts = ServiceRollup.objects.values('service_type').annotate(
+            total=Sum('count')
+        ).filter(total__gt=0).order_by()
+        return {item['service_type']: item['total'] for item in type_counts}
     
     @staticmethod
-    def get_mechanic_performance():
-        """Get performance metrics for mechanics."""
-        from .models import Service, Profile
-        
-        mechanics = Profile.objects.filter(role=Profile.ROLE_MECHANIC)
-        performance_data = []
-        
-        for mechanic in mechanics:
-            assigned_services = Service.objects.filter(assigned_mechanic=mechanic.user)
-            completed_services = assigned_services.filter(status=Service.STATUS_COMPLETED)
-            pending_services = assigned_services.filter(status=Service.STATUS_PENDING)
-            in_progress_services = assigned_services.filter(status=Service.STATUS_IN_PROGRESS)
-            
-            performance_data.append({
-                'mechanic_name': mechanic.user.get_full_name() or mechanic.user.username,
-                'total_assigned': assigned_services.count(),
-                'completed': completed_services.count(),
-                'pending': pending_services.count(),
-                'in_progress': in_progress_services.count(),
-                'completion_rate': (completed_services.count() / assigned_services.count() * 100) if assigned_services.count() > 0 else 0
-            })
-        
-        return performance_data
+    def _mechanic_stats(users):
+        """
+        Annotate a User queryset with per-mechanic job counts in one grouped query.
+        `this_month_completed` counts completions logged this month (ServiceStatusEvent).
+        Returns a values() queryset, one row per user.
+        """
+        from .models import Service, ServiceStatusEvent
+        
+        this_month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        completions = ServiceStatusEvent.objects.filter(
+            mechanic=OuterRef('pk'),
+            status=Service.STATUS_COMPLETED,
+            created_at__gte=this_month_start,
+        ).exclude(previous_status=Service.STATUS_COMPLETED).order_by().values('mechanic').annotate(
+            total=Count('service', distinct=True)
+        ).values('total')
+        
+        return users.values('id', 'username', 'first_name', 'last_name').annotate(
+            total_assigned=Count('assigned_services'),
+            completed=Count('assigned_services', filter=Q(assigned_services__status=Service.STATUS_COMPLETED)),
+            pending=Count('assigned_services', filter=Q(assigned_services__status=Service.STATUS_PENDING)),
+            in_progress=Count('assigned_services', filter=Q(assigned_services__status=Service.STATUS_IN_PROGRESS)),
+            this_month_completed=Coalesce(Subquery(completions), 0),
+        ).annotate(
+            completion_rate=Case(
+                When(total_assigned__gt=0, then=Cast('completed', FloatField()) * 100 / F('total_assigned')),
+                default=Value(0.0),
+                output_field=FloatField()
+            )
+        )
+    
+    @staticmethod
+    def _snapshot_mechanic_stats(snapshot, users, ordering):
+        """_mechanic_stats rows computed from the columnar snapshot, sorted like order_by(*ordering)."""
+        this_month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        stats = snapshot.mechanic_stats()
+        completions = turnaround.completions_since(this_month_start)
+        empty = dict.fromkeys(('total_assigned', 'completed', 'pending', 'in_progress'), 0)
+        
+        rows = []
+        for row in users.values('id', 'username', 'first_name', 'last_name'):
+            row.update(stats.get(row['id'], empty))
+            row['this_month_completed'] = completions.get(row['id'], 0)
+            row['completion_rate'] = (
+                float(row['completed']) * 100 / row['total_assigned'] if row['total_assigned'] else 0.0
+            )
+            rows.append(row)
+        
+        # Stable sorts from the last key to the first give the multi-key order
+        for key in reversed(ordering):
+            field = key.lstrip('-')
+            rows.sort(key=lambda row: row[field], reverse=key.startswith('-'))
+        return rows
+    
+    @staticmethod
+    def _format_mechanic_row(row):
+        full_name = f"{row['first_name']} {row['last_name']}".strip()
+        return {
+            'mechanic_id': row['id'],
+            'mechanic_name': full_name or row['username'],
+            'total_assigned': row['total_assigned'],
+            'completed': row['completed'],
+            'pending': row['pending'],
+            'in_progress': row['in_progress'],
+            'this_month_completed': row['this_month_completed'],
+            'completion_rate': row['completion_rate'] or 0
+        }
+    
+    @staticmethod
+    def get_mechanic_performance(order_by=('-completion_rate', '-total_assigned'), limit=None, offset=0):
+        """
+        Get performance metrics for all mechanics with a constant number of queries.
+        Sorting, top-N (`limit`) and `offset` pagination happen in the database.
+        """
+        from .models import Profile
+        from django.contrib.auth import get_user_model
+        
+        if isinstance(order_by, str):
+            order_by = [order_by]
+        ordering = []
+        for key in order_by:
+            descending = key.startswith('-')
+            field = ServiceAnalytics.MECHANIC_SORT_FIELDS.get(key.lstrip('-'))
+            if field:
+                ordering.append(f"-{field}" if descending else field)
+        ordering.append('id')
+        
+        mechanics = get_user_model().objects.filter(profile__role=Profile.ROLE_MECHANIC)
+        snapshot = columnar.get_snapshot()
+        if snapshot is not None:
+            rows = ServiceAnalytics._snapshot_mechanic_stats(snapshot, mechanics, ordering)
+        else:
+            rows = ServiceAnalytics._mechanic_stats(mechanics).order_by(*ordering)
+        
+        offset = max(offset or 0, 0)
+        if limit is not None:
+            rows = rows[offset:offset + max(limit, 0)]
+        elif offset:
+            rows = rows[offset:]
+        
+        return [ServiceAnalytics._format_mechanic_row(row) for row in rows]
+    
+    @staticmethod
+    def get_turnaround_summary(segment='all'):
+        """
+        Turnaround durations of one segment ('all', 'mechanic:<id>' or 'service_type:<type>'),
+        one entry per metric with its count and average/median/90th percentile hours.
+        """
+        from .models import TurnaroundStatistic
+        
+        stats = {stat.metric: stat for stat in TurnaroundStatistic.objects.filter(segment=segment)}
+        return [
+            dict(metric=metric, label=label, **turnaround.summarize(stats.get(metric)))
+            for metric, label in TurnaroundStatistic.METRIC_CHOICES
+        ]
+    
+    @staticmethod
+    def get_service_type_turnaround():
+        """Booking-to-completion durations per service type, slowest median first."""
+        from .models import Service, TurnaroundStatistic
+        
+        prefix = TurnaroundStatistic.service_type_segment('')
+        stats = TurnaroundStatistic.objects.filter(
+            metric=TurnaroundStatistic.METRIC_TIME_TO_COMPLETE, segment__startswith=prefix, count__gt=0
+        )
+        labels = dict(Service.SERVICE_TYPE_CHOICES)
+        rows = [
+            dict(
+                service_type=stat.segment[len(prefix):],
+                display_name=labels.get(stat.segment[len(prefix):], stat.segment[len(prefix):]),
+                **turnaround.summarize(stat)
+            )
+            for stat in stats
+        ]
+        return sorted(rows, key=lambda row: row['p50_hours'], reverse=True)
     
     @staticmethod
     def get_customer_service_history(user):
@@ -120,39 +245,46 @@ class ServiceAnalytics:
     
     @staticmethod
     def get_manager_insights():
-        """Get comprehensive insights for managers."""
-        from .models import Service, Profile
+        """Get comprehensive insights for managers (read from ServiceRollup)."""
+        from .models import Service, ServiceRollup
+        
+        status_distribution = ServiceAnalytics.get_service_status_distribution()
+        service_type_distribution = ServiceAnalytics.get_service_type_distribution()
         
         # Basic counts
-        total_services = Service.objects.count()
-        pending_services = Service.objects.filter(status=Service.STATUS_PENDING).count()
-        completed_services = Service.objects.filter(status=Service.STATUS_COMPLETED).count()
-        in_progress_services = Service.objects.filter(status=Service.STATUS_IN_PROGRESS).count()
+        total_services = sum(status_distribution.values())
+        pending_services = status_distribution.get(Service.STATUS_PENDING, 0)
+        completed_services = status_distribution.get(Service.STATUS_COMPLETED, 0)
+        in_progress_services = status_distribution.get(Service.STATUS_IN_PROGRESS, 0)
         
         # This month's data
-        now = timezone.now()
-        this_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        this_month_services = Service.objects.filter(created_at__gte=this_month_start).count()
-        
-        # Top service types
-        top_service_types = Service.objects.values('service_type').annotate(
-            count=Count('id')
-        ).order_by('-count')[:3]
+        this_month_start = timezone.localtime(timezone.now()).date().replace(day=1)
+        this_month_services = ServiceRollup.objects.filter(
+            month=this_month_start
+        ).aggregate(total=Sum('count'))['total'] or 0
         
-        # Format service type names for display
-        for service_type in top_service_types:
-            service_type['display_name'] = service_type['service_type'].replace('_', ' ').title()
+        # Top service types, formatted for display
+        top_service_types = [
+            {
+                'service_type': service_type,
+                'count': count,
+                'display_name': service_type.replace('_', ' ').title(),
+            }
+            for service_type, count in sorted(
+                service_type_distribution.items(), key=lambda item: item[1], reverse=True
+            )[:3]
+        ]
         
         # Busiest mechanics
-        busiest_mechanics = Service.objects.filter(
+        busiest_mechanics = ServiceRollup.objects.filter(
             assigned_mechanic__isnull=False
         ).values(
             'assigned_mechanic__first_name',
             'assigned_mechanic__last_name',
             'assigned_mechanic__username'
         ).annotate(
-            total_jobs=Count('id')
-        ).order_by('-total_jobs')[:3]
+            total_jobs=Sum('count')
+        ).filter(total_jobs__gt=0).order_by('-total_jobs')[:3]
         
         return {
             'total_services': total_services,
@@ -161,35 +293,36 @@ class ServiceAnalytics:
             'in_progress_services': in_progress_services,
             'this_month_services': this_month_services,
             'completion_rate': (completed_services / total_services * 100) if total_services > 0 else 0,
-            'top_service_types': list(top_service_types),
+            'top_service_types': top_service_types,
             'busiest_mechanics': list(busiest_mechanics),
             'monthly_data': ServiceAnalytics.get_monthly_service_counts(),
-            'status_distribution': ServiceAnalytics.get_service_status_distribution(),
-            'service_type_distribution': ServiceAnalytics.get_service_type_distribution()
+            'status_distribution': status_distribution,
+            'service_type_distribution': service_type_distribution,
+            'turnaround': ServiceAnalytics.get_turnaround_summary(),
+            'service_type_turnaround': ServiceAnalytics.get_service_type_turnaround(),
         }
     
     @staticmethod
     def get_mechanic_insights(mechanic_user):
         """Get insights for a specific mechanic."""
-        from .models import Service
+        from django.contrib.auth import get_user_model
+        from .models import TurnaroundStatistic
         
-        assigned_services = Service.objects.filter(assigned_mechanic=mechanic_user)
-        completed_services = assigned_services.filter(status=Service.STATUS_COMPLETED)
-        pending_services = assigned_services.filter(status=Service.STATUS_PENDING)
-        in_progress_services = assigned_services.filter(status=Service.STATUS_IN_PROGRESS)
-        
-        # This month's performance
-        now = timezone.now()
-        this_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        this_month_completed = completed_services.filter(created_at__gte=this_month_start).count()
+        row = ServiceAnalytics._mechanic_stats(
+            get_user_model().objects.filter(pk=mechanic_user.pk)
+        ).get()
+        stats = ServiceAnalytics._format_mechanic_row(row)
         
         return {
-            'total_assigned': assigned_services.count(),
-            'completed': completed_services.count(),
-            'pending': pending_services.count(),
-            'in_progress': in_progress_services.count(),
-            'this_month_completed': this_month_completed,
-            'completion_rate': (completed_services.count() / assigned_services.count() * 100) if assigned_services.count() > 0 else 0
+            'total_assigned': stats['total_assigned'],
+            'completed': stats['completed'],
+            'pending': stats['pending'],
+            'in_progress': stats['in_progress'],
+            'this_month_completed': stats['this_month_completed'],
+            'completion_rate': stats['completion_rate'],
+            'turnaround': ServiceAnalytics.get_turnaround_summary(
+                TurnaroundStatistic.mechanic_segment(mechanic_user.pk)
+            ),
         }
     
     @staticmethod
@@ -217,71 +350,230 @@ class ServiceAnalytics:
         }
 
 
+# Column headers shared by every report format
+REPORT_HEADERS = [
+    'ID', 'Customer', 'Service Type', 'Status', 'Assigned Mechanic', 
+    'Created Date'
+]
+
+
 class ReportGenerator:
     """Generate various types of reports."""
     
+    @staticmethod
+    def filter_services(status='all', start=None, end=None, limit=None):
+        """
+        Build the ordered services queryset for a report.
+        `start`/`end` are dates on the created date; `limit` caps the number of rows.
+        """
+        from .models import Service
+        
+        services = Service.objects.all()
+        if status and status != 'all':
+            services = services.filter(status=status)
+        if start:
+            services = services.filter(created_at__date__gte=start)
+        if end:
+            services = services.filter(created_at__date__lte=end)
+        services = services.order_by('id')
+        if limit is not None:
+            services = services[:max(limit, 0)]
+        return services
+    
+    @staticmethod
+    def iter_report_rows(services_queryset, chunk_size=2000):
+        """
+        Yield report rows from a projected, joined values_list.
+        Rows are fetched in fixed chunks so memory stays flat for any number of services.
+        """
+        from .models import Service
+        
+        service_types = dict(Service.SERVICE_TYPE_CHOICES)
+        statuses = dict(Service.STATUS_CHOICES)
+        
+        rows = services_queryset.values_list(
+            'id',
+            'customer__username', 'customer__first_name', 'customer__last_name',
+            'service_type', 'status',
+            'assigned_mechanic_id', 'assigned_mechanic__first_name', 'assigned_mechanic__last_name',
+            'created_at'
+        )
+        
+        for (service_id, username, first_name, last_name, service_type, status,
+             mechanic_id, mechanic_first, mechanic_last, created_at) in rows.iterator(chunk_size=chunk_size):
+            yield [
+                service_id,
+                f"{first_name} {last_name}".strip() or username,
+                service_types.get(service_type, service_type),
+                statuses.get(status, status),
+                f"{mechanic_first} {mechanic_last}".strip() if mechanic_id else 'Unassigned',
+                created_at.strftime('%Y-%m-%d %H:%M')
+            ]
+    
+    @staticmethod
+    def _with_progress(rows, progress, every):
+        """Pass rows through, calling progress(rows_so_far) every `every` rows and at the end."""
+        written = 0
+        for row in rows:
+            yield row
+            written += 1
+            if progress and written % every == 0:
+                progress(written)
+        if progress:
+            progress(written)
+    
+    @staticmethod
+    def write_csv_report(services_queryset, fileobj, chunk_size=2000, progress=None):
+        """Write a CSV report to a text file object. Returns the number of data rows."""
+        import csv
+        
+        writer = csv.writer(fileobj)
+        writer.writerow(REPORT_HEADERS)
+        written = 0
+        rows = ReportGenerator.iter_report_rows(services_queryset, chunk_size)
+        for row in ReportGenerator._with_progress(rows, progress, chunk_size):
+            writer.writerow(row)
+            written += 1
+        return written
+    
     @staticmethod
     def generate_csv_report(services_queryset, filename="services_report.csv"):
         """Generate CSV report from services queryset."""
-        import csv
         from django.http import HttpResponse
         
         response = HttpResponse(content_type='text/csv')
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        ReportGenerator.write_csv_report(services_queryset, response)
+        return response
+    
+    @staticmethod
+    def stream_csv_report(services_queryset, filename="services_report.csv", chunk_size=2000):
+        """Stream a CSV report row by row with constant memory."""
+        import csv
+        from django.http import StreamingHttpResponse
         
-        writer = csv.writer(response)
-        writer.writerow([
-            'ID', 'Customer', 'Service Type', 'Status', 'Assigned Mechanic', 
-            'Created Date'
-        ])
-        
-        for service in services_queryset:
-            writer.writerow([
-                service.id,
-                service.customer.get_full_name() or service.customer.username,
-                service.get_service_type_display(),
-                service.get_status_display(),
-                service.assigned_mechanic.get_full_name() if service.assigned_mechanic else 'Unassigned',
-                service.created_at.strftime('%Y-%m-%d %H:%M')
-            ])
+        class Echo:
+            """File-like object that hands each written line straight back."""
+            def write(self, value):
+                return value
         
+        writer = csv.writer(Echo())
+        
+        def generate():
+            yield writer.writerow(REPORT_HEADERS)
+            for row in ReportGenerator.iter_report_rows(services_queryset, chunk_size):
+                yield writer.writerow(row)
+        
+        response = StreamingHttpResponse(generate(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
     
     @staticmethod
-    def generate_excel_report(services_queryset, filename="services_report.xlsx"):
-        """Generate Excel report from services queryset."""
+    def _report_scope(services_queryset):
+        """An unordered, unsliced queryset of the services in a report, for aggregating."""
+        from .models import Service
+        
+        if services_queryset.query.is_sliced:
+            return Service.objects.filter(pk__in=services_queryset.values('pk'))
+        return services_queryset.order_by()
+    
+    @staticmethod
+    def mechanic_summary(services_queryset):
+        """Per-mechanic job counts and completion rate over the services in `services_queryset`."""
+        from .models import Profile, Service
+        from django.contrib.auth import get_user_model
+        
+        scope = ReportGenerator._report_scope(services_queryset)
+        in_scope = Q(assigned_services__in=scope.values('pk'))
+        rows = list(get_user_model().objects.filter(profile__role=Profile.ROLE_MECHANIC).values(
+            'id', 'username', 'first_name', 'last_name'
+        ).annotate(
+            total_assigned=Count('assigned_services', filter=in_scope),
+            completed=Count('assigned_services', filter=in_scope & Q(assigned_services__status=Service.STATUS_COMPLETED)),
+            pending=Count('assigned_services', filter=in_scope & Q(assigned_services__status=Service.STATUS_PENDING)),
+            in_progress=Count('assigned_services', filter=in_scope & Q(assigned_services__status=Service.STATUS_IN_PROGRESS)),
+        ).annotate(
+            completion_rate=Case(
+                When(total_assigned__gt=0, then=Cast('completed', FloatField()) * 100 / F('total_assigned')),
+                default=Value(0.0),
+                output_field=FloatField()
+            )
+        ).order_by('-completion_rate', '-total_assigned', 'id'))
+        for row in rows:
+            row['mechanic_name'] = f"{row['first_name']} {row['last_name']}".strip() or row['username']
+        return rows
+    
+    @staticmethod
+    def monthly_counts(services_queryset):
+        """{'YYYY-MM': count} of the services in `services_queryset` by created month, oldest first."""
+        rows = ReportGenerator._report_scope(services_queryset).annotate(
+            month=TruncMonth('created_at')
+        ).values('month').annotate(count=Count('id')).order_by('month')
+        return {row['month'].strftime('%Y-%m'): row['count'] for row in rows}
+    
+    @staticmethod
+    def write_excel_report(services_queryset, fileobj, chunk_size=2000, progress=None):
+        """
+        Write an Excel report to a binary file object or path. Returns the number of service rows.
+        Uses a write-only workbook: rows are appended straight from chunked queries.
+        Sheets: services, mechanic summary and monthly counts, all over the same services.
+        Raises ImportError if openpyxl is not installed.
+        """
+        import openpyxl
+        
+        wb = openpyxl.Workbook(write_only=True)
+        
+        # Services
+        ws = wb.create_sheet("Services Report")
+        ws.append(REPORT_HEADERS)
+        written = 0
+        rows = ReportGenerator.iter_report_rows(services_queryset, chunk_size)
+        for row in ReportGenerator._with_progress(rows, progress, chunk_size):
+            ws.append(row)
+            written += 1
+        
+        # The summary sheets cover the same (filtered, limited) services as the first one
+        scope = ReportGenerator._report_scope(services_queryset)
+        
+        # Mechanic summary
+        ws = wb.create_sheet("Mechanic Summary")
+        ws.append(['Mechanic', 'Total Assigned', 'Completed', 'Pending', 'In Progress', 'Completion Rate (%)'])
+        for m in ReportGenerator.mechanic_summary(scope):
+            ws.append([
+                m['mechanic_name'], m['total_assigned'], m['completed'],
+                m['pending'], m['in_progress'], round(m['completion_rate'], 1)
+            ])
+        
+        # Monthly counts
+        ws = wb.create_sheet("Monthly Counts")
+        ws.append(['Month', 'Services'])
+        for month, count in ReportGenerator.monthly_counts(scope).items():
+            ws.append([month, count])
+        
+        wb.save(fileobj)
+        return written
+    
+    @staticmethod
+    def generate_excel_report(services_queryset, filename="services_report.xlsx", chunk_size=2000):
+        """
+        Generate Excel report from services queryset.
+        The finished workbook is spooled to a temporary file rather than held in memory.
+        """
         try:
-            import openpyxl
-            from django.http import HttpResponse
-            
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "Services Report"
-            
-            # Headers
-            headers = [
-                'ID', 'Customer', 'Service Type', 'Status', 'Assigned Mechanic', 
-                'Created Date'
-            ]
-            for col, header in enumerate(headers, 1):
-                ws.cell(row=1, column=col, value=header)
+            import tempfile
+            from django.http import FileResponse
             
-            # Data
-            for row, service in enumerate(services_queryset, 2):
-                ws.cell(row=row, column=1, value=service.id)
-                ws.cell(row=row, column=2, value=service.customer.get_full_name() or service.customer.username)
-                ws.cell(row=row, column=3, value=service.get_service_type_display())
-                ws.cell(row=row, column=4, value=service.get_status_display())
-                ws.cell(row=row, column=5, value=service.assigned_mechanic.get_full_name() if service.assigned_mechanic else 'Unassigned')
-                ws.cell(row=row, column=6, value=service.created_at.strftime('%Y-%m-%d %H:%M'))
+            output = tempfile.TemporaryFile()
+            ReportGenerator.write_excel_report(services_queryset, output, chunk_size)
+            output.seek(0)
             
-            response = HttpResponse(
+            return FileResponse(
+                output,
+                as_attachment=True,
+                filename=filename,
                 content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
             )
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            wb.save(response)
-            return response
             
         except ImportError:
             # Fallback to CSV if openpyxl is not available
-            return ReportGenerator.generate_csv_report(services_queryset, filename.replace('.xlsx', '.csv'))
+            return ReportGenerator.stream_csv_report(services_queryset, filename.replace('.xlsx', '.csv'), chunk_size)
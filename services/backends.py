@@ -0,0 +1,22 @@
+"""
+Authentication backend that loads the session user together with its Profile.
+AuthenticationMiddleware resolves request.user through the backend's get_user, so
+selecting the profile here removes the separate profile query role checks and
+templates would otherwise make on every request.
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class ProfileModelBackend(ModelBackend):
+    """ModelBackend whose session user arrives with its profile in the same query."""
+
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
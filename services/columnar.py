@@ -0,0 +1,357 @@
+"""
+Optional columnar snapshot of the Service table for analytics (requires numpy).
+With ANALYTICS_SNAPSHOT_DIR set, Service rows are materialized into one .npy file
+per column (status and service_type as int8 codes, customer and mechanic ids as
+int32, created_at as int64 epoch seconds) and memory-mapped read-only, so every
+gunicorn worker on the host shares the same pages. ServiceAnalytics then answers
+distributions, monthly counts and mechanic stats with bincount/searchsorted
+instead of querying the database.
+
+Refreshes are incremental: rows with an id above the last one seen or saved
+since the previous read (less ANALYTICS_SNAPSHOT_LAG seconds, so transactions
+committing late are not missed) are re-read, updated in place or appended.
+Deletions are detected by comparing row counts. One process refreshes at a time
+under a file lock; the others pick up the new meta.json.
+"""
+
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = {
+    'id': 'int64',
+    'status': 'int8',
+    'service_type': 'int8',
+    'customer': 'int32',
+    'mechanic': 'int32',
+    'created_at': 'int64',
+}
+FIELDS = ('id', 'status', 'service_type', 'customer_id', 'assigned_mechanic_id', 'created_at')
+DELETED = -1       # status code of rows since deleted from the database
+UNASSIGNED = -1    # mechanic id of unassigned rows
+META_FILE = 'meta.json'
+LOCK_FILE = 'refresh.lock'
+FETCH_CHUNK = 20000
+
+# Process-local view of the shared snapshot
+_state = {'snapshot': None, 'checked': 0.0, 'data_version': None, 'warned': False}
+
+
+def enabled():
+    return bool(getattr(settings, 'ANALYTICS_SNAPSHOT_DIR', ''))
+
+
+def _numpy():
+    import numpy
+    return numpy
+
+
+class ColumnarSnapshot:
+    """Read-only, memory-mapped view of one snapshot generation."""
+
+    def __init__(self, directory, meta):
+        np = _numpy()
+        self.directory = directory
+        self.meta = meta
+        self.rows = meta['rows']
+        self.statuses = meta['statuses']
+        self.service_types = meta['service_types']
+        self.columns = {
+            name: np.load(_column_path(directory, name, meta['generation']), mmap_mode='r')[:self.rows]
+            for name in COLUMNS
+        }
+
+    def _live(self):
+        return self.columns['status'] != DELETED
+
+    def _distribution(self, column, labels):
+        np = _numpy()
+        counts = np.bincount(self.columns[column][self._live()], minlength=len(labels))
+        return {labels[code]: int(total) for code, total in enumerate(counts) if total}
+
+    def status_distribution(self):
+        return self._distribution('status', self.statuses)
+
+    def service_type_distribution(self):
+        return self._distribution('service_type', self.service_types)
+
+    def bucket_counts(self, boundaries):
+        """
+        Services created in each [boundaries[i], boundaries[i + 1]) interval,
+        `boundaries` being ascending epoch seconds.
+        """
+        np = _numpy()
+        created = self.columns['created_at'][self._live()]
+        positions = np.searchsorted(np.asarray(boundaries, dtype='int64'), created, side='right')
+        counts = np.bincount(positions, minlength=len(boundaries) + 1)
+        return [int(total) for total in counts[1:len(boundaries)]]
+
+    def mechanic_stats(self):
+        """
+        Per-mechanic job counts as {mechanic_id: {...}} for every mechanic with a job,
+        mirroring ServiceAnalytics._mechanic_stats (whose monthly completions come from the status events).
+        """
+        np = _numpy()
+        mechanic = self.columns['mechanic']
+        status = self.columns['status']
+        assigned = mechanic != UNASSIGNED
+        mechanic, status = mechanic[assigned], status[assigned]
+        size = int(mechanic.max()) + 1 if len(mechanic) else 0
+
+        def count(mask=None):
+            return np.bincount(mechanic if mask is None else mechanic[mask], minlength=size)
+
+        def code(value):
+            return self.statuses.index(value) if value in self.statuses else DELETED - 1
+
+        from .models import Service
+        live = status != DELETED
+        counts = {
+            'total_assigned': count(live),
+            'completed': count(status == code(Service.STATUS_COMPLETED)),
+            'pending': count(status == code(Service.STATUS_PENDING)),
+            'in_progress': count(status == code(Service.STATUS_IN_PROGRESS)),
+        }
+        ids = np.flatnonzero(counts['total_assigned'])
+        return {
+            int(pk): {name: int(values[pk]) for name, values in counts.items()}
+            for pk in ids
+        }
+
+
+def _column_path(directory, name, generation):
+    return os.path.join(directory, f'{name}.{generation}.npy')
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, META_FILE), encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(directory, meta):
+    path = os.path.join(directory, META_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as fh:
+        json.dump(meta, fh)
+    os.replace(path + '.tmp', path)
+
+
+def _encoder(labels):
+    """Dictionary-encode values, extending `labels` for values outside the choices."""
+    codes = {label: code for code, label in enumerate(labels)}
+
+    def encode(value):
+        if value not in codes:
+            codes[value] = len(labels)
+            labels.append(value)
+        return codes[value]
+    return encode
+
+
+def _encode_rows(rows, meta):
+    """Turn Service value tuples into column values."""
+    status_code, type_code = _encoder(meta['statuses']), _encoder(meta['service_types'])
+    columns = {name: [] for name in COLUMNS}
+    for pk, status, service_type, customer_id, mechanic_id, created_at in rows:
+        columns['id'].append(pk)
+        columns['status'].append(status_code(status))
+        columns['service_type'].append(type_code(service_type))
+        columns['customer'].append(customer_id)
+        columns['mechanic'].append(UNASSIGNED if mechanic_id is None else mechanic_id)
+        columns['created_at'].append(int(created_at.timestamp()))
+    return columns
+
+
+def _allocate(directory, generation, capacity):
+    np = _numpy()
+    return {
+        name: np.lib.format.open_memmap(
+            _column_path(directory, name, generation), mode='w+', dtype=dtype, shape=(capacity,)
+        )
+        for name, dtype in COLUMNS.items()
+    }
+
+
+def _open_writable(directory, meta):
+    np = _numpy()
+    return {
+        name: np.load(_column_path(directory, name, meta['generation']), mmap_mode='r+')
+        for name in COLUMNS
+    }
+
+
+def _remove_generation(directory, generation):
+    for name in COLUMNS:
+        try:
+            os.remove(_column_path(directory, name, generation))
+        except OSError:
+            pass
+
+
+def _rebuild(directory):
+    """Materialize the whole Service table into a new snapshot generation. Returns the row count."""
+    from .models import Service
+
+    previous = _read_meta(directory)
+    meta = {
+        'generation': (previous['generation'] + 1) if previous else 1,
+        'rows': 0,
+        'max_id': 0,
+        # Clock time the rows were read at; the next refresh re-reads rows saved after it
+        'watermark': time.time(),
+        'statuses': [value for value, _ in Service.STATUS_CHOICES],
+        'service_types': [value for value, _ in Service.SERVICE_TYPE_CHOICES],
+    }
+
+    total = Service.objects.count()
+    capacity = max(int(total * 1.25), 1024)
+    allocated = meta['generation']
+    arrays = _allocate(directory, allocated, capacity)
+    rows = Service.objects.order_by('id').values_list(*FIELDS).iterator(chunk_size=FETCH_CHUNK)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= FETCH_CHUNK:
+            arrays = _append(directory, meta, arrays, batch)
+            batch = []
+    arrays = _append(directory, meta, arrays, batch)
+
+    for array in arrays.values():
+        array.flush()
+    _write_meta(directory, meta)
+    if meta['generation'] != allocated:
+        # Rows arriving during the rebuild outgrew the first allocation
+        _remove_generation(directory, allocated)
+    if previous:
+        _remove_generation(directory, previous['generation'])
+    return meta['rows']
+
+
+def _append(directory, meta, arrays, rows):
+    """Append rows (ascending ids above meta['max_id']), growing into a new generation if full."""
+    if not rows:
+        return arrays
+    columns = _encode_rows(rows, meta)
+    start, stop = meta['rows'], meta['rows'] + len(rows)
+    capacity = len(arrays['id'])
+    if stop > capacity:
+        # Copy into a larger generation; readers keep the old files until they reopen
+        grown = _allocate(directory, meta['generation'] + 1, max(int(stop * 1.25), capacity * 2))
+        for name in COLUMNS:
+            grown[name][:start] = arrays[name][:start]
+        arrays = grown
+        meta['generation'] += 1
+    for name in COLUMNS:
+        arrays[name][start:stop] = columns[name]
+    meta['rows'] = stop
+    meta['max_id'] = max(meta['max_id'], rows[-1][0])
+    return arrays
+
+
+def _apply_changes(directory, meta):
+    """Patch the snapshot with rows changed since the watermark. Returns the number of rows re-read."""
+    from .models import Service
+
+    np = _numpy()
+    lag = getattr(settings, 'ANALYTICS_SNAPSHOT_LAG', 60)
+    since = datetime.fromtimestamp(max(meta['watermark'] - lag, 0), tz=dt_timezone.utc)
+    meta['watermark'] = time.time()
+    # Two queries so each can use its index (an OR of both makes SQLite scan the table)
+    appended = list(Service.objects.filter(id__gt=meta['max_id']).order_by('id').values_list(*FIELDS))
+    existing = [
+        row for row in Service.objects.filter(updated_at__gt=since).order_by().values_list(*FIELDS)
+        if row[0] <= meta['max_id']
+    ]
+
+    arrays = _open_writable(directory, meta)
+    old_generation = meta['generation']
+    if existing:
+        ids = arrays['id'][:meta['rows']]
+        keys = np.array([row[0] for row in existing], dtype='int64')
+        positions = np.searchsorted(ids, keys)
+        if (positions >= len(ids)).any() or (ids[np.minimum(positions, len(ids) - 1)] != keys).any():
+            # A row committed with an id below ones already seen; start over
+            return _rebuild(directory)
+        columns = _encode_rows(existing, meta)
+        for name in COLUMNS:
+            arrays[name][positions] = columns[name]
+    arrays = _append(directory, meta, arrays, appended)
+
+    # Rows deleted from the database still sit in the snapshot
+    status = arrays['status'][:meta['rows']]
+    if int((status != DELETED).sum()) != Service.objects.count():
+        ids = np.fromiter(Service.objects.values_list('id', flat=True).iterator(), dtype='int64')
+        gone = ~np.isin(arrays['id'][:meta['rows']], ids)
+        status[gone] = DELETED
+
+    for array in arrays.values():
+        array.flush()
+    _write_meta(directory, meta)
+    if meta['generation'] != old_generation:
+        _remove_generation(directory, old_generation)
+    return len(existing) + len(appended)
+
+
+def refresh(directory=None, full=False, wait=True):
+    """
+    Bring the snapshot up to date under the refresh lock: incrementally, or from
+    scratch with `full` (or when there is no snapshot yet). Returns the number of
+    rows read, or None when `wait` is False and another process holds the lock.
+    """
+    import fcntl
+
+    directory = directory or settings.ANALYTICS_SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        try:
+            meta = _read_meta(directory)
+            if full or meta is None:
+                return _rebuild(directory)
+            return _apply_changes(directory, meta)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def get_snapshot():
+    """
+    The current snapshot, or None when the engine is disabled or unavailable (callers
+    then use the ORM). Refreshes when the analytics data version changed or every
+    ANALYTICS_SNAPSHOT_REFRESH_SECONDS.
+    """
+    if not enabled():
+        return None
+    from .response_cache import data_version
+
+    directory = settings.ANALYTICS_SNAPSHOT_DIR
+    try:
+        version = data_version()
+        interval = getattr(settings, 'ANALYTICS_SNAPSHOT_REFRESH_SECONDS', 30)
+        now = time.monotonic()
+        if version != _state['data_version'] or now - _state['checked'] >= interval:
+            refresh(directory, wait=False)
+            _state['data_version'], _state['checked'] = version, now
+
+        meta = _read_meta(directory)
+        if meta is None:
+            return None
+        snapshot = _state['snapshot']
+        if snapshot is None or snapshot.meta != meta:
+            snapshot = _state['snapshot'] = ColumnarSnapshot(directory, meta)
+        return snapshot
+    except ImportError:
+        if not _state['warned']:
+            logger.warning('ANALYTICS_SNAPSHOT_DIR is set but numpy is not installed; using the database')
+            _state['warned'] = True
+        return None
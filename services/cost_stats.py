@@ -0,0 +1,231 @@
+"""
+Incremental maintenance of CostStatistic rows.
+Every ServiceRecord with a non-zero total cost contributes to the 'all' segment, to its
+vehicle owner's 'customer:<id>' segment and, when it has one, to its service type's
+'service_type:<type>' segment. Count, sum, min and max are exact; mean and variance
+use Welford's online algorithm so they can be updated in O(1) per record.
+Each change is one UPDATE of F() expressions over the affected segment rows rather than
+a locked read-modify-write: SQL evaluates every SET expression against the row as it was
+before the statement, so the Welford step is written in terms of the old count and mean,
+and concurrent record writes never wait on a SELECT ... FOR UPDATE of a shared row.
+Min/max are only recomputed from the records when a removed cost was an extreme.
+Bulk writers (which skip the signals) collect batches in CostTotals and merge them with add_costs.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Max, Min, Q, Subquery, Sum, Value, Variance, When
+from django.db.models.functions import Cast, Greatest, Least
+from django.utils import timezone
+
+
+def record_cost(record):
+    """Total cost counted for a ServiceRecord, or None if it does not contribute."""
+    total = Decimal(str(record.parts_cost or 0)) + Decimal(str(record.labor_cost or 0))
+    return total if total > 0 else None
+
+
+def record_segments(record, owner_id=None):
+    """Segments a ServiceRecord belongs to; `owner_id` saves looking up its vehicle's owner."""
+    from .models import CostStatistic, Vehicle
+
+    if owner_id is None:
+        owner_id = Vehicle.objects.filter(pk=record.vehicle_id).values_list('owner_id', flat=True).first()
+    segments = [CostStatistic.SEGMENT_ALL]
+    if owner_id is not None:
+        segments.append(CostStatistic.customer_segment(owner_id))
+    if record.service_type:
+        segments.append(CostStatistic.service_type_segment(record.service_type))
+    return segments
+
+
+class _MissingRows(Exception):
+    pass
+
+
+def _update(segments, **changes):
+    """Apply F() expression `changes` to the rows of `segments`, creating missing rows first."""
+    from .models import CostStatistic
+
+    stats = CostStatistic.objects.filter(segment__in=segments)
+    try:
+        with transaction.atomic():
+            if stats.update(updated_at=timezone.now(), **changes) < len(segments):
+                # Roll the partial update back and apply it again once every row exists
+                raise _MissingRows
+    except _MissingRows:
+        CostStatistic.objects.bulk_create(
+            [CostStatistic(segment=segment) for segment in segments], ignore_conflicts=True
+        )
+        stats.update(updated_at=timezone.now(), **changes)
+
+
+class CostTotals:
+    """A batch of costs, merged into statistic rows in one write."""
+
+    def __init__(self):
+        self.count, self.total, self.mean, self.m2 = 0, Decimal('0'), 0.0, 0.0
+        self.low, self.high = None, None
+
+    def add(self, cost):
+        x = float(cost)
+        self.count += 1
+        self.total += cost
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.low = cost if self.low is None else min(self.low, cost)
+        self.high = cost if self.high is None else max(self.high, cost)
+
+
+class SegmentTotals(defaultdict):
+    """CostTotals per segment, for batches spanning several customers and service types."""
+
+    def __init__(self):
+        super().__init__(CostTotals)
+
+    def add(self, segments, cost):
+        for segment in segments:
+            self[segment].add(cost)
+
+    def merge(self):
+        """Merge every segment's batch into its row."""
+        for segment, totals in self.items():
+            add_costs(totals, [segment])
+
+
+def add_costs(totals, segments):
+    """Merge a CostTotals batch into each of `segments` (parallel form of Welford's update, Chan et al.)."""
+    if not totals.count:
+        return
+    n = totals.count
+    count = Cast(F('count'), FloatField())
+    delta = Value(totals.mean) - F('mean')
+    _update(
+        segments,
+        count=F('count') + n,
+        total=F('total') + totals.total,
+        mean=F('mean') + delta * n / (count + n),
+        m2=F('m2') + totals.m2 + delta * delta * count * n / (count + n),
+        min_cost=Case(When(min_cost__isnull=True, then=Value(totals.low)), default=Least('min_cost', Value(totals.low))),
+        max_cost=Case(When(max_cost__isnull=True, then=Value(totals.high)), default=Greatest('max_cost', Value(totals.high))),
+    )
+
+
+def remove_costs(totals, segments):
+    """
+    Remove a CostTotals batch from each of `segments` (inverse of add_costs). Call after
+    the records' rows have been changed or deleted: min/max are recomputed from the
+    remaining records, only in segments where a removed cost may have been an extreme.
+    """
+    from .models import CostStatistic
+
+    if not totals.count:
+        return
+    k = totals.count
+    count = Cast(F('count'), FloatField())
+    rest = count - k
+    mean = (F('mean') * count - totals.mean * k) / rest
+    delta = Value(totals.mean) - mean
+    last = Q(count__lte=k)
+    with transaction.atomic():
+        _update(
+            segments,
+            count=Case(When(last, then=Value(0)), default=F('count') - k),
+            total=Case(When(last, then=Value(Decimal('0'))), default=F('total') - totals.total),
+            mean=Case(When(last, then=Value(0.0)), default=mean),
+            # Greatest guards against float drift taking M2 below zero
+            m2=Case(When(last, then=Value(0.0)), default=Greatest(
+                F('m2') - totals.m2 - delta * delta * rest * k / count, Value(0.0)
+            )),
+        )
+        for segment in segments:
+            costs = _contributing_costs(segment)
+            CostStatistic.objects.filter(
+                Q(min_cost__gte=totals.low) | Q(max_cost__lte=totals.high), segment=segment
+            ).update(
+                min_cost=Subquery(costs.order_by('cost').values('cost')[:1]),
+                max_cost=Subquery(costs.order_by('-cost').values('cost')[:1]),
+            )
+
+
+def add_cost(cost, segments):
+    """Add one cost observation to each of `segments`."""
+    totals = CostTotals()
+    totals.add(cost)
+    add_costs(totals, segments)
+
+
+def remove_cost(cost, segments):
+    """Remove one cost observation from each of `segments`; see remove_costs."""
+    totals = CostTotals()
+    totals.add(cost)
+    remove_costs(totals, segments)
+
+
+def move_vehicle_costs(vehicle_id, previous_owner_id, owner_id):
+    """Move a vehicle's record costs between customer segments after it changed owner."""
+    from .models import CostStatistic
+
+    totals = CostTotals()
+    costs = _contributing_costs(CostStatistic.SEGMENT_ALL).filter(vehicle_id=vehicle_id)
+    for cost in costs.values_list('cost', flat=True):
+        totals.add(cost)
+    with transaction.atomic():
+        if previous_owner_id is not None:
+            remove_costs(totals, [CostStatistic.customer_segment(previous_owner_id)])
+        if owner_id is not None:
+            add_costs(totals, [CostStatistic.customer_segment(owner_id)])
+
+
+def _contributing_costs(segment):
+    """Contributing ServiceRecords of a segment, annotated with `cost`."""
+    from .models import CostStatistic, ServiceRecord
+
+    records = ServiceRecord.objects.annotate(cost=F('parts_cost') + F('labor_cost')).filter(cost__gt=0).order_by()
+    kind, _, value = segment.partition(':')
+    if kind == CostStatistic.SEGMENT_CUSTOMER:
+        records = records.filter(vehicle__owner_id=int(value))
+    elif kind == CostStatistic.SEGMENT_SERVICE_TYPE:
+        records = records.filter(service_type=value)
+    return records
+
+
+def rebuild_cost_stats():
+    """Recompute every CostStatistic row from ServiceRecord. Returns the number of segments."""
+    from .models import CostStatistic
+
+    def build(segment, row):
+        count = row['n'] or 0
+        return CostStatistic(
+            segment=segment,
+            count=count,
+            total=row['total'] or 0,
+            min_cost=row['low'],
+            max_cost=row['high'],
+            mean=float(row['total'] or 0) / count if count else 0.0,
+            m2=float(row['var'] or 0) * count,
+        )
+
+    aggregates = dict(
+        n=Count('id'), total=Sum('cost'), low=Min('cost'), high=Max('cost'), var=Variance('cost')
+    )
+    records = _contributing_costs(CostStatistic.SEGMENT_ALL)
+
+    with transaction.atomic():
+        CostStatistic.objects.all().delete()
+        stats = [build(CostStatistic.SEGMENT_ALL, records.aggregate(**aggregates))]
+        per_owner = records.values('vehicle__owner_id').annotate(**aggregates)
+        stats.extend(
+            build(CostStatistic.customer_segment(row['vehicle__owner_id']), row) for row in per_owner
+        )
+        per_type = records.filter(service_type__isnull=False).exclude(service_type='').values(
+            'service_type'
+        ).annotate(**aggregates)
+        stats.extend(
+            build(CostStatistic.service_type_segment(row['service_type']), row) for row in per_type
+        )
+        CostStatistic.objects.bulk_create(stats, batch_size=1000)
+    return len(stats)
@@ -0,0 +1,106 @@
+"""
+Precomputed customer dashboard snapshots.
+The customer dashboard context (recent services, predictions, vehicle health scores
+and recommendations) only changes when that customer's Service, ServiceRecord or
+Vehicle rows change, so it is computed once and kept in the cache per customer.
+Signals bump the customer's snapshot version after the writing transaction commits;
+a snapshot built under an older version (or on an earlier day, since health scores
+and predicted dates count days from today) is rebuilt on the next visit.
+The versions are DataVersion rows, so writes in any process invalidate snapshots
+held in any cache backend, including the per-process local-memory default.
+The cost range in the prediction is global and may lag by up to
+CUSTOMER_SNAPSHOT_TIMEOUT seconds.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import data_versions
+
+GENERATION_KEY = 'dashboard:customer:generation'
+DEFAULT_TIMEOUT = 3600
+# Beyond this many customers in one batch write, drop every snapshot at once
+INVALIDATE_LIMIT = 100
+
+
+def _snapshot_key(customer_id):
+    return f'dashboard:customer:{customer_id}'
+
+
+def _version_key(customer_id):
+    return f'dashboard:customer:{customer_id}:version'
+
+
+def invalidate(customer_id):
+    """Mark one customer's snapshot out of date."""
+    data_versions.bump(_version_key(customer_id))
+
+
+def invalidate_all():
+    """Mark every snapshot out of date, e.g. after bulk writes that skip signals."""
+    data_versions.bump(GENERATION_KEY)
+
+
+def invalidate_customers_on_commit(customer_ids):
+    """
+    After the current transaction commits, mark these customers' snapshots out of date;
+    for more than INVALIDATE_LIMIT customers, every snapshot at once.
+    """
+    customer_ids = {customer_id for customer_id in customer_ids if customer_id is not None}
+    if len(customer_ids) > INVALIDATE_LIMIT:
+        transaction.on_commit(invalidate_all)
+        return
+    for customer_id in customer_ids:
+        transaction.on_commit(lambda customer_id=customer_id: invalidate(customer_id))
+
+
+def build_context(user):
+    """Compute the customer dashboard context from the database."""
+    from .logic import get_recommendations_for_vehicles
+    from .models import Service, Vehicle
+    from .predictions import ServicePredictor
+
+    recent_services = list(Service.objects.filter(customer=user).order_by('-created_at')[:3])
+
+    # ML Predictions
+    try:
+        prediction = ServicePredictor.get_customer_predictions(user)
+    except Exception:
+        prediction = None
+
+    # Health Score & Recommendations
+    vehicles = list(Vehicle.objects.filter(owner=user).with_health_score())
+    recommendations = get_recommendations_for_vehicles(vehicles)
+    vehicle_data = []
+    for v in vehicles:
+        vehicle_data.append({
+            'vehicle': v,
+            'health_score': v.health_score,
+            'recommendations': recommendations[v.pk]
+        })
+
+    return {
+        "recent_services_note": f"Your past {len(recent_services)} services are listed here.",
+        "recent_services": recent_services,
+        "prediction": prediction,
+        "vehicle_data": vehicle_data,
+    }
+
+
+def get_context(user):
+    """The customer's dashboard context, from the snapshot when it is current."""
+    snapshot_key = _snapshot_key(user.pk)
+    version, generation = data_versions.current(_version_key(user.pk), GENERATION_KEY)
+    stamp = (version, generation, timezone.localdate().isoformat())
+
+    snapshot = cache.get(snapshot_key)
+    if snapshot is not None and snapshot['stamp'] == stamp:
+        return snapshot['context']
+
+    # The stamp is read before building, so a write committed meanwhile forces another rebuild
+    context = build_context(user)
+    timeout = getattr(settings, 'CUSTOMER_SNAPSHOT_TIMEOUT', DEFAULT_TIMEOUT)
+    cache.set(snapshot_key, {'stamp': stamp, 'context': context}, timeout=timeout)
+    return context
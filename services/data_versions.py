@@ -0,0 +1,42 @@
+"""
+Shared version counters for cached data, stored in DataVersion rows.
+A cache entry stamped with the versions it was built under is current while those
+versions are unchanged, so entries never need deleting and the cache itself may be
+per-process (local memory): only the counters have to be shared, and the database
+is shared by every process that writes data.
+New counters start from the clock, so a counter recreated after its row was lost
+never repeats a value an old cache entry was stamped with.
+"""
+
+import time
+
+from django.db.models import F
+
+
+def current(*keys):
+    """Current versions of `keys`, as a list in the same order; missing counters are created."""
+    from .models import DataVersion
+
+    versions = dict(DataVersion.objects.filter(key__in=keys).values_list('key', 'version'))
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time_ns()
+        # ignore_conflicts: a concurrent reader or writer may create the same counter
+        DataVersion.objects.bulk_create(
+            [DataVersion(key=key, version=now) for key in missing], ignore_conflicts=True
+        )
+        versions.update(DataVersion.objects.filter(key__in=missing).values_list('key', 'version'))
+    return [versions[key] for key in keys]
+
+
+def bump(*keys):
+    """Move `keys` to new versions, invalidating everything stamped with the old ones."""
+    from .models import DataVersion
+
+    counters = DataVersion.objects.filter(key__in=keys)
+    if counters.update(version=F('version') + 1) < len(keys):
+        # A counter created concurrently may hold a value read before this write: bump again
+        DataVersion.objects.bulk_create(
+            [DataVersion(key=key, version=time.time_ns()) for key in keys], ignore_conflicts=True
+        )
+        counters.update(version=F('version') + 1)
@@ -1,9 +1,11 @@
 from functools import wraps
 from django.http import HttpResponseForbidden
 
+from .roles import get_role
+
 
 def role_required(allowed_roles):
-    """Allow access only if request.user.profile.role is in allowed_roles."""
+    """Allow access only if the user's role (see services.roles) is in allowed_roles."""
     def decorator(view_func):
         @wraps(view_func)
         def _wrapped(request, *args, **kwargs):
@@ -11,11 +13,8 @@ def role_required(allowed_roles):
             if not user.is_authenticated:
                 # Let login_required handle unauthenticated cases if applied
                 return HttpResponseForbidden("Permission Denied")
-            profile = getattr(user, "profile", None)
-            if profile and profile.role in allowed_roles:
+            if get_role(request) in allowed_roles:
                 return view_func(request, *args, **kwargs)
             return HttpResponseForbidden("Permission Denied")
         return _wrapped
     return decorator
-
-
@@ -83,20 +83,29 @@ class BookServiceForm(forms.ModelForm):
 class AssignMechanicForm(forms.ModelForm):
     class Meta:
         model = Service
-        fields = ["assigned_mechanic"]
+        # version: the one the user saw, so a concurrent change is refused instead of overwritten
+        fields = ["assigned_mechanic", "version"]
         widgets = {
             "assigned_mechanic": forms.Select(attrs={"class": "form-select"}),
+            "version": forms.HiddenInput(),
         }
 
     def __init__(self, *args, **kwargs):
+        from .scheduler import mechanic_loads
+
         super().__init__(*args, **kwargs)
-        self.fields["assigned_mechanic"].queryset = User.objects.filter(profile__role=Profile.ROLE_MECHANIC)
+        field = self.fields["assigned_mechanic"]
+        field.queryset = User.objects.filter(profile__role=Profile.ROLE_MECHANIC)
+        # Show each mechanic's open workload (pending + in progress) next to their name
+        loads = mechanic_loads()
+        field.label_from_instance = lambda user: f"{user} ({loads.get(user.pk, 0)} open jobs)"
 
 
 class UpdateServiceStatusForm(forms.ModelForm):
     class Meta:
         model = Service
-        fields = ["status"]
+        fields = ["status", "version"]
         widgets = {
             "status": forms.Select(attrs={"class": "form-select"}),
+            "version": forms.HiddenInput(),
         }
\ No newline at end of file
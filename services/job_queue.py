@@ -0,0 +1,82 @@
+"""
+Leases for the database-backed job queues (ReportJob, RecordImport).
+A worker claims the oldest queued job with a conditional UPDATE that also starts a
+lease: `heartbeat_at` is renewed with every progress write, and a running job whose
+heartbeat is older than BACKGROUND_JOB_LEASE_SECONDS is taken to have lost its worker
+and is queued again, or failed once it has been claimed BACKGROUND_JOB_MAX_ATTEMPTS
+times. Each claim increments `attempts`, which fences the worker's writes: a worker
+whose job was reclaimed gets LeaseLost instead of overwriting the new owner's state.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+
+class LeaseLost(Exception):
+    """The job was reclaimed from this worker after its lease expired."""
+
+
+def lease_expired(model):
+    """Running jobs of `model` whose lease has expired."""
+    cutoff = timezone.now() - timedelta(seconds=settings.BACKGROUND_JOB_LEASE_SECONDS)
+    return model.objects.filter(status=model.STATUS_RUNNING, heartbeat_at__lt=cutoff)
+
+
+def requeue_expired(model):
+    """Queue the jobs of crashed workers again (or fail them after too many attempts). Returns how many."""
+    expired = lease_expired(model)
+    if not expired.exists():
+        return 0
+    max_attempts = settings.BACKGROUND_JOB_MAX_ATTEMPTS
+    failed = expired.filter(attempts__gte=max_attempts).update(
+        status=model.STATUS_FAILED,
+        error=f'The worker stopped responding on each of {max_attempts} attempts',
+        finished_at=timezone.now()
+    )
+    return failed + expired.update(status=model.STATUS_QUEUED, heartbeat_at=None)
+
+
+def start(model, jobs):
+    """Claim the job matched by the `jobs` queryset, if any still is. Returns the number claimed (0 or 1)."""
+    now = timezone.now()
+    return jobs.update(
+        status=model.STATUS_RUNNING,
+        started_at=now,
+        heartbeat_at=now,
+        attempts=F('attempts') + 1,
+        error='',
+        finished_at=None
+    )
+
+
+def claim_next(model):
+    """
+    Claim the oldest queued job of `model`, or return None if the queue is empty.
+    The conditional UPDATE makes the claim safe with several workers on any database backend.
+    """
+    requeue_expired(model)
+    while True:
+        job_id = model.objects.filter(
+            status=model.STATUS_QUEUED
+        ).order_by('created_at', 'id').values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        if start(model, model.objects.filter(id=job_id, status=model.STATUS_QUEUED)):
+            return model.objects.get(id=job_id)
+
+
+def heartbeat(job, **fields):
+    """Renew the lease of a claimed job, writing `fields` with it. Raises LeaseLost if it was reclaimed."""
+    updated = type(job).objects.filter(
+        pk=job.pk, status=job.STATUS_RUNNING, attempts=job.attempts
+    ).update(heartbeat_at=timezone.now(), **fields)
+    if not updated:
+        raise LeaseLost(f'{type(job).__name__} #{job.pk} was reclaimed after its lease expired')
+
+
+def finish(job, status, **fields):
+    """Record the outcome of a claimed job. Raises LeaseLost if it was reclaimed."""
+    heartbeat(job, status=status, finished_at=timezone.now(), **fields)
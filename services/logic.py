@@ -1,6 +1,8 @@
 from django.utils import timezone
-from datetime import timedelta
-from .models import Service, ServiceRecord, Vehicle
+from .models import ServiceRecord, Vehicle
+
+# Vehicles scoring below this are treated as at-risk
+HEALTH_SCORE_AT_RISK = 60
 
 def calculate_health_score(vehicle):
     """
@@ -10,92 +12,128 @@ def calculate_health_score(vehicle):
     - Service Frequency: -15 points if no service in last 180 days
     - Issues Reported: -10 points for each record with issues in last year
     - Pending Services: -5 points for each pending booking
+
+    The score is computed in the database by Vehicle.objects.with_health_score();
+    vehicles loaded through that queryset are returned without another query.
     """
-    score = 100
-    now = timezone.now()
-    
-    # 1. Mileage check
-    mileage = vehicle.mileage or 0
-    if mileage > 30000:
-        over_mileage = (mileage - 30000) // 10000
-        score -= min(20, over_mileage * 2)
-        
-    # 2. Frequency check
-    last_service = ServiceRecord.objects.filter(vehicle=vehicle).order_by('-service_date').first()
-    if last_service:
-        days_since = (now.date() - last_service.service_date).days
-        if days_since > 180:
-            score -= 15
-    else:
-        # Never serviced record? Check if vehicle is more than 6 months old
-        vehicle_age_days = (now - vehicle.created_at).days
-        if vehicle_age_days > 180:
-            score -= 15
-            
-    # 3. Issues reported check (last 365 days)
-    one_year_ago = now.date() - timedelta(days=365)
-    recent_issues = ServiceRecord.objects.filter(
-        vehicle=vehicle, 
-        service_date__gte=one_year_ago,
-        issues_reported__isnull=False
-    ).exclude(issues_reported="").count()
-    score -= min(30, recent_issues * 10)
-    
-    # 4. Pending services check
-    pending_bookings = Service.objects.filter(
-        customer=vehicle.owner,
-        status=Service.STATUS_PENDING
-    ).count() # This is a bit loose since Service isn't directly linked to Vehicle yet
-    # But it's a good proxy for 'needs attention'
-    score -= min(15, pending_bookings * 5)
-    
-    return max(0, min(100, score))
-
-def get_recommendations(vehicle):
+    score = getattr(vehicle, 'health_score', None)
+    if score is not None:
+        return score
+    return Vehicle.objects.with_health_score().values_list(
+        'health_score', flat=True
+    ).get(pk=vehicle.pk)
+
+# Declarative recommendation rules, evaluated in order.
+# - keyword: warn when no record mentioning `keyword` in work_done within `max_days`
+# - mileage: warn when vehicle mileage is above `min_mileage`
+# - health: warn when the health score is below `below`
+RECOMMENDATION_RULES = [
+    {
+        'check': 'keyword',
+        'keyword': 'oil',
+        'max_days': 180,
+        'type': 'warning',
+        'icon': 'fa-oil-can',
+        'text': "You should get an oil change soon. Your engine performance may decrease."
+    },
+    {
+        'check': 'keyword',
+        'keyword': 'brake',
+        'max_days': 365,
+        'type': 'danger',
+        'icon': 'fa-brake-warning',
+        'text': "Your brakes haven't been inspected in over a year. Safety check recommended!"
+    },
+    {
+        'check': 'mileage',
+        'min_mileage': 80000,
+        'type': 'info',
+        'icon': 'fa-gauge-high',
+        'text': "High mileage detected. A comprehensive suspension and belt check is advised."
+    },
+    {
+        'check': 'health',
+        'below': HEALTH_SCORE_AT_RISK,
+        'type': 'primary',
+        'icon': 'fa-heart-pulse',
+        'text': "Overall vehicle health is low ({health_score}/100). Consider a Full General Checkup."
+    },
+]
+
+RECOMMENDATION_KEYWORDS = [r['keyword'] for r in RECOMMENDATION_RULES if r['check'] == 'keyword']
+
+
+def _history_queryset(vehicles):
+    """Service history rows (vehicle_id, service_date, work_done), newest first."""
+    return ServiceRecord.objects.filter(
+        vehicle__in=vehicles,
+        work_done__isnull=False
+    ).exclude(work_done="").order_by('vehicle_id', '-service_date').values_list(
+        'vehicle_id', 'service_date', 'work_done'
+    )
+
+
+def _scan_history(rows):
     """
-    Generate actionable AI recommendations based on vehicle status and history.
+    Single pass over history rows (newest first per vehicle).
+    Returns {vehicle_id: {keyword: latest service_date}}.
     """
+    latest = {}
+    for vehicle_id, service_date, work_done in rows:
+        found = latest.setdefault(vehicle_id, {})
+        if len(found) == len(RECOMMENDATION_KEYWORDS):
+            continue
+        work_done = work_done.lower()
+        for keyword in RECOMMENDATION_KEYWORDS:
+            if keyword not in found and keyword in work_done:
+                found[keyword] = service_date
+    return latest
+
+
+def _evaluate_rules(vehicle, keyword_dates, health_score, today):
     recommendations = []
-    now = timezone.now().date()
-    
-    # Check for specific service types in history
-    records = ServiceRecord.objects.filter(vehicle=vehicle).order_by('-service_date')
-    
-    # 1. Oil change recommendation
-    last_oil = any('oil' in r.work_done.lower() if r.work_done else False for r in records[:5])
-    last_oil_date = next((r.service_date for r in records if 'oil' in (r.work_done or '').lower()), None)
-    
-    if not last_oil_date or (now - last_oil_date).days > 180:
-        recommendations.append({
-            'type': 'warning',
-            'icon': 'fa-oil-can',
-            'text': "You should get an oil change soon. Your engine performance may decrease."
-        })
-        
-    # 2. Brake check
-    last_brake = next((r.service_date for r in records if 'brake' in (r.work_done or '').lower()), None)
-    if not last_brake or (now - last_brake).days > 365:
-        recommendations.append({
-            'type': 'danger',
-            'icon': 'fa-brake-warning',
-            'text': "Your brakes haven't been inspected in over a year. Safety check recommended!"
-        })
-        
-    # 3. High mileage
-    if (vehicle.mileage or 0) > 80000:
-        recommendations.append({
-            'type': 'info',
-            'icon': 'fa-gauge-high',
-            'text': "High mileage detected. A comprehensive suspension and belt check is advised."
-        })
-        
-    # 4. General health
-    health_score = calculate_health_score(vehicle)
-    if health_score < 60:
-        recommendations.append({
-            'type': 'primary',
-            'icon': 'fa-heart-pulse',
-            'text': f"Overall vehicle health is low ({health_score}/100). Consider a Full General Checkup."
-        })
-        
+    for rule in RECOMMENDATION_RULES:
+        check = rule['check']
+        if check == 'keyword':
+            last_date = keyword_dates.get(rule['keyword'])
+            triggered = not last_date or (today - last_date).days > rule['max_days']
+        elif check == 'mileage':
+            triggered = (vehicle.mileage or 0) > rule['min_mileage']
+        elif check == 'health':
+            triggered = health_score < rule['below']
+        else:
+            triggered = False
+
+        if triggered:
+            recommendations.append({
+                'type': rule['type'],
+                'icon': rule['icon'],
+                'text': rule['text'].format(health_score=health_score)
+            })
     return recommendations
+
+
+def get_recommendations(vehicle, health_score=None):
+    """
+    Generate actionable AI recommendations based on vehicle status and history.
+    Pass `health_score` when it is already known to skip recomputing it.
+    """
+    if health_score is None:
+        health_score = calculate_health_score(vehicle)
+    keyword_dates = _scan_history(_history_queryset([vehicle.pk])).get(vehicle.pk, {})
+    return _evaluate_rules(vehicle, keyword_dates, health_score, timezone.now().date())
+
+
+def get_recommendations_for_vehicles(vehicles):
+    """
+    Generate recommendations for many vehicles from one history query.
+    Vehicles loaded via Vehicle.objects.with_health_score() reuse their score.
+    Returns {vehicle_id: [recommendation, ...]}.
+    """
+    vehicles = list(vehicles)
+    history = _scan_history(_history_queryset([v.pk for v in vehicles]).iterator())
+    today = timezone.now().date()
+    return {
+        v.pk: _evaluate_rules(v, history.get(v.pk, {}), calculate_health_score(v), today)
+        for v in vehicles
+    }
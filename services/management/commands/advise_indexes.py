@@ -0,0 +1,340 @@
+"""
+Management command that replays the hot analytics queries and EXPLAINs them.
+Captures the SQL issued by ServiceAnalytics, logic and ServicePredictor against the
+current database, reports full table scans and sorts (SQLite and PostgreSQL plans)
+and proposes composite indexes for the columns those queries filter and sort on.
+"""
+
+import re
+import statistics
+import time
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+
+from services.analytics import ReportGenerator, ServiceAnalytics
+from services.logic import calculate_health_score, get_recommendations
+from services.models import Profile, Service, Vehicle
+from services.predictions import ServicePredictor
+
+User = get_user_model()
+
+_COLUMN = r'(?:"(?P<table>\w+)"|\b(?P<alias>[A-Z]\d+))\."(?P<column>\w+)"'
+_COLUMN_PREDICATE = re.compile(_COLUMN + r'\s*(?P<op>=|IN\b|IS\b|>=|<=|<|>|BETWEEN\b)', re.IGNORECASE)
+_TABLE_ALIAS = re.compile(r'(?:FROM|JOIN)\s+"(?P<table>\w+)"(?:\s+(?:AS\s+)?"?(?P<alias>[A-Z]\d+)\b"?)?')
+_CLAUSE_KEYWORDS = ('GROUP BY', 'ORDER BY', 'LIMIT', 'HAVING', 'OFFSET', 'WINDOW')
+# Negated and NOT NULL predicates are not selective enough to lead an index
+_UNSELECTIVE = re.compile(r'NOT \([^()]*\)|(?:"\w+"|\b[A-Z]\d+)\."\w+"\s+IS\s+NOT\s+NULL', re.IGNORECASE)
+
+
+class QueryCapture:
+    """execute_wrapper that records each distinct SELECT statement and the targets issuing it."""
+
+    def __init__(self):
+        self.target = None
+        self.queries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            entry = self.queries.setdefault(sql, {'params': params, 'targets': []})
+            if self.target not in entry['targets']:
+                entry['targets'].append(self.target)
+        return execute(sql, params, many, context)
+
+
+def _scopes(sql):
+    """Split SQL into one string per SELECT, with nested subqueries replaced by "(?)"."""
+    scopes, stack = [], [[]]
+    for char in sql:
+        if char == '(':
+            stack.append([])
+        elif char == ')' and len(stack) > 1:
+            text = ''.join(stack.pop())
+            if text.lstrip().upper().startswith(('SELECT', 'WITH')):
+                scopes.append(text)
+                stack[-1].append('(?)')
+            else:
+                stack[-1].append(f'({text})')
+        else:
+            stack[-1].append(char)
+    scopes.append(''.join(stack[0]))
+    return scopes
+
+
+def _top_level(text, keyword, start=0):
+    """Index of `keyword` outside parentheses, or -1."""
+    depth = 0
+    pattern = re.compile(rf'\s{keyword}\s', re.IGNORECASE)
+    for i in range(start, len(text)):
+        if text[i] == '(':
+            depth += 1
+        elif text[i] == ')':
+            depth -= 1
+        elif depth == 0 and pattern.match(text, i):
+            return i
+    return -1
+
+
+def _clause(scope, keyword):
+    """Text of a top-level clause up to the next clause keyword."""
+    start = _top_level(scope, keyword)
+    if start < 0:
+        return ''
+    start += len(keyword) + 2
+    ends = [_top_level(scope, other, start) for other in _CLAUSE_KEYWORDS if other != keyword]
+    ends = [end for end in ends if end >= 0]
+    return scope[start:min(ends)] if ends else scope[start:]
+
+
+def _split_top_level(text):
+    items, depth, current = [], 0, []
+    for char in text:
+        if char == ',' and depth == 0:
+            items.append(''.join(current))
+            current = []
+            continue
+        depth += char == '('
+        depth -= char == ')'
+        current.append(char)
+    items.append(''.join(current))
+    return [item.strip() for item in items if item.strip()]
+
+
+def _predicates(sql):
+    """
+    Return ({table: [(column, 'eq' | 'range')]}, {table: [column]}): the columns each table
+    is filtered on in WHERE clauses and sorted on in ORDER BY clauses, across subqueries.
+    """
+    filters, ordering = {}, {}
+    for scope in _scopes(sql):
+        aliases = {}
+        for match in _TABLE_ALIAS.finditer(scope):
+            aliases[match['table']] = match['table']
+            if match['alias']:
+                aliases[match['alias']] = match['table']
+
+        def resolve(match):
+            return aliases.get(match['table'] or match['alias'], match['table'])
+
+        for match in _COLUMN_PREDICATE.finditer(_UNSELECTIVE.sub('', _clause(scope, 'WHERE'))):
+            kind = 'eq' if match['op'].upper() in ('=', 'IN', 'IS') else 'range'
+            columns = filters.setdefault(resolve(match), [])
+            if (match['column'], kind) not in columns:
+                columns.append((match['column'], kind))
+
+        select_start = _top_level(' ' + scope, 'SELECT')
+        select_list = _split_top_level(_clause(' ' + scope, 'SELECT').split(' FROM ')[0]) if select_start >= 0 else []
+        for term in _split_top_level(_clause(scope, 'ORDER BY')):
+            term = re.sub(r'\s+(?:ASC|DESC)(?:\s+NULLS\s+(?:FIRST|LAST))?$', '', term, flags=re.IGNORECASE)
+            if term.isdigit() and int(term) <= len(select_list):
+                # Positional reference into the select list
+                term = re.sub(r'\s+AS\s+"\w+"$', '', select_list[int(term) - 1])
+            match = re.fullmatch(_COLUMN, term)
+            if match:
+                columns = ordering.setdefault(resolve(match), [])
+                if match['column'] not in columns:
+                    columns.append(match['column'])
+    return filters, ordering
+
+
+def _model_for_table(table):
+    for model in apps.get_models():
+        if model._meta.db_table == table:
+            return model
+    return None
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the queries behind analytics, recommendations and predictions and propose indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Timed executions per query; the median is reported'
+        )
+        parser.add_argument(
+            '--show-sql',
+            action='store_true',
+            help='Print each query and its plan'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'EXPLAIN parsing supports SQLite and PostgreSQL, not {connection.vendor}')
+
+        capture = self.capture_queries()
+        if not capture.queries:
+            raise CommandError('No queries captured; populate the database first (populate_sample_data)')
+
+        existing = self.existing_indexes()
+        proposals = {}
+        findings = []
+        with connection.cursor() as cursor:
+            for sql, entry in capture.queries.items():
+                plan = self.explain(cursor, sql, entry['params'])
+                scans, sorts = self.plan_issues(plan)
+                timings = []
+                for _ in range(max(options['repeat'], 1)):
+                    started = time.perf_counter()
+                    cursor.execute(sql, entry['params'])
+                    cursor.fetchall()
+                    timings.append((time.perf_counter() - started) * 1000)
+                finding = {
+                    'targets': entry['targets'],
+                    'ms': statistics.median(timings),
+                    'scans': scans,
+                    'sorts': sorts,
+                    'sql': sql,
+                    'plan': plan,
+                    'proposals': [],
+                }
+                for table, fields in self.propose(sql, scans, sorts, existing):
+                    proposals.setdefault((table, fields), []).extend(entry['targets'])
+                    finding['proposals'].append((table, fields))
+                findings.append(finding)
+
+        findings.sort(key=lambda finding: -finding['ms'])
+        for finding in findings:
+            flags = []
+            if finding['scans']:
+                flags.append('full scan of ' + ', '.join(finding['scans']))
+            if finding['sorts']:
+                flags.append('sort')
+            self.stdout.write(
+                f'{finding["ms"]:9.2f} ms  {", ".join(finding["targets"])}'
+                + (f'  [{"; ".join(flags)}]' if flags else '')
+            )
+            if options['show_sql']:
+                self.stdout.write(f'    {finding["sql"]}')
+                for line in finding['plan']:
+                    self.stdout.write(f'      {line}')
+
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS('No new indexes proposed'))
+            return
+        self.stdout.write('')
+        self.stdout.write(self.style.WARNING(f'{len(proposals)} proposed indexes:'))
+        for (table, fields), targets in sorted(proposals.items()):
+            model = _model_for_table(table)
+            name = f'{table.split("_", 1)[-1][:8]}_{"_".join(f[:8] for f in fields)}'[:26].rstrip('_') + '_idx'
+            self.stdout.write(
+                f'  {model.__name__ if model else table}: '
+                f'models.Index(fields={list(fields)!r}, name={name!r})  # {", ".join(sorted(set(targets)))}'
+            )
+
+    def capture_queries(self):
+        """Run every hot path once (rolled back) and collect the SELECTs they issue."""
+        customer = User.objects.filter(profile__role=Profile.ROLE_CUSTOMER).annotate(
+            total=Count('booked_services')
+        ).order_by('-total', 'id').first()
+        mechanic = User.objects.filter(profile__role=Profile.ROLE_MECHANIC).annotate(
+            total=Count('assigned_services')
+        ).order_by('-total', 'id').first()
+        vehicle = Vehicle.objects.filter(owner=customer).order_by('id').first()
+
+        targets = {
+            'analytics.monthly_service_counts': ServiceAnalytics.get_monthly_service_counts,
+            'analytics.service_status_distribution': ServiceAnalytics.get_service_status_distribution,
+            'analytics.service_type_distribution': ServiceAnalytics.get_service_type_distribution,
+            'analytics.mechanic_performance': ServiceAnalytics.get_mechanic_performance,
+            'analytics.manager_insights': ServiceAnalytics.get_manager_insights,
+            'analytics.report_rows': lambda: next(ReportGenerator.iter_report_rows(
+                ReportGenerator.filter_services(status=Service.STATUS_PENDING)
+            ), None),
+        }
+        if customer:
+            targets.update({
+                'analytics.customer_service_history': lambda: ServiceAnalytics.get_customer_service_history(customer),
+                'analytics.customer_insights': lambda: ServiceAnalytics.get_customer_insights(customer),
+                'predictions.refresh_predictions': lambda: ServicePredictor.refresh_predictions([customer.pk]),
+                'predictions.customer_predictions': lambda: ServicePredictor.get_customer_predictions(customer),
+            })
+        if mechanic:
+            targets['analytics.mechanic_insights'] = lambda: ServiceAnalytics.get_mechanic_insights(mechanic)
+        if vehicle:
+            targets.update({
+                'logic.calculate_health_score': lambda: calculate_health_score(vehicle),
+                'logic.get_recommendations': lambda: get_recommendations(vehicle),
+            })
+
+        capture = QueryCapture()
+        with transaction.atomic():
+            with connection.execute_wrapper(capture):
+                for name, target in targets.items():
+                    capture.target = name
+                    target()
+            # Prediction refreshes write; leave the database untouched
+            transaction.set_rollback(True)
+        return capture
+
+    def existing_indexes(self):
+        """{table: [column tuples]} for every index on the project's tables."""
+        indexes = {}
+        with connection.cursor() as cursor:
+            for model in apps.get_app_config('services').get_models():
+                table = model._meta.db_table
+                constraints = connection.introspection.get_constraints(cursor, table)
+                indexes[table] = [
+                    tuple(info['columns']) for info in constraints.values()
+                    if info['index'] or info['unique'] or info['primary_key']
+                ]
+        return indexes
+
+    def explain(self, cursor, sql, params):
+        """Query plan as a list of lines."""
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute('EXPLAIN ' + sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+    def plan_issues(self, plan):
+        """Tables read with a full scan, and whether the plan sorts."""
+        scans, sorts = [], False
+        for line in plan:
+            if connection.vendor == 'sqlite':
+                match = re.match(r'\s*SCAN (?:TABLE )?(\w+)', line)
+                if match and 'USING' not in line:
+                    scans.append(match.group(1))
+                if 'USE TEMP B-TREE' in line:
+                    sorts = True
+            else:
+                match = re.search(r'Seq Scan on (\w+)', line)
+                if match:
+                    scans.append(match.group(1))
+                if re.search(r'->\s+(?:Incremental )?Sort\b|^\s*Sort\b', line):
+                    sorts = True
+        return sorted(set(scans)), sorts
+
+    def propose(self, sql, scans, sorts, existing):
+        """
+        Composite index proposals: equality columns first, then one range or sort column.
+        Only tables that are scanned (or sorted) qualify, and indexes already covered
+        by an existing index prefix are skipped.
+        """
+        filters, ordering = _predicates(sql)
+        tables = set(scans)
+        if sorts:
+            tables |= set(ordering)
+        proposals = []
+        for table in sorted(tables):
+            model = _model_for_table(table)
+            if model is None or model._meta.app_label != 'services':
+                continue
+            eq = [column for column, kind in filters.get(table, []) if kind == 'eq']
+            tail = [column for column, kind in filters.get(table, []) if kind == 'range']
+            tail += ordering.get(table, []) if sorts else []
+            columns = list(dict.fromkeys(eq + [column for column in tail if column not in eq][:1]))
+            columns = [column for column in columns if column != model._meta.pk.column]
+            if not columns:
+                continue
+            if any(index[:len(columns)] == tuple(columns) for index in existing.get(table, [])):
+                continue
+            by_column = {field.column: field.name for field in model._meta.concrete_fields}
+            proposals.append((table, tuple(by_column.get(column, column) for column in columns)))
+        return proposals
@@ -0,0 +1,57 @@
+"""
+Management command to assign the unassigned pending backlog to the least-loaded
+mechanics in one transaction (see services.scheduler).
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.scheduler import auto_assign
+
+
+class Command(BaseCommand):
+    help = 'Assign every unassigned pending service to the mechanic with the lightest open workload'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--weighted',
+            action='store_true',
+            help='Weight each job by its service type\'s median time in progress instead of counting jobs'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Only assign the oldest N services'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute the assignment and report it without saving'
+        )
+        parser.add_argument(
+            '--per-mechanic',
+            action='store_true',
+            help='List the jobs assigned to and resulting load of each mechanic'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = auto_assign(weighted=options['weighted'], limit=options['limit'], dry_run=options['dry_run'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for label in ('load_before', 'load_after'):
+            spread = report[label]
+            self.stdout.write(
+                f"{label.replace('_', ' ').capitalize()}: min {spread['min']}, max {spread['max']}, "
+                f"mean {spread['mean']}, stdev {spread['stdev']}"
+            )
+        if options['per_mechanic']:
+            for row in report['per_mechanic']:
+                self.stdout.write(f"  {row['username']}: +{row['assigned']} jobs, load {row['load']}")
+
+        verb = 'Would assign' if report['dry_run'] else 'Assigned'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['assigned']} services across {report['mechanics']} mechanics in "
+            f"{report['seconds']}s ({report['jobs_per_second'] or 0} jobs/s, "
+            f"scheduling {report['schedule_jobs_per_second'] or 0} jobs/s)"
+        ))
@@ -0,0 +1,272 @@
+"""
+Management command that benchmarks the analytics, prediction and dashboard paths.
+Seeds a throwaway test database, times each target and prints JSON; --compare
+flags regressions against a previously saved run and --columnar adds the analytics
+targets answered from the columnar snapshot.
+"""
+
+import json
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection, reset_queries
+from django.db.models import Count
+from django.test import Client, override_settings
+
+from services import columnar
+from services.analytics import ServiceAnalytics
+from services.cost_stats import rebuild_cost_stats
+from services.logic import calculate_health_score, get_recommendations
+from services.models import Profile, ServiceRecord, Vehicle
+from services.predictions import ServicePredictor
+from services.rollups import rebuild_rollups
+from services.sample_data import SampleDataGenerator
+from services.turnaround import rebuild_turnaround_stats
+
+User = get_user_model()
+
+
+class QueryCounter:
+    """execute_wrapper that counts queries (no debug cursor, no 9000-query log cap)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark analytics, predictions and dashboards on a throwaway seeded database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--services',
+            type=int,
+            default=1000,
+            help='Number of services to seed (e.g. 1000, 100000, 1000000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed runs per target; the median is reported'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the generated data'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Also write the JSON results to this file (use it as a later --compare baseline)'
+        )
+        parser.add_argument(
+            '--compare',
+            type=str,
+            help='Baseline JSON file to compare against'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.25,
+            help='Relative wall-time increase that counts as a regression (default 0.25 = 25%%)'
+        )
+        parser.add_argument(
+            '--columnar',
+            action='store_true',
+            help='Also time the analytics targets against the columnar snapshot (requires numpy)'
+        )
+
+    def handle(self, *args, **options):
+        # Everything runs against a throwaway test database; like the test runner,
+        # keep the test client from closing the connection after each request
+        request_started.disconnect(reset_queries)
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seed_started = time.perf_counter()
+            subjects = self.seed(options['services'], options['seed'])
+            seed_seconds = time.perf_counter() - seed_started
+            results = self.run_benchmarks(self.targets(subjects), options['repeat'])
+            if options['columnar']:
+                results.update(self.run_columnar_benchmarks(subjects, options['repeat']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            request_started.connect(reset_queries)
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+
+        report = {
+            'scale': {
+                'services': options['services'],
+                'customers': subjects['customer_count'],
+                'mechanics': subjects['mechanic_count'],
+                'vehicles': subjects['vehicle_count'],
+                'service_records': subjects['record_count'],
+                'seed_seconds': round(seed_seconds, 2),
+            },
+            'environment': {
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'repeat': options['repeat'],
+            },
+            'results': results,
+        }
+
+        regressions = []
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as fh:
+                baseline = json.load(fh)
+            regressions = self.compare(baseline, results, options['threshold'])
+            report['regressions'] = regressions
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                fh.write(output)
+        self.stdout.write(output)
+
+        if regressions:
+            raise CommandError(f'{len(regressions)} benchmark regressions against {options["compare"]}')
+
+    def seed(self, service_count, seed):
+        """Generate a realistic dataset with the sample data generator, then rebuild derived tables."""
+        generator = SampleDataGenerator(services=service_count, seed=seed, prefix='bench')
+        manager = User.objects.create_user(username='benchmanager', first_name='Bench', last_name='Manager')
+        Profile.objects.filter(user=manager).update(role=Profile.ROLE_MANAGER)
+        vehicle_count = generator.create_people()
+        generator.create_services(generator.load_pools())
+
+        # bulk_create skips signals, so rebuild the derived tables
+        rebuild_rollups()
+        rebuild_cost_stats()
+        rebuild_turnaround_stats()
+
+        # Benchmark the busiest customer and mechanic
+        customer = User.objects.filter(profile__role=Profile.ROLE_CUSTOMER).annotate(
+            total=Count('booked_services')
+        ).order_by('-total', 'id').first()
+        mechanic = User.objects.filter(profile__role=Profile.ROLE_MECHANIC).annotate(
+            total=Count('assigned_services')
+        ).order_by('-total', 'id').first()
+
+        return {
+            'manager': User.objects.get(pk=manager.pk),
+            'customer': customer,
+            'mechanic': mechanic,
+            'vehicle': Vehicle.objects.filter(owner=customer).order_by('id').first(),
+            'customer_count': generator.customers,
+            'mechanic_count': generator.mechanics,
+            'vehicle_count': vehicle_count,
+            'record_count': ServiceRecord.objects.count(),
+        }
+
+    def targets(self, subjects):
+        customer, mechanic, vehicle = subjects['customer'], subjects['mechanic'], subjects['vehicle']
+
+        def page(user, url):
+            client = Client()
+            client.force_login(user)
+
+            def get():
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned {response.status_code}')
+            return get
+
+        return {
+            'analytics.monthly_service_counts': ServiceAnalytics.get_monthly_service_counts,
+            'analytics.service_status_distribution': ServiceAnalytics.get_service_status_distribution,
+            'analytics.service_type_distribution': ServiceAnalytics.get_service_type_distribution,
+            'analytics.mechanic_performance': ServiceAnalytics.get_mechanic_performance,
+            'analytics.customer_service_history': lambda: ServiceAnalytics.get_customer_service_history(customer),
+            'analytics.manager_insights': ServiceAnalytics.get_manager_insights,
+            'analytics.mechanic_insights': lambda: ServiceAnalytics.get_mechanic_insights(mechanic),
+            'analytics.customer_insights': lambda: ServiceAnalytics.get_customer_insights(customer),
+            'predictions.customer_predictions': lambda: ServicePredictor.get_customer_predictions(customer),
+            'logic.calculate_health_score': lambda: calculate_health_score(vehicle),
+            'logic.get_recommendations': lambda: get_recommendations(vehicle),
+            'view.dashboard_customer': page(customer, '/dashboard/customer/'),
+            'view.dashboard_mechanic': page(mechanic, '/dashboard/mechanic/'),
+            'view.dashboard_manager': page(subjects['manager'], '/dashboard/manager/'),
+            'view.analytics_manager': page(subjects['manager'], '/analytics/manager/'),
+            'view.analytics_customer': page(customer, '/analytics/customer/'),
+            'view.analytics_mechanic': page(mechanic, '/analytics/mechanic/'),
+        }
+
+    def run_columnar_benchmarks(self, subjects, repeat):
+        """Time the analytics targets with ServiceAnalytics reading a freshly built columnar snapshot."""
+        targets = {
+            name.replace('analytics.', 'columnar.', 1): target
+            for name, target in self.targets(subjects).items() if name.startswith('analytics.')
+        }
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            ANALYTICS_SNAPSHOT_DIR=directory, ANALYTICS_SNAPSHOT_REFRESH_SECONDS=3600
+        ):
+            try:
+                started = time.perf_counter()
+                columnar.refresh(directory, full=True)
+            except ImportError:
+                raise CommandError('--columnar requires numpy')
+            self.stderr.write(f'columnar snapshot built in {time.perf_counter() - started:.2f}s')
+            return self.run_benchmarks(targets, repeat)
+
+    def run_benchmarks(self, targets, repeat):
+        results = {}
+        for name, target in targets.items():
+            # Warm-up run doubles as the query count and peak memory measurement
+            queries = QueryCounter()
+            tracemalloc.start()
+            with connection.execute_wrapper(queries):
+                target()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            timings = []
+            for _ in range(max(repeat, 1)):
+                started = time.perf_counter()
+                target()
+                timings.append((time.perf_counter() - started) * 1000)
+
+            results[name] = {
+                'wall_ms': round(statistics.median(timings), 3),
+                'min_ms': round(min(timings), 3),
+                'queries': queries.count,
+                'peak_kb': round(peak / 1024, 1),
+            }
+            self.stderr.write(f'{name}: {results[name]["wall_ms"]} ms, {queries.count} queries')
+        return results
+
+    def compare(self, baseline, results, threshold):
+        """List targets whose wall time or query count got worse than the baseline."""
+        regressions = []
+        for name, current in results.items():
+            previous = baseline.get('results', {}).get(name)
+            if not previous:
+                continue
+            if current['wall_ms'] > previous['wall_ms'] * (1 + threshold):
+                regressions.append({
+                    'target': name,
+                    'metric': 'wall_ms',
+                    'baseline': previous['wall_ms'],
+                    'current': current['wall_ms'],
+                })
+            if current['queries'] > previous['queries']:
+                regressions.append({
+                    'target': name,
+                    'metric': 'queries',
+                    'baseline': previous['queries'],
+                    'current': current['queries'],
+                })
+        return regressions
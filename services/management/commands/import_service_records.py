@@ -0,0 +1,104 @@
+"""
+Management command that bulk-imports ServiceRecords from CSV or JSONL files
+(see services.record_import). Imports a file, resumes a failed import from its
+checkpoint, or runs the imports queued through the manager upload endpoint.
+Files are copied into the database first, so any host can resume an import.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.models import RecordImport
+from services.record_import import claim_next_import, create_import, resume_import, run_import
+
+
+class Command(BaseCommand):
+    help = 'Stream ServiceRecords from a CSV or JSONL file into the database in checkpointed chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            help='CSV or JSONL file; columns registration_number and/or vin, service_date, odometer_reading, '
+                 'optional parts_cost, labor_cost, mechanic (username), issues_reported, work_done, parts_replaced'
+        )
+        parser.add_argument(
+            '--format',
+            choices=[value for value, _ in RecordImport.FORMAT_CHOICES],
+            help='File format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Rows inserted and checkpointed per transaction (default: RECORD_IMPORT_CHUNK_SIZE)'
+        )
+        parser.add_argument(
+            '--resume',
+            type=int,
+            metavar='IMPORT_ID',
+            help='Continue an unfinished import from its last checkpoint'
+        )
+        parser.add_argument(
+            '--queued',
+            action='store_true',
+            help='Run the imports queued by manager uploads, then exit'
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if sum(bool(options[name]) for name in ('path', 'resume', 'queued')) != 1:
+            raise CommandError('Give exactly one of a file path, --resume IMPORT_ID or --queued')
+
+        if options['queued']:
+            processed = 0
+            while True:
+                job = claim_next_import()
+                if job is None:
+                    break
+                self.run(job, options['chunk_size'], fail=False)
+                processed += 1
+            self.stdout.write(f'Processed {processed} queued imports')
+            return
+
+        try:
+            if options['resume']:
+                job = resume_import(options['resume'])
+            else:
+                with open(options['path'], 'rb') as fileobj:
+                    job = create_import(options['path'], fileobj, options['format'], claim=True)
+        except RecordImport.DoesNotExist:
+            raise CommandError(f"Import #{options['resume']} does not exist")
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        self.run(job, options['chunk_size'])
+
+    def run(self, job, chunk_size, fail=True):
+        start = f'row {job.rows_read + 1}' if job.rows_read else 'the start'
+        name = job.file.name if job.file else 'missing file'
+        self.stdout.write(f'Importing #{job.pk} {name} ({job.format}) from {start}')
+
+        def progress(counters):
+            if self.verbosity >= 2:
+                self.stdout.write(
+                    f"  {counters['rows_read']} rows read, {counters['rows_inserted']} inserted, "
+                    f"{counters['rows_rejected']} rejected ({counters['rows_per_second'] or 0} rows/s)"
+                )
+
+        job = run_import(job, chunk_size, progress)
+        if job.status == RecordImport.STATUS_RUNNING:
+            self.stdout.write(self.style.WARNING(f'Import #{job.pk} was reclaimed by another worker after its lease expired'))
+            return
+        for rejection in job.rejections[:10]:
+            self.stdout.write(f"  row {rejection['row']}: {rejection['error']}")
+        if job.rows_rejected > 10:
+            self.stdout.write(f'  ... {job.rows_rejected - 10} more rejected rows')
+
+        if job.status != RecordImport.STATUS_DONE:
+            message = f'Import #{job.pk} failed after {job.rows_read} rows: {job.error}; resume with --resume {job.pk}'
+            if fail:
+                raise CommandError(message)
+            self.stdout.write(self.style.ERROR(message))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Import #{job.pk}: {job.rows_inserted} records inserted, {job.rows_rejected} rows rejected '
+            f'of {job.rows_read} ({job.rows_per_second or 0} rows/s)'
+        ))
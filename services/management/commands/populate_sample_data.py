@@ -1,18 +1,37 @@
 """
 Management command to populate the database with sample data for testing analytics.
+Uses the chunked bulk generator in services.sample_data, so it scales from a demo
+dataset to millions of services for load testing.
 """
 
-from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
-from django.utils import timezone
-from datetime import datetime, timedelta
+import multiprocessing
 import random
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
 
-from services.models import Profile, Service, Vehicle
+from services import dashboard_snapshots, response_cache
+from services.cost_stats import rebuild_cost_stats
+from services.models import Profile
+from services.rollups import rebuild_rollups
+from services.sample_data import SampleDataGenerator
+from services.turnaround import rebuild_turnaround_stats
+from services.user_search import rebuild_index as rebuild_user_search_index
 
 User = get_user_model()
 
 
+def _generate_range(generator, start, stop):
+    """Worker process entry point: create services for item indices [start, stop)."""
+    try:
+        return generator.create_services(generator.load_pools(), start, stop)
+    finally:
+        connections.close_all()
+
+
 class Command(BaseCommand):
     help = 'Populate database with sample data for analytics testing'
 
@@ -23,38 +42,140 @@ class Command(BaseCommand):
             default=50,
             help='Number of sample services to create'
         )
+        parser.add_argument(
+            '--customers',
+            type=int,
+            help='Number of customers to create (default: count / 20, at least 10)'
+        )
+        parser.add_argument(
+            '--mechanics',
+            type=int,
+            help='Number of mechanics to create (default: count / 1000, at least 3)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed; the same seed and chunk size produce the same data'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=730,
+            help='Spread service creation dates over this many past days'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Rows per bulk insert and transaction'
+        )
+        parser.add_argument(
+            '--prefix',
+            type=str,
+            default='sample',
+            help='Username, VIN and registration prefix for generated rows'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes generating services in parallel (PostgreSQL only)'
+        )
+        parser.add_argument(
+            '--range',
+            type=str,
+            help='Only generate services START:STOP (item indices) against existing generated users'
+        )
+        parser.add_argument(
+            '--skip-rebuild',
+            action='store_true',
+            help='Do not rebuild rollups, cost and turnaround statistics, predictions and the search index afterwards'
+        )
 
     def handle(self, *args, **options):
         count = options['count']
-        
-        self.stdout.write(f'Creating {count} sample services...')
-        
-        # Create sample users if they don't exist
-        self.create_sample_users()
-        
-        # Get existing users
-        customers = User.objects.filter(profile__role=Profile.ROLE_CUSTOMER)
-        mechanics = User.objects.filter(profile__role=Profile.ROLE_MECHANIC)
-        
-        if not customers.exists():
-            self.stdout.write(self.style.ERROR('No customers found. Please create some users first.'))
-            return
-            
-        if not mechanics.exists():
-            self.stdout.write(self.style.ERROR('No mechanics found. Please create some users first.'))
+        generator = SampleDataGenerator(
+            services=count,
+            customers=options['customers'],
+            mechanics=options['mechanics'],
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            days=options['days'],
+            prefix=options['prefix'],
+        )
+        started = time.monotonic()
+
+        if options['range']:
+            # One slice of a split run: users and vehicles already exist
+            try:
+                start, stop = (int(part) for part in options['range'].split(':'))
+            except ValueError:
+                raise CommandError('--range must look like START:STOP')
+            created = generator.create_services(generator.load_pools(), start, stop)
+            self.stdout.write(self.style.SUCCESS(
+                f'Created {created} services for range {start}:{stop} in {time.monotonic() - started:.1f}s'
+            ))
             return
-        
-        # Create sample vehicles for customers
-        self.create_sample_vehicles(customers)
-        
-        # Create sample services
-        self.create_sample_services(customers, mechanics, count)
-        
+
+        if generator.prefix_in_use():
+            raise CommandError(
+                f'Users or vehicles generated with prefix "{generator.prefix}" already exist; pass a different --prefix'
+            )
+
+        self.stdout.write(f'Creating {count} sample services...')
+
+        # Create the named demo logins if they don't exist
+        self.create_sample_users(random.Random(options['seed']))
+
+        vehicles = generator.create_people()
         self.stdout.write(
-            self.style.SUCCESS(f'Successfully created {count} sample services!')
+            f'Created {generator.customers} customers, {generator.mechanics} mechanics and {vehicles} vehicles'
         )
 
-    def create_sample_users(self):
+        created = self.create_services(generator, options['workers'])
+
+        if not options['skip_rebuild']:
+            # bulk_create skips the signals that maintain derived tables
+            self.stdout.write('Rebuilding rollups, cost and turnaround statistics, predictions and the user search index...')
+            rebuild_rollups()
+            rebuild_cost_stats()
+            rebuild_turnaround_stats()
+            rebuild_user_search_index()
+            call_command('refresh_service_predictions', stdout=self.stdout)
+            response_cache.bump_data_version()
+            dashboard_snapshots.invalidate_all()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully created {created} sample services in {time.monotonic() - started:.1f}s!')
+        )
+
+    def create_services(self, generator, workers):
+        """Generate services, splitting the index range across worker processes."""
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite allows a single writer; generating in one process'))
+            workers = 1
+        if workers <= 1:
+            return generator.create_services(generator.load_pools())
+
+        # Split on chunk boundaries so each chunk (and its RNG) belongs to one worker
+        chunks = len(generator.chunks(generator.services))
+        per_worker = -(-chunks // workers)
+        ranges = [
+            (generator, first * generator.chunk_size, min((first + per_worker) * generator.chunk_size, generator.services))
+            for first in range(0, chunks, per_worker)
+        ]
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            raise CommandError('--workers needs the fork start method; use --range in separate processes instead')
+
+        # Children must open their own connections
+        connections.close_all()
+        with context.Pool(len(ranges)) as pool:
+            return sum(pool.starmap(_generate_range, ranges))
+
+    def create_sample_users(self, rng):
         """Create sample users if they don't exist."""
         # Create a manager
         if not User.objects.filter(username='manager').exists():
@@ -65,7 +186,7 @@ class Command(BaseCommand):
                 first_name='Alice',
                 last_name='Manager'
             )
-            Profile.objects.get_or_create(
+            Profile.objects.update_or_create(
                 user=manager,
                 defaults={
                     'role': Profile.ROLE_MANAGER,
@@ -82,24 +203,6 @@ class Command(BaseCommand):
             ('bob_wilson', 'bob@example.com', 'Bob', 'Wilson'),
             ('alice_brown', 'alice@example.com', 'Alice', 'Brown'),
         ]
-        
-        for username, email, first_name, last_name in customer_data:
-            if not User.objects.filter(username=username).exists():
-                user = User.objects.create_user(
-                    username=username,
-                    email=email,
-                    password='password123',
-                    first_name=first_name,
-                    last_name=last_name
-                )
-                Profile.objects.get_or_create(
-                    user=user,
-                    defaults={
-                        'role': Profile.ROLE_CUSTOMER,
-                        'phone': f'555-{random.randint(1000, 9999)}',
-                        'address': f'{random.randint(100, 999)} Customer St'
-                    }
-                )
 
         # Create sample mechanics
         mechanic_data = [
@@ -107,79 +210,22 @@ class Command(BaseCommand):
             ('sarah_tech', 'sarah@example.com', 'Sarah', 'Davis'),
             ('tom_repair', 'tom@example.com', 'Tom', 'Wilson'),
         ]
-        
-        for username, email, first_name, last_name in mechanic_data:
-            if not User.objects.filter(username=username).exists():
-                user = User.objects.create_user(
-                    username=username,
-                    email=email,
-                    password='password123',
-                    first_name=first_name,
-                    last_name=last_name
-                )
-                Profile.objects.get_or_create(
-                    user=user,
-                    defaults={
-                        'role': Profile.ROLE_MECHANIC,
-                        'phone': f'555-{random.randint(1000, 9999)}',
-                        'address': f'{random.randint(100, 999)} Mechanic St'
-                    }
-                )
-
-    def create_sample_vehicles(self, customers):
-        """Create sample vehicles for customers."""
-        makes = ['Toyota', 'Honda', 'Ford', 'BMW', 'Mercedes', 'Audi', 'Nissan', 'Hyundai']
-        models = ['Camry', 'Civic', 'Focus', 'X3', 'C-Class', 'A4', 'Altima', 'Elantra']
-        
-        for customer in customers:
-            if not customer.vehicles.exists():
-                make = random.choice(makes)
-                model = random.choice(models)
-                year = random.randint(2015, 2023)
-                
-                Vehicle.objects.create(
-                    owner=customer,
-                    make=make,
-                    model=model,
-                    year=year,
-                    vin=f'VIN{random.randint(100000, 999999)}',
-                    registration_number=f'REG{random.randint(1000, 9999)}',
-                    mileage=random.randint(10000, 100000)
-                )
-
-    def create_sample_services(self, customers, mechanics, count):
-        """Create sample services with realistic data."""
-        service_types = [
-            Service.SERVICE_OIL_CHANGE,
-            Service.SERVICE_TYRE_REPLACEMENT,
-            Service.SERVICE_BRAKE_INSPECTION,
-            Service.SERVICE_GENERAL_CHECKUP,
-        ]
-        
-        statuses = [
-            Service.STATUS_PENDING,
-            Service.STATUS_IN_PROGRESS,
-            Service.STATUS_COMPLETED,
-        ]
-        
-        # Create services over the last 12 months
-        now = timezone.now()
-        start_date = now - timedelta(days=365)
-        
-        for i in range(count):
-            # Random date within the last year
-            days_ago = random.randint(0, 365)
-            created_at = now - timedelta(days=days_ago)
-            
-            # Create service
-            service = Service.objects.create(
-                customer=random.choice(customers),
-                service_type=random.choice(service_types),
-                status=random.choice(statuses),
-                created_at=created_at
-            )
-            
-            # Assign mechanic for some services
-            if random.random() > 0.3:  # 70% chance of being assigned
-                service.assigned_mechanic = random.choice(mechanics)
-                service.save()
+
+        for role, people in ((Profile.ROLE_CUSTOMER, customer_data), (Profile.ROLE_MECHANIC, mechanic_data)):
+            for username, email, first_name, last_name in people:
+                if not User.objects.filter(username=username).exists():
+                    user = User.objects.create_user(
+                        username=username,
+                        email=email,
+                        password='password123',
+                        first_name=first_name,
+                        last_name=last_name
+                    )
+                    Profile.objects.update_or_create(
+                        user=user,
+                        defaults={
+                            'role': role,
+                            'phone': f'555-{rng.randint(1000, 9999)}',
+                            'address': f'{rng.randint(100, 999)} {role.title()} St'
+                        }
+                    )
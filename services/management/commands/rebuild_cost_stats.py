@@ -0,0 +1,17 @@
+"""
+Management command to backfill or repair the CostStatistic table.
+"""
+
+from django.core.management.base import BaseCommand
+
+from services.cost_stats import rebuild_cost_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the running ServiceRecord cost statistics'
+
+    def handle(self, *args, **options):
+        segments = rebuild_cost_stats()
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt cost statistics for {segments} segments!')
+        )
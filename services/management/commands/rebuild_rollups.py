@@ -0,0 +1,48 @@
+"""
+Management command to backfill or repair the ServiceRollup analytics table.
+"""
+
+from django.core.management.base import BaseCommand
+
+from services.models import Service, ServiceRollup
+from services.rollups import grouped_counts, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ServiceRollup table from the Service table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report rollup rows that disagree with the Service table'
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            expected = grouped_counts(Service.objects.all())
+            stored = {}
+            for row in ServiceRollup.objects.exclude(count=0):
+                key = (row.month, row.status, row.service_type, row.assigned_mechanic_id)
+                stored[key] = row.count
+
+            drifted = [
+                key for key in set(expected) | set(stored)
+                if expected.get(key, 0) != stored.get(key, 0)
+            ]
+            if drifted:
+                for month, status, service_type, mechanic_id in sorted(drifted, key=str):
+                    key = (month, status, service_type, mechanic_id)
+                    self.stdout.write(
+                        f'{month:%Y-%m} {service_type}/{status} mechanic={mechanic_id}: '
+                        f'stored {stored.get(key, 0)}, expected {expected.get(key, 0)}'
+                    )
+                self.stdout.write(self.style.WARNING(f'{len(drifted)} rollup rows out of date'))
+            else:
+                self.stdout.write(self.style.SUCCESS('Rollups are up to date'))
+            return
+
+        rows = rebuild_rollups()
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt {rows} rollup rows!')
+        )
@@ -0,0 +1,18 @@
+"""
+Management command to backfill or repair the TurnaroundStatistic table
+by replaying the ServiceStatusEvent log.
+"""
+
+from django.core.management.base import BaseCommand
+
+from services.turnaround import rebuild_turnaround_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the turnaround statistics from the service status event log'
+
+    def handle(self, *args, **options):
+        rows = rebuild_turnaround_stats()
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt {rows} turnaround statistics!')
+        )
@@ -0,0 +1,25 @@
+"""
+Management command to rebuild the user search index.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from services.user_search import fts_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SQLite FTS user search table from auth_user (after bulk imports)'
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'postgresql':
+            self.stdout.write('PostgreSQL maintains its search index itself; nothing to rebuild')
+            return
+        if not fts_available():
+            self.stdout.write(self.style.WARNING('No FTS table on this database; search uses icontains'))
+            return
+
+        indexed = rebuild_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully indexed {indexed} users!')
+        )
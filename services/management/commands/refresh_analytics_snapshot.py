@@ -0,0 +1,40 @@
+"""
+Management command to build or incrementally refresh the columnar analytics snapshot.
+Run it from cron (or after bulk loads) so web requests rarely refresh it themselves.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from services import columnar
+
+
+class Command(BaseCommand):
+    help = 'Refresh the columnar Service snapshot in ANALYTICS_SNAPSHOT_DIR'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Rebuild the snapshot from scratch instead of applying changes since the last refresh'
+        )
+        parser.add_argument(
+            '--dir',
+            type=str,
+            help='Snapshot directory (default: ANALYTICS_SNAPSHOT_DIR)'
+        )
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or settings.ANALYTICS_SNAPSHOT_DIR
+        if not directory:
+            raise CommandError('Set ANALYTICS_SNAPSHOT_DIR or pass --dir')
+        try:
+            started = time.monotonic()
+            rows = columnar.refresh(directory, full=options['rebuild'])
+        except ImportError:
+            raise CommandError('The columnar snapshot requires numpy (pip install numpy)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot refreshed ({rows} services read) in {time.monotonic() - started:.1f}s'
+        ))
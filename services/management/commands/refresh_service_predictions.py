@@ -0,0 +1,73 @@
+"""
+Management command to refresh precomputed next-service-date predictions.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+from django.contrib.auth import get_user_model
+
+from services.models import Service, ServicePrediction
+from services.predictions import ServicePredictor
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Refresh ServicePrediction rows for customers whose services changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Refresh every customer with services, not just stale or missing ones'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Customers refreshed per query'
+        )
+        parser.add_argument(
+            '--budget',
+            type=float,
+            default=0,
+            help='Stop starting new batches after this many seconds (0 = no limit)'
+        )
+
+    def pending_customer_ids(self, refresh_all, after_id):
+        """Customers needing a refresh, in id order after `after_id`."""
+        customers = User.objects.filter(
+            Exists(Service.objects.filter(customer=OuterRef('pk')))
+        )
+        if not refresh_all:
+            customers = customers.exclude(
+                Exists(ServicePrediction.objects.filter(customer=OuterRef('pk'), is_stale=False))
+            )
+        stale_without_services = ServicePrediction.objects.filter(is_stale=True).exclude(
+            Exists(Service.objects.filter(customer=OuterRef('customer_id')))
+        ).values_list('customer_id', flat=True)
+        customers = customers | User.objects.filter(pk__in=stale_without_services)
+        return customers.filter(pk__gt=after_id).order_by('pk').values_list('pk', flat=True)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        budget = options['budget']
+        batch_size = options['batch_size']
+        refreshed = 0
+        last_id = 0
+
+        while True:
+            if budget and time.monotonic() - started >= budget:
+                self.stdout.write(self.style.WARNING('Time budget reached; remaining customers left for the next run'))
+                break
+            batch = list(self.pending_customer_ids(options['all'], last_id)[:batch_size])
+            if not batch:
+                break
+            refreshed += ServicePredictor.refresh_predictions(batch)
+            last_id = batch[-1]
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Refreshed predictions for {refreshed} customers in {time.monotonic() - started:.1f}s')
+        )
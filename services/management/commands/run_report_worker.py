@@ -0,0 +1,58 @@
+"""
+Management command that processes queued background report exports.
+Jobs left running by a crashed worker are requeued once their lease expires.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.report_jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Claim queued ReportJobs and generate their CSV/XLSX files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs currently queued, then exit'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty'
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=0,
+            help='Exit after processing this many jobs (0 = no limit)'
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        self.stdout.write('Report worker started')
+
+        while not options['max_jobs'] or processed < options['max_jobs']:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write(f'Running report job #{job.pk} ({job.format})')
+            job = run_job(job)
+            processed += 1
+
+            if job.status == job.STATUS_DONE:
+                self.stdout.write(self.style.SUCCESS(f'Job #{job.pk} finished: {job.rows_written} rows'))
+            elif job.status != job.STATUS_FAILED:
+                self.stdout.write(self.style.WARNING(f'Job #{job.pk} was reclaimed after its lease expired'))
+            else:
+                self.stdout.write(self.style.ERROR(f'Job #{job.pk} failed: {job.error}'))
+
+        self.stdout.write(f'Processed {processed} report jobs')
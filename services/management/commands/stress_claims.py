@@ -0,0 +1,192 @@
+"""
+Management command that stress-tests concurrent job claiming (see services.service_updates).
+Seeds a throwaway test database with mechanics and an unassigned pending backlog, lets
+one thread per mechanic call claim_next_job until the backlog is empty, then checks that
+every service went to exactly one mechanic and prints JSON with the claim throughput.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from services.models import Profile, Service, ServiceStatusEvent
+from services.rollups import rebuild_rollups
+from services.service_updates import claim_next_job
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Claim a backlog with many concurrent mechanics on a throwaway database and check for double assignments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=50,
+            help='Concurrent claiming mechanics, one thread and database connection each'
+        )
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=2000,
+            help='Unassigned pending services to seed'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Also write the JSON results to this file'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['jobs'] < 1:
+            raise CommandError('--workers and --jobs must be positive')
+
+        test_settings = connection.settings_dict['TEST']
+        original_test_name = test_settings.get('NAME')
+        tmpdir = None
+        if connection.vendor == 'sqlite':
+            # The default in-memory test database is shared between threads through one
+            # cache and fails lock waits immediately; a file behaves like production
+            tmpdir = tempfile.TemporaryDirectory()
+            test_settings['NAME'] = os.path.join(tmpdir.name, 'stress_claims.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            mechanics = self.seed(options['workers'], options['jobs'])
+            report = self.run_workers(mechanics)
+            report.update(self.verify(report.pop('claims'), options['jobs']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings['NAME'] = original_test_name
+            if tmpdir is not None:
+                tmpdir.cleanup()
+
+        report = {
+            'workers': options['workers'],
+            'jobs': options['jobs'],
+            'database': connection.vendor,
+            'strategy': 'skip_locked' if connection.features.has_select_for_update_skip_locked else 'compare_and_set',
+            **report,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                fh.write(output)
+        self.stdout.write(output)
+
+        if report['double_assignments'] or report['unclaimed'] or report['errors']:
+            raise CommandError(
+                f"{report['double_assignments']} double assignments, {report['unclaimed']} unclaimed jobs, "
+                f"{len(report['errors'])} errors"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['claimed']} jobs claimed by {report['workers']} workers in {report['seconds']}s "
+            f"({report['claims_per_second']} claims/s), no double assignments"
+        ))
+
+    def seed(self, workers, jobs):
+        """Mechanics plus one customer's unassigned pending backlog."""
+        mechanics = []
+        for i in range(workers):
+            mechanic = User.objects.create_user(username=f'stress_mechanic_{i}')
+            Profile.objects.filter(user=mechanic).update(role=Profile.ROLE_MECHANIC)
+            mechanics.append(mechanic)
+        customer = User.objects.create_user(username='stress_customer')
+
+        now = timezone.now()
+        types = [service_type for service_type, _ in Service.SERVICE_TYPE_CHOICES]
+        services = Service.objects.bulk_create([
+            Service(customer=customer, service_type=types[i % len(types)], status=Service.STATUS_PENDING)
+            for i in range(jobs)
+        ], batch_size=1000)
+        # auto_now_add stamps one time; spread the bookings out so claim order is by age
+        for i, service in enumerate(services):
+            service.created_at = now - timezone.timedelta(minutes=jobs - i)
+        Service.objects.bulk_update(services, ['created_at'], batch_size=1000)
+        # bulk_create skips signals
+        rebuild_rollups()
+        return mechanics
+
+    def run_workers(self, mechanics):
+        """One thread per mechanic claiming until nothing is left; returns timings and claims."""
+        claims, errors = [], []
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(mechanics))
+
+        def work(mechanic):
+            mine = []
+            try:
+                barrier.wait()
+                while True:
+                    try:
+                        service = claim_next_job(mechanic)
+                    except Exception as e:
+                        with lock:
+                            errors.append(f"{mechanic.username}: {e}")
+                        continue
+                    if service is None:
+                        # Lost every candidate to other claimers; stop only when the backlog is empty
+                        if not Service.objects.filter(
+                            status=Service.STATUS_PENDING, assigned_mechanic__isnull=True
+                        ).exists():
+                            break
+                        continue
+                    mine.append((service.pk, mechanic.pk))
+            finally:
+                with lock:
+                    claims.extend(mine)
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(mechanic,)) for mechanic in mechanics]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+
+        per_worker = Counter(mechanic_id for _, mechanic_id in claims)
+        return {
+            'claimed': len(claims),
+            'seconds': round(seconds, 3),
+            'claims_per_second': round(len(claims) / seconds, 1) if seconds else None,
+            'claims_per_worker': {
+                'min': min((per_worker[m.pk] for m in mechanics), default=0),
+                'max': max((per_worker[m.pk] for m in mechanics), default=0),
+            },
+            'errors': errors[:20],
+            'claims': claims,
+        }
+
+    def verify(self, claims, jobs):
+        """
+        Cross-check the claims three ways: no service returned to two claimers, every
+        service's stored mechanic is its claimer, and one assignment event per service.
+        """
+        claimed_by = {}
+        double = set()
+        for service_id, mechanic_id in claims:
+            if service_id in claimed_by:
+                double.add(service_id)
+            claimed_by[service_id] = mechanic_id
+
+        stored = dict(Service.objects.values_list('pk', 'assigned_mechanic_id'))
+        double.update(pk for pk, mechanic_id in claimed_by.items() if stored.get(pk) != mechanic_id)
+        assignment_events = Counter(ServiceStatusEvent.objects.filter(
+            previous_mechanic__isnull=True, mechanic__isnull=False
+        ).values_list('service_id', flat=True))
+        double.update(pk for pk, count in assignment_events.items() if count > 1)
+
+        return {
+            'double_assignments': len(double),
+            'unclaimed': sum(1 for mechanic_id in stored.values() if mechanic_id is None),
+            'assignment_events': sum(assignment_events.values()),
+        }
@@ -0,0 +1,101 @@
+"""
+In-process request metrics exposed in the Prometheus text format.
+Histograms are kept per URL name (bounded cardinality) in module state guarded by a
+lock. Each server process keeps its own registry, so scrape every worker or run a
+single worker per target.
+"""
+
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by URL name', LATENCY_BUCKETS),
+    'http_request_db_queries': ('histogram', 'Database queries per request by URL name', QUERY_BUCKETS),
+    'http_request_db_seconds': ('histogram', 'Database time per request by URL name', LATENCY_BUCKETS),
+    'http_requests_total': ('counter', 'Requests by URL name, method and status', None),
+    'http_request_n_plus_one_total': ('counter', 'Requests flagged with a repeated-query (N+1) pattern', None),
+}
+
+
+def _observe(name, labels, value):
+    buckets = METRICS[name][2]
+    key = (name, labels)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            histogram['buckets'][i] += 1
+    histogram['sum'] += value
+    histogram['count'] += 1
+
+
+def _increment(name, labels, amount=1):
+    key = (name, labels)
+    _counters[key] = _counters.get(key, 0) + amount
+
+
+def record_request(view, method, status, duration, queries, db_time, n_plus_one):
+    """Record one finished request."""
+    labels = (('view', view),)
+    with _lock:
+        _observe('http_request_duration_seconds', labels, duration)
+        _observe('http_request_db_queries', labels, queries)
+        _observe('http_request_db_seconds', labels, db_time)
+        _increment('http_requests_total', labels + (('method', method), ('status', str(status))))
+        if n_plus_one:
+            _increment('http_request_n_plus_one_total', labels)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {key: dict(value, buckets=list(value['buckets'])) for key, value in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(buckets, histogram['buckets']):
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {count}')
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {histogram["count"]}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_number(histogram["sum"])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+        else:
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,92 @@
+"""
+Per-request database instrumentation.
+Counts queries and database time through connection execute wrappers, flags
+N+1 patterns (the same SQL template repeated many times in one request), adds a
+Server-Timing header and feeds the Prometheus metrics in services.metrics.
+"""
+
+import logging
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Collapse IN (...) lists and VALUES rows of any length into one template
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_VALUES_ROWS = re.compile(r'(\(%s\))(?:\s*,\s*\(%s\))+')
+
+
+def sql_template(sql):
+    """Normalise SQL so queries differing only in list lengths group together."""
+    sql = _PLACEHOLDER_LIST.sub('(%s, ...)', sql)
+    return _VALUES_ROWS.sub(r'\1, ...', sql)
+
+
+class QueryRecorder:
+    """execute_wrapper that counts queries, their time and their SQL templates."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.templates = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            template = sql_template(sql)
+            self.templates[template] = self.templates.get(template, 0) + 1
+
+    def repeated(self, threshold):
+        """SQL templates executed at least `threshold` times, most frequent first."""
+        return sorted(
+            ((template, count) for template, count in self.templates.items() if count >= threshold),
+            key=lambda item: -item[1],
+        )
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Measure database usage per request.
+    Streaming responses are measured up to the point the view returns, so queries
+    issued while the body streams are not included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_INSTRUMENTATION_ENABLED', True):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        repeated = recorder.repeated(settings.QUERY_N_PLUS_ONE_THRESHOLD)
+        for template, count in repeated:
+            logger.warning('Possible N+1 in %s: %d executions of %s', view, count, template[:300])
+
+        metrics.record_request(
+            view, request.method, response.status_code, duration, recorder.count, recorder.duration, bool(repeated)
+        )
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+            f'total;dur={duration * 1000:.1f}'
+        )
+        return response
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    Service = apps.get_model('services', 'Service')
+    ServiceRollup = apps.get_model('services', 'ServiceRollup')
+    rows = Service.objects.annotate(
+        month=TruncMonth('created_at')
+    ).values('month', 'status', 'service_type', 'assigned_mechanic').annotate(
+        total=Count('id')
+    ).order_by()
+    ServiceRollup.objects.bulk_create([
+        ServiceRollup(
+            month=row['month'].date() if hasattr(row['month'], 'date') else row['month'],
+            status=row['status'],
+            service_type=row['service_type'],
+            assigned_mechanic_id=row['assigned_mechanic'],
+            count=row['total'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0004_vehicle_last_service_date_vehicle_vehicle_type_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month the services were created in')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('in_progress', 'In Progress'), ('completed', 'Completed')], max_length=20)),
+                ('service_type', models.CharField(choices=[('oil_change', 'Oil Change'), ('tyre_replacement', 'Tyre Replacement'), ('brake_inspection', 'Brake Inspection'), ('general_checkup', 'General Checkup'), ('engine_tuneup', 'Engine Tune-up'), ('ac_service', 'AC Service & Repair'), ('suspension_repair', 'Suspension Repair'), ('battery_replacement', 'Battery Replacement'), ('custom', 'Custom Service (Write query)')], max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('assigned_mechanic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='service_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('assigned_mechanic__isnull', False)), fields=('month', 'status', 'service_type', 'assigned_mechanic'), name='unique_service_rollup_assigned'), models.UniqueConstraint(condition=models.Q(('assigned_mechanic__isnull', True)), fields=('month', 'status', 'service_type'), name='unique_service_rollup_unassigned')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
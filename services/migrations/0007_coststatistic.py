@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:26
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Sum, Variance
+
+
+def backfill_cost_stats(apps, schema_editor):
+    ServiceRecord = apps.get_model('services', 'ServiceRecord')
+    CostStatistic = apps.get_model('services', 'CostStatistic')
+    records = ServiceRecord.objects.annotate(cost=F('parts_cost') + F('labor_cost')).filter(cost__gt=0)
+    aggregates = dict(n=Count('id'), total=Sum('cost'), low=Min('cost'), high=Max('cost'), var=Variance('cost'))
+
+    def build(segment, row):
+        count = row['n'] or 0
+        return CostStatistic(
+            segment=segment,
+            count=count,
+            total=row['total'] or 0,
+            min_cost=row['low'],
+            max_cost=row['high'],
+            mean=float(row['total'] or 0) / count if count else 0.0,
+            m2=float(row['var'] or 0) * count,
+        )
+
+    stats = [build('all', records.aggregate(**aggregates))]
+    for row in records.values('vehicle__owner_id').annotate(**aggregates).order_by():
+        stats.append(build(f"customer:{row['vehicle__owner_id']}", row))
+    CostStatistic.objects.bulk_create(stats, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0006_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CostStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('segment', models.CharField(max_length=64, unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('min_cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('mean', models.FloatField(default=0.0)),
+                ('m2', models.FloatField(default=0.0, help_text='Welford sum of squared deviations from the mean')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_cost_stats, migrations.RunPython.noop),
+    ]
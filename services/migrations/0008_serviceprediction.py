@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0007_coststatistic'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServicePrediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('predicted_at', models.DateTimeField()),
+                ('confidence', models.CharField(max_length=10)),
+                ('method', models.CharField(max_length=100)),
+                ('data_points', models.PositiveIntegerField(default=0)),
+                ('is_stale', models.BooleanField(db_index=True, default=False)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='service_prediction', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
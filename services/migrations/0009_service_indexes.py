@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0008_serviceprediction'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['status'], name='service_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['assigned_mechanic', 'status', 'created_at'], name='service_mech_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['customer', 'created_at'], name='service_customer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerecord',
+            index=models.Index(fields=['vehicle', 'service_date'], name='record_vehicle_date_idx'),
+        ),
+    ]
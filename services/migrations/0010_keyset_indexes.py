@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def add_user_joined_index(apps, schema_editor):
+    """auth_user belongs to another app, so index its keyset order (date_joined, id) here."""
+    table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    qn = schema_editor.quote_name
+    schema_editor.execute(
+        f'CREATE INDEX {qn("services_user_joined_idx")} ON {qn(table)} ({qn("date_joined")}, {qn("id")})'
+    )
+
+
+def drop_user_joined_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX {schema_editor.quote_name("services_user_joined_idx")}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0009_service_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='service_status_queue_idx'),
+        ),
+        migrations.RunPython(add_user_joined_index, drop_user_joined_index),
+    ]
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import migrations, transaction
+
+FTS_TABLE = 'services_user_fts'
+PG_VECTOR = (
+    "to_tsvector('simple', coalesce(auth_user.username, '') || ' ' || coalesce(auth_user.email, '') "
+    "|| ' ' || coalesce(auth_user.first_name, '') || ' ' || coalesce(auth_user.last_name, ''))"
+)
+
+
+def create_search_index(apps, schema_editor):
+    """FTS5 table on SQLite, tsvector (and trigram when available) GIN indexes on PostgreSQL."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"username, email, first_name, last_name, tokenize='unicode61', prefix='2 3')"
+            )
+        except Exception:
+            # SQLite built without FTS5: user search falls back to icontains
+            return
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, username, email, first_name, last_name) "
+            f"SELECT id, username, email, first_name, last_name FROM auth_user"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"CREATE INDEX services_user_search_idx ON auth_user USING GIN ({PG_VECTOR})")
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except Exception:
+            # Needs extension privileges; the trigram fallback stays off without it
+            return
+        schema_editor.execute(
+            "CREATE INDEX services_user_trgm_idx ON auth_user USING GIN (username gin_trgm_ops, email gin_trgm_ops)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS services_user_search_idx")
+        schema_editor.execute("DROP INDEX IF EXISTS services_user_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0010_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
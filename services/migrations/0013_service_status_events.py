@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0012_service_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TurnaroundStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('time_to_assign', 'Booking to assignment'), ('time_in_progress', 'Time in progress'), ('time_to_complete', 'Booking to completion')], max_length=20)),
+                ('segment', models.CharField(max_length=64)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_seconds', models.FloatField(default=0.0)),
+                ('min_seconds', models.FloatField(blank=True, null=True)),
+                ('max_seconds', models.FloatField(blank=True, null=True)),
+                ('sketch', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('metric', 'segment'), name='unique_turnaround_statistic')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ServiceStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('in_progress', 'In Progress'), ('completed', 'Completed')], max_length=20)),
+                ('previous_status', models.CharField(blank=True, choices=[('pending', 'Pending'), ('in_progress', 'In Progress'), ('completed', 'Completed')], help_text='Empty for the event logged when the service was booked', max_length=20, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('mechanic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('previous_mechanic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='services.service')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['service', 'created_at'], name='status_event_service_idx'), models.Index(fields=['mechanic', 'status', 'created_at'], name='status_event_mechanic_idx')],
+            },
+        ),
+    ]
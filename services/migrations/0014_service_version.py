@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0013_service_status_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
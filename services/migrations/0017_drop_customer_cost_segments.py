@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def drop_customer_segments(apps, schema_editor):
+    # Only the 'all' row is maintained from here on; per-owner rows were never read
+    CostStatistic = apps.get_model('services', 'CostStatistic')
+    CostStatistic.objects.exclude(segment='all').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0016_stored_files_job_leases'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_customer_segments, migrations.RunPython.noop),
+    ]
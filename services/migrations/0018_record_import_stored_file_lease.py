@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0017_drop_customer_cost_segments'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='recordimport',
+            name='file_path',
+        ),
+        migrations.AddField(
+            model_name='recordimport',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recordimport',
+            name='file',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='record_import', to='services.storedfile'),
+        ),
+        migrations.AddField(
+            model_name='recordimport',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
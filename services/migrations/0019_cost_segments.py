@@ -0,0 +1,46 @@
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Sum, Variance
+
+import services.models
+
+
+def rebuild_cost_segments(apps, schema_editor):
+    # Per-customer rows were dropped by 0017; records have no service type yet
+    ServiceRecord = apps.get_model('services', 'ServiceRecord')
+    CostStatistic = apps.get_model('services', 'CostStatistic')
+    records = ServiceRecord.objects.annotate(cost=F('parts_cost') + F('labor_cost')).filter(cost__gt=0)
+    aggregates = dict(n=Count('id'), total=Sum('cost'), low=Min('cost'), high=Max('cost'), var=Variance('cost'))
+
+    def build(segment, row):
+        count = row['n'] or 0
+        return CostStatistic(
+            segment=segment,
+            count=count,
+            total=row['total'] or 0,
+            min_cost=row['low'],
+            max_cost=row['high'],
+            mean=float(row['total'] or 0) / count if count else 0.0,
+            m2=float(row['var'] or 0) * count,
+        )
+
+    stats = [build('all', records.aggregate(**aggregates))]
+    for row in records.values('vehicle__owner_id').annotate(**aggregates).order_by():
+        stats.append(build(f"customer:{row['vehicle__owner_id']}", row))
+    CostStatistic.objects.all().delete()
+    CostStatistic.objects.bulk_create(stats, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0018_record_import_stored_file_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerecord',
+            name='service_type',
+            field=models.CharField(blank=True, choices=services.models.service_type_choices, max_length=50, null=True),
+        ),
+        migrations.RunPython(rebuild_cost_segments, migrations.RunPython.noop),
+    ]
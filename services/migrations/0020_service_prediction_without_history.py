@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0019_cost_segments'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='serviceprediction',
+            name='predicted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Least
 from django.utils import timezone
+from datetime import timedelta
 
 User = get_user_model()
 
@@ -28,21 +31,114 @@ class Profile(models.Model):
         return f"{self.user.username} ({self.role})"
 
 
+class VehicleQuerySet(models.QuerySet):
+    def with_health_score(self):
+        """
+        Annotate each vehicle with `health_score` (0-100) in a single statement.
+        Mirrors the factors of services.logic.calculate_health_score:
+        - Mileage: -2 points for every 10k km over 30k (max -20)
+        - Service Frequency: -15 points if no service in last 180 days
+        - Issues Reported: -10 points for each record with issues in last year (max -30)
+        - Pending Services: -5 points for each pending booking of the owner (max -15)
+        """
+        now = timezone.now()
+        today = now.date()
+
+        last_service = ServiceRecord.objects.filter(
+            vehicle=OuterRef('pk')
+        ).order_by('-service_date').values('service_date')[:1]
+
+        recent_issues = ServiceRecord.objects.filter(
+            vehicle=OuterRef('pk'),
+            service_date__gte=today - timedelta(days=365),
+            issues_reported__isnull=False
+        ).exclude(issues_reported="").values('vehicle').annotate(
+            c=Count('pk')
+        ).values('c')
+
+        pending_bookings = Service.objects.filter(
+            customer=OuterRef('owner'),
+            status=Service.STATUS_PENDING
+        ).values('customer').annotate(c=Count('pk')).values('c')
+
+        # 1. Mileage penalty (integer division on both SQLite and PostgreSQL)
+        mileage_penalty = models.Case(
+            models.When(
+                mileage__gt=30000,
+                then=Least(Value(20), (F('mileage') - 30000) / 10000 * 2),
+            ),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+        # 2. Frequency penalty, falling back to vehicle age when never serviced
+        frequency_penalty = models.Case(
+            models.When(last_record_date__lt=today - timedelta(days=180), then=Value(15)),
+            models.When(
+                last_record_date__isnull=True,
+                created_at__lte=now - timedelta(days=181),
+                then=Value(15),
+            ),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+        # 3 & 4. Issue and pending-booking penalties
+        issues_penalty = Least(Value(30), F('recent_issue_count') * 10)
+        pending_penalty = Least(Value(15), F('pending_booking_count') * 5)
+
+        return self.annotate(
+            last_record_date=Subquery(last_service),
+            recent_issue_count=Coalesce(Subquery(recent_issues, output_field=IntegerField()), 0),
+            pending_booking_count=Coalesce(Subquery(pending_bookings, output_field=IntegerField()), 0),
+        ).annotate(
+            health_score=Greatest(
+                Value(0),
+                Least(
+                    Value(100),
+                    Value(100) - mileage_penalty - frequency_penalty - issues_penalty - pending_penalty,
+                ),
+                output_field=IntegerField(),
+            )
+        )
+
+
 class Vehicle(models.Model):
+    TYPE_CAR = 'car'
+    TYPE_BIKE = 'bike'
+    TYPE_SUV = 'suv'
+
+    VEHICLE_TYPE_CHOICES = [
+        (TYPE_CAR, 'Car'),
+        (TYPE_BIKE, 'Bike'),
+        (TYPE_SUV, 'SUV'),
+    ]
+
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='vehicles')
+    vehicle_type = models.CharField(max_length=10, choices=VEHICLE_TYPE_CHOICES, default=TYPE_CAR)
     make = models.CharField(max_length=100)
     model = models.CharField(max_length=100)
     year = models.PositiveSmallIntegerField()
     vin = models.CharField(max_length=64, unique=True)
     registration_number = models.CharField(max_length=32, unique=True)
-    mileage = models.PositiveIntegerField(blank=True, null=True)
+    mileage = models.PositiveIntegerField(blank=True, null=True, help_text="Current Odometer Reading")
+    last_service_date = models.DateField(blank=True, null=True, help_text="Approximate date of last service")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = VehicleQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.registration_number} - {self.make} {self.model}"
 
+def service_type_choices():
+    """Service type choices for fields declared before Service."""
+    return Service.SERVICE_TYPE_CHOICES
+
+
 class ServiceRecord(models.Model):
     vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name='services')
+    # Optional; a record with a type also counts toward that type's cost statistics
+    service_type = models.CharField(max_length=50, choices=service_type_choices, blank=True, null=True)
     service_date = models.DateField(default=timezone.now)
     odometer_reading = models.PositiveIntegerField(help_text="Odometer at service time (km)")
     issues_reported = models.TextField(blank=True, null=True)
@@ -53,10 +149,21 @@ class ServiceRecord(models.Model):
     mechanic = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='performed_services')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Per-vehicle history, newest first (health score, recommendations)
+            models.Index(fields=['vehicle', 'service_date'], name='record_vehicle_date_idx'),
+        ]
+
     @property
     def total_cost(self):
         return (self.parts_cost or 0) + (self.labor_cost or 0)
 
+    def save(self, *args, **kwargs):
+        # Keep the row write and the cost statistics updates (see signals.py) in one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Service on {self.service_date} for {self.vehicle.registration_number}"
 
@@ -100,6 +207,343 @@ class Service(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
     assigned_mechanic = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_services')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Watermark for the columnar analytics snapshot; queryset.update() callers must set it
+    updated_at = models.DateTimeField(auto_now=True)
+    # Bumped on every write so conditional updates detect concurrent edits (see service_updates.py);
+    # queryset.update() callers must bump it too
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Report exports and queues filtered by status (rows stay in id order within a status)
+            models.Index(fields=['status'], name='service_status_idx'),
+            # Mechanic workload counts by status and month, answered from the index alone
+            models.Index(fields=['assigned_mechanic', 'status', 'created_at'], name='service_mech_status_idx'),
+            # Per-customer history and prediction intervals in date order
+            models.Index(fields=['customer', 'created_at'], name='service_customer_created_idx'),
+            # Keyset pages of a status queue on (created_at, id)
+            models.Index(fields=['status', 'created_at', 'id'], name='service_status_queue_idx'),
+            # Rows changed since the columnar snapshot's last refresh
+            models.Index(fields=['updated_at'], name='service_updated_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        bump = not self._state.adding
+        if bump:
+            # Increment the stored version, not this instance's possibly stale copy
+            self.version = models.F('version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        # Keep the row write and the rollup updates (see signals.py) in one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if bump:
+                self.refresh_from_db(fields=['version'])
+
+    def __str__(self):
+        return f"{self.get_service_type_display()} - {self.get_status_display()}"
+
+
+class ServiceStatusEvent(models.Model):
+    """
+    Append-only log of Service status and mechanic changes, one row per change
+    (plus one when the service is booked). Written by signals and services.turnaround.
+    """
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='status_events')
+    status = models.CharField(max_length=20, choices=Service.STATUS_CHOICES)
+    previous_status = models.CharField(max_length=20, choices=Service.STATUS_CHOICES, null=True, blank=True,
+                                       help_text="Empty for the event logged when the service was booked")
+    mechanic = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    previous_mechanic = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # A service's history in order, replayed for turnaround durations
+            models.Index(fields=['service', 'created_at'], name='status_event_service_idx'),
+            # Jobs a mechanic completed in a period
+            models.Index(fields=['mechanic', 'status', 'created_at'], name='status_event_mechanic_idx'),
+        ]
+
+    def __str__(self):
+        return f"Service #{self.service_id}: {self.previous_status or 'booked'} -> {self.status}"
+
+
+class ServiceRollup(models.Model):
+    """
+    Pre-aggregated Service counts per (month, status, service_type, assigned_mechanic).
+    Maintained incrementally by signals; rebuild with `manage.py rebuild_rollups`.
+    """
+    month = models.DateField(help_text="First day of the month the services were created in")
+    status = models.CharField(max_length=20, choices=Service.STATUS_CHOICES)
+    service_type = models.CharField(max_length=50, choices=Service.SERVICE_TYPE_CHOICES)
+    assigned_mechanic = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='service_rollups')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['month', 'status', 'service_type', 'assigned_mechanic'],
+                condition=models.Q(assigned_mechanic__isnull=False),
+                name='unique_service_rollup_assigned',
+            ),
+            models.UniqueConstraint(
+                fields=['month', 'status', 'service_type'],
+                condition=models.Q(assigned_mechanic__isnull=True),
+                name='unique_service_rollup_unassigned',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.service_type}/{self.status}: {self.count}"
+
+class StoredFile(models.Model):
+    """
+    A file kept in the database in chunks (see services.stored_files), so every web
+    and worker process can read it, including on hosts without a shared disk.
+    """
+    name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.size} bytes)"
+
+
+class StoredFileChunk(models.Model):
+    file = models.ForeignKey(StoredFile, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['file', 'index'], name='unique_stored_file_chunk'),
+        ]
+
+
+class ReportJob(models.Model):
+    """A report export queued for the `run_report_worker` command."""
+    FORMAT_CSV = 'csv'
+    FORMAT_EXCEL = 'excel'
+
+    FORMAT_CHOICES = [
+        (FORMAT_CSV, 'CSV'),
+        (FORMAT_EXCEL, 'Excel'),
+    ]
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs')
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default=FORMAT_CSV)
+    filters = models.JSONField(default=dict, blank=True, help_text="status, start, end and limit passed to ReportGenerator.filter_services")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    rows_written = models.PositiveIntegerField(default=0)
+    file = models.OneToOneField(StoredFile, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_job')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Lease (see services.job_queue): renewed by the worker's progress writes
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def filename(self):
+        extension = 'xlsx' if self.format == self.FORMAT_EXCEL else 'csv'
+        return f"services_report_{self.filters.get('status', 'all')}_{self.pk}.{extension}"
+
+    @property
+    def progress(self):
+        """Percentage of rows written, or None while the total is unknown."""
+        if not self.total_rows:
+            return 100.0 if self.status == self.STATUS_DONE else None
+        return min(100.0, self.rows_written / self.total_rows * 100)
+
+    def __str__(self):
+        return f"Report #{self.pk} ({self.format}) - {self.get_status_display()}"
+
+
+class RecordImport(models.Model):
+    """A ServiceRecord import from a CSV or JSONL file (see services.record_import)."""
+    FORMAT_CSV = 'csv'
+    FORMAT_JSONL = 'jsonl'
+
+    FORMAT_CHOICES = [
+        (FORMAT_CSV, 'CSV'),
+        (FORMAT_JSONL, 'JSON Lines'),
+    ]
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='record_imports')
+    file = models.OneToOneField(StoredFile, on_delete=models.SET_NULL, null=True, blank=True, related_name='record_import')
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default=FORMAT_CSV)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    total_bytes = models.PositiveBigIntegerField(default=0)
+    # Checkpoint: committed together with each chunk of inserted records
+    byte_offset = models.PositiveBigIntegerField(default=0)
+    rows_read = models.PositiveBigIntegerField(default=0)
+    rows_inserted = models.PositiveBigIntegerField(default=0)
+    rows_rejected = models.PositiveBigIntegerField(default=0)
+    rejections = models.JSONField(default=list, blank=True, help_text="The first rejected rows as {row, error}")
+    rows_per_second = models.FloatField(null=True, blank=True, help_text="Throughput of the latest run")
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Lease (see services.job_queue): renewed with every checkpoint
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def progress(self):
+        """Percentage of the file consumed."""
+        if not self.total_bytes:
+            return 100.0 if self.status == self.STATUS_DONE else 0.0
+        return min(100.0, self.byte_offset / self.total_bytes * 100)
+
+    def __str__(self):
+        return f"Import #{self.pk} ({self.format}) - {self.get_status_display()}"
+
+
+class CostStatistic(models.Model):
+    """
+    Running ServiceRecord cost statistics (parts + labor, non-zero totals only) for one segment.
+    Segments: 'all', 'customer:<vehicle owner id>' and 'service_type:<type>'.
+    Maintained incrementally by signals; rebuild with `manage.py rebuild_cost_stats`.
+    """
+    SEGMENT_ALL = 'all'
+    SEGMENT_CUSTOMER = 'customer'
+    SEGMENT_SERVICE_TYPE = 'service_type'
+
+    segment = models.CharField(max_length=64, unique=True)
+    count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    min_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    mean = models.FloatField(default=0.0)
+    m2 = models.FloatField(default=0.0, help_text="Welford sum of squared deviations from the mean")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def customer_segment(cls, user_id):
+        return f"{cls.SEGMENT_CUSTOMER}:{user_id}"
+
+    @classmethod
+    def service_type_segment(cls, service_type):
+        return f"{cls.SEGMENT_SERVICE_TYPE}:{service_type}"
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def variance(self):
+        """Population variance of the segment's costs."""
+        return self.m2 / self.count if self.count else 0.0
+
+    def __str__(self):
+        return f"{self.segment}: n={self.count}"
+
+
+class ServicePrediction(models.Model):
+    """
+    Precomputed next-service-date prediction for one customer.
+    Refreshed in batches by ServicePredictor.refresh_predictions; Service
+    creation/deletion marks the customer's row stale.
+    Customers without services get a row with no predicted_at, so their lookups hit too.
+    """
+    customer = models.OneToOneField(User, on_delete=models.CASCADE, related_name='service_prediction')
+    predicted_at = models.DateTimeField(null=True, blank=True)
+    confidence = models.CharField(max_length=10)
+    method = models.CharField(max_length=100)
+    data_points = models.PositiveIntegerField(default=0)
+    is_stale = models.BooleanField(default=False, db_index=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        predicted = f"{self.predicted_at:%Y-%m-%d}" if self.predicted_at else 'no history'
+        return f"{self.customer.username}: {predicted} ({self.confidence})"
+
+
+class TurnaroundStatistic(models.Model):
+    """
+    Running duration statistics (seconds) of one turnaround metric for one segment.
+    Segments: 'all', 'mechanic:<user id>' and 'service_type:<type>'.
+    `sketch` is a log-bucketed histogram ({bucket: count}) for percentile estimates.
+    Maintained incrementally by services.turnaround; rebuild with `manage.py rebuild_turnaround_stats`.
+    """
+    METRIC_TIME_TO_ASSIGN = 'time_to_assign'
+    METRIC_TIME_IN_PROGRESS = 'time_in_progress'
+    METRIC_TIME_TO_COMPLETE = 'time_to_complete'
+
+    METRIC_CHOICES = [
+        (METRIC_TIME_TO_ASSIGN, 'Booking to assignment'),
+        (METRIC_TIME_IN_PROGRESS, 'Time in progress'),
+        (METRIC_TIME_TO_COMPLETE, 'Booking to completion'),
+    ]
+
+    SEGMENT_ALL = 'all'
+
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    segment = models.CharField(max_length=64)
+    count = models.PositiveIntegerField(default=0)
+    total_seconds = models.FloatField(default=0.0)
+    min_seconds = models.FloatField(null=True, blank=True)
+    max_seconds = models.FloatField(null=True, blank=True)
+    sketch = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'segment'], name='unique_turnaround_statistic'),
+        ]
+
+    @classmethod
+    def mechanic_segment(cls, user_id):
+        return f"mechanic:{user_id}"
+
+    @classmethod
+    def service_type_segment(cls, service_type):
+        return f"service_type:{service_type}"
+
+    @property
+    def average(self):
+        return self.total_seconds / self.count if self.count else None
+
+    def __str__(self):
+        return f"{self.metric} {self.segment}: n={self.count}"
+
+
+class DataVersion(models.Model):
+    """
+    A named counter that writers bump when derived or cached data goes out of date.
+    Kept in the database so every process (web workers, management commands) sees the
+    same value whatever the cache backend; see services.data_versions.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField()
 
     def __str__(self):
-        return f"{self.get_service_type_display()} - {self.get_status_display()}"
\ No newline at end of file
+        return f"{self.key}: {self.version}"
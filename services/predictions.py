@@ -24,45 +24,33 @@ class ServicePredictor:
     # Default interval in days between services
     DEFAULT_INTERVAL_DAYS = 90  # 3 months
 
+    # Records a cost segment needs before it is preferred over a broader one
+    MIN_SEGMENT_RECORDS = 5
+
     @classmethod
-    def predict_next_service_date(cls, user):
+    def _predict_from_dates(cls, dates):
         """
-        Predict when the user's next service should be scheduled.
-        Uses the average interval between past services.
-        Returns a dict with prediction details.
+        Predict the next service from a customer's ordered service dates.
+        `dates` is a list of (created_at, previous created_at) pairs, oldest first.
+        Returns (predicted datetime, confidence, method) or None with no history.
         """
-        from .models import Service
-
-        services = Service.objects.filter(
-            customer=user
-        ).order_by('created_at')
-
-        if services.count() < 1:
-            return {
-                'date': (timezone.now() + timedelta(days=cls.DEFAULT_INTERVAL_DAYS)).date(),
-                'days_from_now': cls.DEFAULT_INTERVAL_DAYS,
-                'confidence': 'Low',
-                'method': 'Default (no history)',
-                'data_points': 0,
-            }
-
-        if services.count() == 1:
-            last_service = services.last()
-            predicted_date = last_service.created_at + timedelta(days=cls.DEFAULT_INTERVAL_DAYS)
-            days_from_now = (predicted_date - timezone.now()).days
-            return {
-                'date': predicted_date.date(),
-                'days_from_now': max(days_from_now, 0),
-                'confidence': 'Low',
-                'method': 'Default interval (1 data point)',
-                'data_points': 1,
-            }
-
-        # Calculate average interval between services
-        dates = list(services.values_list('created_at', flat=True))
+        if not dates:
+            return None
+
+        last_service_at = dates[-1][0]
+        if len(dates) == 1:
+            return (
+                last_service_at + timedelta(days=cls.DEFAULT_INTERVAL_DAYS),
+                'Low',
+                'Default interval (1 data point)',
+            )
+
+        # Average interval between services
         intervals = []
-        for i in range(1, len(dates)):
-            delta = (dates[i] - dates[i - 1]).days
+        for created_at, previous in dates:
+            if previous is None:
+                continue
+            delta = (created_at - previous).days
             if delta > 0:
                 intervals.append(delta)
 
@@ -76,46 +64,135 @@ class ServicePredictor:
             avg_interval = sum(intervals) / len(intervals)
             confidence = 'High'
 
-        last_service = services.last()
-        predicted_date = last_service.created_at + timedelta(days=int(avg_interval))
-        days_from_now = (predicted_date - timezone.now()).days
+        return (
+            last_service_at + timedelta(days=int(avg_interval)),
+            confidence,
+            f'Average of {len(intervals)} intervals (~{int(avg_interval)} days)',
+        )
 
+    @classmethod
+    def refresh_predictions(cls, customer_ids, invalidate_snapshots=True):
+        """
+        Recompute ServicePrediction rows for the given customers.
+        Inter-service intervals come from one query using LAG(created_at)
+        partitioned by customer; customers without services get an empty row
+        (no predicted_at) so their dashboard does not refresh on every visit.
+        Their dashboard snapshots are invalidated unless `invalidate_snapshots` is False.
+        Returns the number of customers refreshed.
+        """
+        from django.db import transaction
+        from django.db.models import F, Window
+        from django.db.models.functions import Lag
+        from . import dashboard_snapshots
+        from .models import Service, ServicePrediction
+
+        customer_ids = list(customer_ids)
+        if not customer_ids:
+            return 0
+
+        rows = Service.objects.filter(customer_id__in=customer_ids).annotate(
+            previous_at=Window(
+                Lag('created_at'),
+                partition_by=F('customer_id'),
+                order_by=[F('created_at').asc(), F('id').asc()],
+            )
+        ).order_by('customer_id', 'created_at', 'id').values_list('customer_id', 'created_at', 'previous_at')
+
+        history = defaultdict(list)
+        for customer_id, created_at, previous_at in rows.iterator(chunk_size=2000):
+            history[customer_id].append((created_at, previous_at))
+
+        predictions = []
+        for customer_id in customer_ids:
+            result = cls._predict_from_dates(history.get(customer_id, []))
+            predicted_at, confidence, method = result or (None, 'Low', 'Default (no history)')
+            predictions.append(ServicePrediction(
+                customer_id=customer_id,
+                predicted_at=predicted_at,
+                confidence=confidence,
+                method=method,
+                data_points=len(history.get(customer_id, [])),
+                is_stale=False,
+            ))
+
+        with transaction.atomic():
+            ServicePrediction.objects.filter(customer_id__in=customer_ids).delete()
+            ServicePrediction.objects.bulk_create(predictions, batch_size=1000)
+            if invalidate_snapshots:
+                dashboard_snapshots.invalidate_customers_on_commit(customer_ids)
+        return len(customer_ids)
+
+    @classmethod
+    def predict_next_service_date(cls, user):
+        """
+        Predict when the user's next service should be scheduled.
+        Uses the average interval between past services, read from the
+        precomputed ServicePrediction row (refreshed on a miss or when stale).
+        Returns a dict with prediction details.
+        """
+        from .models import ServicePrediction
+
+        prediction = ServicePrediction.objects.filter(customer=user).first()
+        if prediction is None or prediction.is_stale:
+            # A snapshot being built reads this refresh; the Service write that made the
+            # row stale has already invalidated older snapshots
+            cls.refresh_predictions([user.pk], invalidate_snapshots=False)
+            prediction = ServicePrediction.objects.get(customer=user)
+
+        if prediction.predicted_at is None:
+            return {
+                'date': (timezone.now() + timedelta(days=cls.DEFAULT_INTERVAL_DAYS)).date(),
+                'days_from_now': cls.DEFAULT_INTERVAL_DAYS,
+                'confidence': 'Low',
+                'method': 'Default (no history)',
+                'data_points': 0,
+            }
+
+        days_from_now = (prediction.predicted_at - timezone.now()).days
         return {
-            'date': predicted_date.date(),
+            'date': prediction.predicted_at.date(),
             'days_from_now': max(days_from_now, 0),
-            'confidence': confidence,
-            'method': f'Average of {len(intervals)} intervals (~{int(avg_interval)} days)',
-            'data_points': len(dates),
+            'confidence': prediction.confidence,
+            'method': prediction.method,
+            'data_points': prediction.data_points,
         }
 
     @classmethod
     def predict_service_cost(cls, user=None, service_type=None):
         """
         Predict estimated service cost.
-        Uses ServiceRecord costs if available, otherwise uses defaults.
+        Uses the running ServiceRecord cost statistics of the most specific segment with
+        enough records (the service type, then the customer, then all records), otherwise defaults.
         Returns a dict with cost range and confidence.
         """
-        from .models import ServiceRecord
-
-        # Try to get historical cost data from ServiceRecord
-        records = ServiceRecord.objects.all()
-        if records.exists():
-            costs = list(records.values_list('parts_cost', 'labor_cost'))
-            total_costs = [(float(p) + float(l)) for p, l in costs if (float(p) + float(l)) > 0]
-
-            if total_costs:
-                avg_cost = sum(total_costs) / len(total_costs)
-                min_cost = min(total_costs)
-                max_cost = max(total_costs)
-
-                return {
-                    'min': int(min_cost),
-                    'max': int(max_cost),
-                    'avg': int(avg_cost),
-                    'display': f'₹{int(min_cost):,} – ₹{int(max_cost):,}',
-                    'confidence': 'High' if len(total_costs) >= 5 else 'Medium',
-                    'data_points': len(total_costs),
-                }
+        from .models import CostStatistic
+
+        # Historical cost data is kept as running statistics (see cost_stats.py)
+        segments = []
+        if service_type:
+            segments.append(CostStatistic.service_type_segment(service_type))
+        if user is not None:
+            segments.append(CostStatistic.customer_segment(user.pk))
+        segments.append(CostStatistic.SEGMENT_ALL)
+        found = {stat.segment: stat for stat in CostStatistic.objects.filter(segment__in=segments, count__gt=0)}
+        candidates = [found[segment] for segment in segments if segment in found]
+        stats = next((stat for stat in candidates if stat.count >= cls.MIN_SEGMENT_RECORDS), None)
+        if stats is None and candidates:
+            stats = candidates[-1]
+        if stats is not None:
+            avg_cost = stats.average
+            min_cost = stats.min_cost
+            max_cost = stats.max_cost
+
+            return {
+                'min': int(min_cost),
+                'max': int(max_cost),
+                'avg': int(avg_cost),
+                'display': f'₹{int(min_cost):,} – ₹{int(max_cost):,}',
+                'confidence': 'High' if stats.count >= cls.MIN_SEGMENT_RECORDS else 'Medium',
+                'data_points': stats.count,
+                'segment': stats.segment,
+            }
 
         # Fallback to default costs based on service type
         if service_type and service_type in cls.DEFAULT_COSTS:
@@ -138,6 +215,7 @@ class ServicePredictor:
             'display': f'₹{cost_data["min"]:,} – ₹{cost_data["max"]:,}',
             'confidence': 'Low',
             'data_points': 0,
+            'segment': None,
         }
 
     @classmethod
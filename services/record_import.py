@@ -0,0 +1,345 @@
+"""
+Streaming bulk import of ServiceRecords from CSV or JSONL files.
+Rows are parsed one at a time, matched to vehicles through in-memory registration
+number and VIN maps loaded once, validated and inserted with bulk_create in chunks.
+Each chunk commits together with its RecordImport checkpoint (byte offset and
+counters), so a failed or interrupted import resumes after the last committed chunk
+without inserting any row twice. Memory is bounded by the chunk size and the maps.
+Import files are kept in the database (services.stored_files), so an upload can be
+run or resumed by a worker on any host, and claims are leased (services.job_queue):
+the checkpoint write renews the lease, and a checkpoint from a worker whose import
+was reclaimed raises LeaseLost and rolls its chunk back.
+bulk_create skips the ServiceRecord signals, so every chunk merges its costs into the
+cost statistic and invalidates its customers' dashboard snapshots itself.
+"""
+
+import csv
+import json
+import os
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import dashboard_snapshots, job_queue, stored_files
+from .cost_stats import SegmentTotals, record_cost, record_segments
+from .models import Profile, RecordImport, Service, ServiceRecord, User, Vehicle
+
+EXTENSIONS = {
+    '.csv': RecordImport.FORMAT_CSV,
+    '.jsonl': RecordImport.FORMAT_JSONL,
+    '.ndjson': RecordImport.FORMAT_JSONL,
+}
+VEHICLE_FIELDS = ('registration_number', 'vin')
+REQUIRED_FIELDS = ('service_date', 'odometer_reading')
+TEXT_FIELDS = ('issues_reported', 'work_done', 'parts_replaced')
+
+# Limits of the ServiceRecord columns
+MAX_COST = Decimal('99999999.99')
+MAX_ODOMETER = 2147483647
+
+# Rejected rows kept on the RecordImport for display; the rest are only counted
+MAX_REJECTIONS = 100
+
+
+def format_for(filename, format_type=None):
+    """The import format given explicitly or by the file extension; raises ValueError if unknown."""
+    if format_type:
+        if format_type not in dict(RecordImport.FORMAT_CHOICES):
+            raise ValueError(f'Unknown format {format_type}; use csv or jsonl')
+        return format_type
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in EXTENSIONS:
+        raise ValueError(f'Cannot tell the format of {filename}; use a .csv or .jsonl file or pass the format')
+    return EXTENSIONS[extension]
+
+
+def create_import(name, fileobj, format_type=None, requested_by=None, claim=False):
+    """
+    Store the rest of the binary file object `fileobj` and register an import of it, queued
+    for a worker or, with `claim`, already claimed by the caller. `name` is the original
+    file name. Raises ValueError for an unknown format.
+    """
+    format_type = format_for(name, format_type)
+    claimed = {}
+    if claim:
+        now = timezone.now()
+        claimed = dict(status=RecordImport.STATUS_RUNNING, started_at=now, heartbeat_at=now, attempts=1)
+    with transaction.atomic():
+        stored = stored_files.save_file(os.path.basename(name), fileobj)
+        return RecordImport.objects.create(
+            requested_by=requested_by,
+            file=stored,
+            format=format_type,
+            total_bytes=stored.size,
+            **claimed
+        )
+
+
+def claim_next_import():
+    """Claim the oldest queued import, or return None; imports of crashed workers are requeued first."""
+    return job_queue.claim_next(RecordImport)
+
+
+class _Lines:
+    """Decoded lines of a binary file, tracking the byte offset just after the last line read."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.offset = fileobj.tell()
+
+    def __iter__(self):
+        for line in self.fileobj:
+            self.offset += len(line)
+            yield line.decode('utf-8-sig' if self.offset == len(line) else 'utf-8')
+
+
+def _csv_rows(fileobj, offset):
+    lines = _Lines(fileobj)
+    header = next(csv.reader(lines), None)
+    if not header:
+        raise ValueError('The CSV file has no header row')
+    header = [name.strip() for name in header]
+    missing = [name for name in REQUIRED_FIELDS if name not in header]
+    if missing or not any(name in header for name in VEHICLE_FIELDS):
+        raise ValueError(
+            f'The CSV header needs {", ".join(REQUIRED_FIELDS)} and registration_number or vin; '
+            f'missing {", ".join(missing) or "registration_number/vin"}'
+        )
+    if offset:
+        fileobj.seek(offset)
+        lines.offset = offset
+    # csv.reader pulls exactly the lines of one record (quoted fields may span lines)
+    # before returning it, so lines.offset is the end of the row just returned
+    for values in csv.reader(lines):
+        if values:
+            yield dict(zip(header, values)), lines.offset
+
+
+def _jsonl_rows(fileobj, offset):
+    fileobj.seek(offset)
+    lines = _Lines(fileobj)
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = ValueError(f'Invalid JSON: {e}')
+        if not isinstance(row, (dict, ValueError)):
+            row = ValueError('Each line must be a JSON object')
+        yield row, lines.offset
+
+
+def iter_rows(fileobj, format_type, offset=0):
+    """
+    Yield (row, end offset) for the data rows of a binary file from byte `offset` on.
+    A row is a dict of field values, or a ValueError for a JSONL line that cannot be parsed.
+    """
+    if format_type == RecordImport.FORMAT_CSV:
+        return _csv_rows(fileobj, offset)
+    return _jsonl_rows(fileobj, offset)
+
+
+def _vehicle_maps():
+    """{registration number: (vehicle id, owner id)} and {vin: (vehicle id, owner id)} for every vehicle."""
+    by_registration, by_vin = {}, {}
+    rows = Vehicle.objects.values_list('pk', 'owner_id', 'registration_number', 'vin').order_by()
+    for pk, owner_id, registration_number, vin in rows.iterator(chunk_size=10000):
+        by_registration[registration_number] = by_vin[vin] = (pk, owner_id)
+    return by_registration, by_vin
+
+
+def _mechanics():
+    return dict(User.objects.filter(profile__role=Profile.ROLE_MECHANIC).values_list('username', 'pk'))
+
+
+def _text(row, field):
+    value = row.get(field)
+    return '' if value is None else str(value).strip()
+
+
+def _cost(row, field):
+    text = _text(row, field)
+    if not text:
+        return Decimal('0.00')
+    try:
+        cost = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f'{field} must be a number')
+    if not cost.is_finite() or cost < 0 or cost > MAX_COST:
+        raise ValueError(f'{field} must be between 0 and {MAX_COST}')
+    if cost.as_tuple().exponent < -2:
+        raise ValueError(f'{field} has more than 2 decimal places')
+    return cost.quantize(Decimal('0.01'))
+
+
+class RowParser:
+    """Validates rows and turns them into unsaved ServiceRecords, resolving references in memory."""
+
+    def __init__(self):
+        self.by_registration, self.by_vin = _vehicle_maps()
+        self.mechanics = _mechanics()
+        self.service_types = dict(Service.SERVICE_TYPE_CHOICES)
+        self.today = timezone.localdate()
+
+    def vehicle(self, row):
+        registration_number, vin = _text(row, 'registration_number'), _text(row, 'vin')
+        if not registration_number and not vin:
+            raise ValueError('registration_number or vin is required')
+        vehicle = None
+        if registration_number:
+            vehicle = self.by_registration.get(registration_number)
+            if vehicle is None:
+                raise ValueError(f'Unknown registration_number {registration_number}')
+        if vin:
+            by_vin = self.by_vin.get(vin)
+            if by_vin is None:
+                raise ValueError(f'Unknown vin {vin}')
+            if vehicle is not None and by_vin != vehicle:
+                raise ValueError('registration_number and vin belong to different vehicles')
+            vehicle = by_vin
+        return vehicle
+
+    def parse(self, row):
+        """(ServiceRecord, vehicle owner id) for a row; raises ValueError describing the first problem."""
+        vehicle_id, owner_id = self.vehicle(row)
+
+        text = _text(row, 'service_date')
+        try:
+            service_date = parse_date(text)
+        except ValueError:
+            service_date = None
+        if service_date is None:
+            raise ValueError('service_date must be a YYYY-MM-DD date')
+        if service_date > self.today:
+            raise ValueError('service_date is in the future')
+
+        try:
+            odometer_reading = int(_text(row, 'odometer_reading'))
+        except ValueError:
+            raise ValueError('odometer_reading must be a whole number')
+        if not 0 <= odometer_reading <= MAX_ODOMETER:
+            raise ValueError('odometer_reading is out of range')
+
+        mechanic_id = None
+        username = _text(row, 'mechanic')
+        if username:
+            mechanic_id = self.mechanics.get(username)
+            if mechanic_id is None:
+                raise ValueError(f'Unknown mechanic {username}')
+
+        service_type = _text(row, 'service_type') or None
+        if service_type is not None and service_type not in self.service_types:
+            raise ValueError(f'Unknown service_type {service_type}')
+
+        record = ServiceRecord(
+            vehicle_id=vehicle_id,
+            service_type=service_type,
+            service_date=service_date,
+            odometer_reading=odometer_reading,
+            parts_cost=_cost(row, 'parts_cost'),
+            labor_cost=_cost(row, 'labor_cost'),
+            mechanic_id=mechanic_id,
+            **{field: _text(row, field) or None for field in TEXT_FIELDS},
+        )
+        return record, owner_id
+
+
+def _save_chunk(job, records, checkpoint):
+    """Insert a chunk with its cost statistics and dashboard invalidations, and commit its checkpoint."""
+    totals = SegmentTotals()
+    for record, owner_id in records:
+        cost = record_cost(record)
+        if cost is not None:
+            totals.add(record_segments(record, owner_id), cost)
+    with transaction.atomic():
+        # First, so a reclaimed import's chunk is rolled back before anything is written
+        job_queue.heartbeat(job, **checkpoint)
+        ServiceRecord.objects.bulk_create([record for record, _ in records], batch_size=1000)
+        totals.merge()
+        dashboard_snapshots.invalidate_customers_on_commit(owner_id for _, owner_id in records)
+
+
+def run_import(job, chunk_size=None, progress=None):
+    """
+    Import a claimed (running) RecordImport from its checkpoint on; `progress` is called
+    with the job's counters after each committed chunk. Failures mark the job failed and
+    keep the checkpoint, so running it again resumes. Returns the refreshed job.
+    """
+    chunk_size = chunk_size or settings.RECORD_IMPORT_CHUNK_SIZE
+    started = time.perf_counter()
+    rows_at_start = job.rows_read
+    counters = {
+        'byte_offset': job.byte_offset,
+        'rows_read': job.rows_read,
+        'rows_inserted': job.rows_inserted,
+        'rows_rejected': job.rows_rejected,
+    }
+    rejections = list(job.rejections)
+
+    def flush(records):
+        elapsed = time.perf_counter() - started
+        counters['rows_per_second'] = round((counters['rows_read'] - rows_at_start) / elapsed, 1) if elapsed else None
+        _save_chunk(job, records, dict(counters, rejections=rejections))
+        if progress:
+            progress(counters)
+
+    try:
+        if job.file is None:
+            raise ValueError('The import file is no longer available')
+        parser = RowParser()
+        records = []
+        with stored_files.open_local(job.file) as fileobj:
+            for row, offset in iter_rows(fileobj, job.format, job.byte_offset):
+                counters['rows_read'] += 1
+                counters['byte_offset'] = offset
+                try:
+                    if isinstance(row, ValueError):
+                        raise row
+                    records.append(parser.parse(row))
+                except ValueError as e:
+                    counters['rows_rejected'] += 1
+                    if len(rejections) < MAX_REJECTIONS:
+                        rejections.append({'row': counters['rows_read'], 'error': str(e)})
+                else:
+                    counters['rows_inserted'] += 1
+                # Rejected rows count toward the chunk so the checkpoint keeps moving
+                if counters['rows_read'] % chunk_size == 0:
+                    flush(records)
+                    records = []
+        flush(records)
+        job_queue.finish(job, RecordImport.STATUS_DONE, error='')
+    except job_queue.LeaseLost:
+        # Another worker owns the import now and continues from the last checkpoint
+        pass
+    except Exception as e:
+        try:
+            job_queue.finish(job, RecordImport.STATUS_FAILED, error=str(e))
+        except job_queue.LeaseLost:
+            pass
+    job.refresh_from_db()
+    return job
+
+
+def resume_import(job_id):
+    """
+    Claim an unfinished import (queued, failed, or running with an expired lease) so
+    run_import continues from its checkpoint. Raises ValueError if it cannot be resumed.
+    """
+    job = RecordImport.objects.get(pk=job_id)
+    resumable = RecordImport.objects.filter(pk=job.pk).filter(
+        Q(status__in=[RecordImport.STATUS_QUEUED, RecordImport.STATUS_FAILED])
+        | Q(pk__in=job_queue.lease_expired(RecordImport).values('pk'))
+    )
+    if not job_queue.start(RecordImport, resumable):
+        job.refresh_from_db()
+        if job.status == RecordImport.STATUS_DONE:
+            raise ValueError(f'Import #{job.pk} already finished')
+        raise ValueError(f'Import #{job.pk} is running in another worker')
+    job.refresh_from_db()
+    return job
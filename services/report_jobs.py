@@ -0,0 +1,73 @@
+"""
+Database-backed queue for background report exports.
+Jobs are ReportJob rows; `manage.py run_report_worker` claims and runs them,
+so no broker beyond the existing database is needed. Claims are leased (see
+services.job_queue), and finished files are stored in the database, so the web
+process can serve them whichever host the worker ran on.
+"""
+
+import io
+import tempfile
+
+from django.conf import settings
+from django.utils.dateparse import parse_date
+
+from . import job_queue, stored_files
+from .analytics import ReportGenerator
+from .models import ReportJob
+
+
+def claim_next_job():
+    """Claim the oldest queued job, or return None if the queue is empty; expired leases are requeued first."""
+    return job_queue.claim_next(ReportJob)
+
+
+def job_queryset(job):
+    """Rebuild the services queryset from a job's stored filters."""
+    filters = job.filters or {}
+    return ReportGenerator.filter_services(
+        status=filters.get('status', 'all'),
+        start=parse_date(filters['start']) if filters.get('start') else None,
+        end=parse_date(filters['end']) if filters.get('end') else None,
+        limit=filters.get('limit'),
+    )
+
+
+def run_job(job, chunk_size=None):
+    """
+    Generate the report file for a claimed job, recording progress as rows are written.
+    If the job is reclaimed meanwhile (its lease expired), the work is dropped.
+    """
+    chunk_size = chunk_size or settings.REPORT_EXPORT_CHUNK_SIZE
+
+    def progress(rows_written):
+        job_queue.heartbeat(job, rows_written=rows_written)
+
+    stored = None
+    try:
+        services = job_queryset(job)
+        total_rows = services.count()
+        job_queue.heartbeat(job, total_rows=total_rows, rows_written=0)
+
+        with tempfile.TemporaryFile() as output:
+            if job.format == ReportJob.FORMAT_EXCEL:
+                written = ReportGenerator.write_excel_report(services, output, chunk_size, progress)
+            else:
+                text = io.TextIOWrapper(output, newline='', encoding='utf-8')
+                written = ReportGenerator.write_csv_report(services, text, chunk_size, progress)
+                text.detach()
+            output.seek(0)
+            stored = stored_files.save_file(job.filename, output)
+        job_queue.finish(job, ReportJob.STATUS_DONE, rows_written=written, file=stored)
+    except job_queue.LeaseLost:
+        if stored is not None:
+            stored.delete()
+    except Exception as e:
+        if stored is not None:
+            stored.delete()
+        try:
+            job_queue.finish(job, ReportJob.STATUS_FAILED, error=str(e))
+        except job_queue.LeaseLost:
+            pass
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,85 @@
+"""
+Versioned response cache for the analytics data API.
+Every cached payload is keyed on a data version that Service and Profile writes bump,
+so entries never need explicit invalidation and unchanged data can be answered
+with 304 Not Modified from the version alone.
+Versions are bumped by writes in any process (web workers, run_report_worker,
+import commands), so the version is a DataVersion row rather than a cache key: payloads
+may then sit in any backend, including the per-process local-memory default. The hit,
+miss and 304 counters are kept in the cache and so are per-process with such a backend.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import data_versions
+
+VERSION_KEY = 'analytics:data_version'
+STATS_KEYS = {
+    'hits': 'analytics:stats:hits',
+    'misses': 'analytics:stats:misses',
+    'not_modified': 'analytics:stats:not_modified',
+}
+
+
+def _increment(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key missing or evicted; add() avoids clobbering a concurrent first write
+        if cache.add(key, 1, timeout=None):
+            return 1
+        return cache.incr(key)
+
+
+def data_version():
+    """Current analytics data version."""
+    return data_versions.current(VERSION_KEY)[0]
+
+
+def bump_data_version():
+    """Invalidate every cached analytics payload."""
+    data_versions.bump(VERSION_KEY)
+
+
+def response_key(data_type, params, version):
+    """
+    Cache key (also used as the ETag) for a data type and its query parameters.
+    Includes today's date because month windows move with the calendar.
+    """
+    raw = '&'.join(f'{k}={v}' for k, v in sorted(params.items()))
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+    return f'{data_type}-{version}-{timezone.localdate():%Y%m%d}-{digest}'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    candidates = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return f'"{etag}"' in candidates or '*' in candidates
+
+
+def get_payload(key):
+    """Return the cached JSON payload for `key`, counting the hit or miss."""
+    payload = cache.get(f'analytics:response:{key}')
+    _increment(STATS_KEYS['hits'] if payload is not None else STATS_KEYS['misses'])
+    return payload
+
+
+def set_payload(key, payload):
+    cache.set(f'analytics:response:{key}', payload, timeout=settings.ANALYTICS_CACHE_TIMEOUT)
+
+
+def record_not_modified():
+    _increment(STATS_KEYS['not_modified'])
+
+
+def stats():
+    """Hit, miss and 304 counters plus the hit rate of cache lookups."""
+    counters = {name: cache.get(key, 0) for name, key in STATS_KEYS.items()}
+    served = counters['hits'] + counters['misses']
+    counters['hit_rate'] = counters['hits'] / served if served else 0.0
+    counters['data_version'] = data_version()
+    return counters
@@ -0,0 +1,16 @@
+"""
+Role lookup for role checks.
+The session user arrives with its profile already loaded (services.backends), so the
+role is read from request.user.profile on every request without another query and
+always reflects the database: a role change applies to the user's next request in
+every process.
+"""
+
+
+def get_role(request):
+    """The authenticated user's role, or None when anonymous or without a profile."""
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    profile = getattr(user, 'profile', None)
+    return profile.role if profile else None
@@ -0,0 +1,135 @@
+"""
+Incremental maintenance of the ServiceRollup table.
+Each rollup row counts services for one (month, status, service_type, assigned_mechanic) key,
+so dashboard queries scale with the number of months and categories instead of services.
+"""
+
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+# Rows per bulk statement
+BATCH_SIZE = 1000
+
+
+def rollup_key(service):
+    """Return the rollup key a Service instance is counted under."""
+    created_at = service.created_at or timezone.now()
+    if timezone.is_aware(created_at):
+        created_at = timezone.localtime(created_at)
+    month = created_at.date().replace(day=1)
+    return (month, service.status, service.service_type, service.assigned_mechanic_id)
+
+
+def apply_rollup_delta(key, delta):
+    """Add `delta` to the rollup row for `key`, creating it if needed."""
+    from .models import ServiceRollup
+
+    if not delta:
+        return
+    month, status, service_type, mechanic_id = key
+    lookup = {
+        'month': month,
+        'status': status,
+        'service_type': service_type,
+        'assigned_mechanic_id': mechanic_id,
+    }
+    with transaction.atomic():
+        updated = ServiceRollup.objects.filter(**lookup).update(count=F('count') + delta)
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                ServiceRollup.objects.create(count=delta, **lookup)
+        except IntegrityError:
+            # Another transaction created the row first
+            ServiceRollup.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Apply {key: delta} for many keys at once. Existing rows get one
+    `count = count + delta` UPDATE per distinct delta; missing rows are bulk inserted.
+    """
+    from .models import ServiceRollup
+
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        rows = ServiceRollup.objects.filter(
+            month__in={key[0] for key in deltas},
+            service_type__in={key[2] for key in deltas},
+        ).values_list('id', 'month', 'status', 'service_type', 'assigned_mechanic')
+        ids_by_delta = defaultdict(list)
+        for pk, *key in rows:
+            delta = deltas.pop(tuple(key), None)
+            if delta is not None:
+                ids_by_delta[delta].append(pk)
+        for delta, ids in ids_by_delta.items():
+            for offset in range(0, len(ids), BATCH_SIZE):
+                ServiceRollup.objects.filter(pk__in=ids[offset:offset + BATCH_SIZE]).update(
+                    count=F('count') + delta
+                )
+        try:
+            with transaction.atomic():
+                ServiceRollup.objects.bulk_create([
+                    ServiceRollup(month=month, status=status, service_type=service_type,
+                                  assigned_mechanic_id=mechanic_id, count=delta)
+                    for (month, status, service_type, mechanic_id), delta in deltas.items()
+                ], batch_size=BATCH_SIZE)
+        except IntegrityError:
+            # Another transaction created some of the rows first
+            for key, delta in deltas.items():
+                apply_rollup_delta(key, delta)
+
+
+def move_service(old_key, new_key):
+    """Move one service from `old_key` to `new_key` (either may be None)."""
+    if old_key == new_key:
+        return
+    with transaction.atomic():
+        if old_key is not None:
+            apply_rollup_delta(old_key, -1)
+        if new_key is not None:
+            apply_rollup_delta(new_key, 1)
+
+
+def grouped_counts(services_queryset):
+    """Group a Service queryset by rollup key. Returns {key: count}."""
+    rows = services_queryset.annotate(
+        month=TruncMonth('created_at')
+    ).values('month', 'status', 'service_type', 'assigned_mechanic').annotate(
+        total=Count('id')
+    ).order_by()
+
+    counts = {}
+    for row in rows:
+        month = row['month']
+        if hasattr(month, 'date'):
+            month = month.date()
+        key = (month, row['status'], row['service_type'], row['assigned_mechanic'])
+        counts[key] = counts.get(key, 0) + row['total']
+    return counts
+
+
+def rebuild_rollups():
+    """Recompute every rollup row from the Service table. Returns the number of rows written."""
+    from .models import Service, ServiceRollup
+
+    with transaction.atomic():
+        ServiceRollup.objects.all().delete()
+        ServiceRollup.objects.bulk_create([
+            ServiceRollup(
+                month=month,
+                status=status,
+                service_type=service_type,
+                assigned_mechanic_id=mechanic_id,
+                count=count,
+            )
+            for (month, status, service_type, mechanic_id), count in grouped_counts(Service.objects.all()).items()
+        ], batch_size=1000)
+        return ServiceRollup.objects.count()
@@ -0,0 +1,333 @@
+"""
+Synthetic data generator for demos, benchmarks and load testing.
+Creates users, profiles, vehicles, services, status events and service records with chunked
+bulk_create calls inside transactions. Every chunk draws from its own RNG
+seeded with (seed, kind, chunk index), so the generated data depends only on
+the seed and chunk size, never on how the work is split across processes.
+"""
+
+import hashlib
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Profile, Service, ServiceRecord, ServiceStatusEvent, Vehicle
+
+User = get_user_model()
+
+MAKES_AND_MODELS = {
+    'Toyota': ['Corolla', 'Camry', 'Innova', 'Fortuner'],
+    'Honda': ['City', 'Civic', 'Amaze'],
+    'Hyundai': ['i20', 'Creta', 'Verna'],
+    'Maruti Suzuki': ['Swift', 'Baleno', 'Dzire', 'Brezza'],
+    'Tata': ['Nexon', 'Harrier', 'Tiago'],
+    'Mahindra': ['XUV700', 'Scorpio', 'Thar'],
+    'Ford': ['EcoSport', 'Figo'],
+    'BMW': ['X1', '3 Series'],
+}
+
+# Relative booking frequency of each service type
+SERVICE_TYPE_WEIGHTS = {
+    Service.SERVICE_OIL_CHANGE: 30,
+    Service.SERVICE_GENERAL_CHECKUP: 22,
+    Service.SERVICE_BRAKE_INSPECTION: 14,
+    Service.SERVICE_TYRE_REPLACEMENT: 9,
+    Service.SERVICE_AC_SERVICE: 8,
+    Service.SERVICE_BATTERY_REPLACEMENT: 6,
+    Service.SERVICE_ENGINE_TUNEUP: 5,
+    Service.SERVICE_SUSPENSION_REPAIR: 4,
+    Service.SERVICE_CUSTOM: 2,
+}
+
+# (parts min, parts max, labor min, labor max) in ₹ per service type
+COST_RANGES = {
+    Service.SERVICE_OIL_CHANGE: (900, 2500, 300, 800),
+    Service.SERVICE_GENERAL_CHECKUP: (0, 1500, 500, 1500),
+    Service.SERVICE_BRAKE_INSPECTION: (0, 4500, 600, 1500),
+    Service.SERVICE_TYRE_REPLACEMENT: (3000, 16000, 400, 1200),
+    Service.SERVICE_AC_SERVICE: (500, 6000, 800, 2000),
+    Service.SERVICE_BATTERY_REPLACEMENT: (3500, 9000, 200, 500),
+    Service.SERVICE_ENGINE_TUNEUP: (1500, 8000, 1500, 4000),
+    Service.SERVICE_SUSPENSION_REPAIR: (2500, 15000, 1500, 5000),
+    Service.SERVICE_CUSTOM: (0, 10000, 500, 5000),
+}
+
+# Work description per service type (keywords feed the recommendation rules)
+WORK_DONE = {
+    Service.SERVICE_OIL_CHANGE: 'Engine oil and oil filter changed',
+    Service.SERVICE_GENERAL_CHECKUP: 'General inspection, fluids topped up',
+    Service.SERVICE_BRAKE_INSPECTION: 'Brake pads inspected, brake fluid replaced',
+    Service.SERVICE_TYRE_REPLACEMENT: 'Tyres replaced and wheel alignment done',
+    Service.SERVICE_AC_SERVICE: 'AC gas refilled, cabin filter cleaned',
+    Service.SERVICE_BATTERY_REPLACEMENT: 'Battery replaced',
+    Service.SERVICE_ENGINE_TUNEUP: 'Spark plugs replaced, engine tuned',
+    Service.SERVICE_SUSPENSION_REPAIR: 'Shock absorbers and bushes replaced',
+    Service.SERVICE_CUSTOM: 'Custom repair as described by customer',
+}
+
+ISSUES = [
+    'Squeaking noise while braking',
+    'Engine warning light on',
+    'AC not cooling',
+    'Vibration at high speed',
+    'Hard starting in the morning',
+]
+
+# Seasonal demand per calendar month (monsoon and festive months are busiest)
+MONTH_WEIGHTS = {1: 0.8, 2: 0.75, 3: 0.85, 4: 0.9, 5: 1.0, 6: 1.15, 7: 1.25, 8: 1.2, 9: 1.05, 10: 1.3, 11: 1.35, 12: 1.0}
+
+
+def _cumulative(weights):
+    total, cumulative = 0, []
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return cumulative
+
+
+@contextmanager
+def explicit_created_at(*models):
+    """Let bulk_create keep explicit created_at values instead of auto_now_add."""
+    fields = [model._meta.get_field('created_at') for model in models]
+    previous = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, previous):
+            field.auto_now_add = value
+
+
+class SampleDataGenerator:
+    """Deterministic, chunked generator of a realistic service history."""
+
+    def __init__(self, services=1000, customers=None, mechanics=None, seed=42,
+                 chunk_size=5000, days=730, prefix='sample', password='password123'):
+        self.services = services
+        self.customers = customers or max(10, services // 20)
+        self.mechanics = mechanics or max(3, services // 1000)
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.days = days
+        self.prefix = prefix
+        self.password = password
+        # VINs and registration numbers carry a digest of the whole prefix, so prefixes
+        # sharing their first letters (sample, sample2) still generate distinct values
+        tag = f'{prefix[:3].upper()}{hashlib.sha1(prefix.encode()).hexdigest()[:5].upper()}'
+        self.vin_prefix = f'{tag}{seed % 1000:03d}'
+        self.registration_prefix = f'{tag}-'
+        # Anchor dates at the start of today so reruns on the same day are identical
+        self.now = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def rng(self, kind, chunk):
+        return random.Random(f'{self.seed}-{kind}-{chunk}')
+
+    def chunks(self, total, start=0, stop=None):
+        """Chunk indices covering item indices [start, stop) of `total` items."""
+        stop = total if stop is None else min(stop, total)
+        first = start // self.chunk_size
+        last = (stop + self.chunk_size - 1) // self.chunk_size
+        return range(first, last)
+
+    # People and vehicles
+
+    def prefix_in_use(self):
+        """Whether users, VINs or registration numbers this prefix generates already exist."""
+        return User.objects.filter(username__startswith=f'{self.prefix}_').exists() or Vehicle.objects.filter(
+            Q(vin__startswith=self.vin_prefix) | Q(registration_number__startswith=self.registration_prefix)
+        ).exists()
+
+    def create_people(self):
+        """Create customers, mechanics, profiles and vehicles. Returns the number of vehicles."""
+        password = make_password(self.password)
+        for role, count in ((Profile.ROLE_CUSTOMER, self.customers), (Profile.ROLE_MECHANIC, self.mechanics)):
+            for chunk in self.chunks(count):
+                rng = self.rng(role, chunk)
+                indices = range(chunk * self.chunk_size, min((chunk + 1) * self.chunk_size, count))
+                with transaction.atomic():
+                    users = User.objects.bulk_create([
+                        User(
+                            username=f'{self.prefix}_{role}_{i}',
+                            email=f'{self.prefix}_{role}_{i}@example.com',
+                            first_name=rng.choice(['Aarav', 'Diya', 'Kabir', 'Isha', 'Rohan', 'Meera', 'Arjun', 'Sara']),
+                            last_name=rng.choice(['Sharma', 'Patel', 'Reddy', 'Iyer', 'Khan', 'Singh', 'Das', 'Nair']),
+                            password=password,
+                        )
+                        for i in indices
+                    ])
+                    if any(user.pk is None for user in users):
+                        users = User.objects.filter(username__in=[u.username for u in users]).order_by('id')
+                    Profile.objects.bulk_create([
+                        Profile(
+                            user=user,
+                            role=role,
+                            phone=f'+91 9{rng.randint(100000000, 999999999)}',
+                            address=f'{rng.randint(1, 999)} {rng.choice(["MG Road", "Park Street", "Lake View", "Ring Road"])}',
+                        )
+                        for user in users
+                    ])
+
+        customer_ids = self.user_ids(Profile.ROLE_CUSTOMER)
+        vehicles = 0
+        for chunk in self.chunks(len(customer_ids)):
+            rng = self.rng('vehicle', chunk)
+            batch = []
+            for i in range(chunk * self.chunk_size, min((chunk + 1) * self.chunk_size, len(customer_ids))):
+                # Most customers own one vehicle, some own a small fleet
+                for _ in range(rng.choices([1, 2, 3], weights=[70, 22, 8])[0]):
+                    make = rng.choice(list(MAKES_AND_MODELS))
+                    year = rng.randint(2010, self.now.year)
+                    number = vehicles + len(batch)
+                    batch.append(Vehicle(
+                        owner_id=customer_ids[i],
+                        vehicle_type=rng.choices([Vehicle.TYPE_CAR, Vehicle.TYPE_SUV, Vehicle.TYPE_BIKE], weights=[65, 25, 10])[0],
+                        make=make,
+                        model=rng.choice(MAKES_AND_MODELS[make]),
+                        year=year,
+                        # Index-derived identifiers are unique by construction
+                        vin=f'{self.vin_prefix}{number:010d}',
+                        registration_number=f'{self.registration_prefix}{number:08d}',
+                        mileage=max(0, int((self.now.year - year + 0.5) * rng.gauss(11000, 3000))),
+                    ))
+            with transaction.atomic():
+                Vehicle.objects.bulk_create(batch)
+            vehicles += len(batch)
+        return vehicles
+
+    def user_ids(self, role):
+        """Generated user ids for a role, in a stable order."""
+        return list(User.objects.filter(
+            username__startswith=f'{self.prefix}_{role}_', profile__role=role
+        ).order_by('id').values_list('id', flat=True))
+
+    # Services and records
+
+    def load_pools(self):
+        customer_ids = self.user_ids(Profile.ROLE_CUSTOMER)
+        mechanic_ids = self.user_ids(Profile.ROLE_MECHANIC)
+        vehicles_by_owner = {}
+        for vehicle_id, owner_id, mileage in Vehicle.objects.filter(
+            owner_id__in=customer_ids
+        ).order_by('id').values_list('id', 'owner_id', 'mileage').iterator(chunk_size=10000):
+            vehicles_by_owner.setdefault(owner_id, []).append((vehicle_id, mileage or 0))
+        return {
+            'customers': customer_ids,
+            # A few regulars book far more often than the long tail
+            'customer_weights': _cumulative(1.0 / (1 + i % 50) ** 0.5 for i in range(len(customer_ids))),
+            'mechanics': mechanic_ids,
+            # Skewed workload: senior mechanics take most jobs (Zipf, s=1)
+            'mechanic_weights': _cumulative(1.0 / (rank + 1) for rank in range(len(mechanic_ids))),
+            'vehicles': vehicles_by_owner,
+        }
+
+    def random_created_at(self, rng):
+        """Creation time within the last `days`, weighted by seasonal demand."""
+        while True:
+            created_at = self.now - timedelta(days=rng.random() * self.days)
+            if rng.random() * 1.35 <= MONTH_WEIGHTS[created_at.month]:
+                return created_at
+
+    def random_status(self, rng, created_at):
+        age_days = (self.now - created_at).days
+        if age_days > 30:
+            weights = [3, 2, 95]
+        elif age_days > 7:
+            weights = [20, 30, 50]
+        else:
+            weights = [60, 30, 10]
+        return rng.choices(
+            [Service.STATUS_PENDING, Service.STATUS_IN_PROGRESS, Service.STATUS_COMPLETED], weights=weights
+        )[0]
+
+    def status_events(self, rng, service):
+        """Booking, assignment, start and completion events leading to the service's current state."""
+        def event(at, status, previous_status, mechanic_id, previous_mechanic_id):
+            return ServiceStatusEvent(
+                service=service, status=status, previous_status=previous_status,
+                mechanic_id=mechanic_id, previous_mechanic_id=previous_mechanic_id,
+                created_at=min(at, self.now),
+            )
+
+        at = service.created_at
+        events = [event(at, Service.STATUS_PENDING, None, None, None)]
+        mechanic_id = service.assigned_mechanic_id
+        if mechanic_id is not None:
+            at += timedelta(hours=rng.expovariate(1 / 6))
+            events.append(event(at, Service.STATUS_PENDING, Service.STATUS_PENDING, mechanic_id, None))
+        if service.status != Service.STATUS_PENDING:
+            at += timedelta(hours=rng.expovariate(1 / 12))
+            events.append(event(at, Service.STATUS_IN_PROGRESS, Service.STATUS_PENDING, mechanic_id, mechanic_id))
+        if service.status == Service.STATUS_COMPLETED:
+            at += timedelta(hours=rng.lognormvariate(1.5, 0.8))
+            events.append(event(at, Service.STATUS_COMPLETED, Service.STATUS_IN_PROGRESS, mechanic_id, mechanic_id))
+        return events
+
+    def create_services(self, pools, start=0, stop=None):
+        """
+        Create services (with their status events, and records for completed ones)
+        for item indices [start, stop).
+        """
+        service_types = list(SERVICE_TYPE_WEIGHTS)
+        type_weights = _cumulative(SERVICE_TYPE_WEIGHTS.values())
+        created = 0
+
+        for chunk in self.chunks(self.services, start, stop):
+            rng = self.rng('service', chunk)
+            services, records = [], []
+            for _ in range(chunk * self.chunk_size, min((chunk + 1) * self.chunk_size, self.services)):
+                customer_id = rng.choices(pools['customers'], cum_weights=pools['customer_weights'])[0]
+                service_type = rng.choices(service_types, cum_weights=type_weights)[0]
+                created_at = self.random_created_at(rng)
+                status = self.random_status(rng, created_at)
+                assigned = status != Service.STATUS_PENDING or rng.random() < 0.4
+                mechanic_id = (
+                    rng.choices(pools['mechanics'], cum_weights=pools['mechanic_weights'])[0]
+                    if assigned and pools['mechanics'] else None
+                )
+                services.append(Service(
+                    customer_id=customer_id,
+                    service_type=service_type,
+                    custom_description='Strange rattle from the rear' if service_type == Service.SERVICE_CUSTOM else None,
+                    status=status,
+                    assigned_mechanic_id=mechanic_id,
+                    created_at=created_at,
+                ))
+
+                owned = pools['vehicles'].get(customer_id)
+                if status == Service.STATUS_COMPLETED and owned:
+                    vehicle_id, mileage = rng.choice(owned)
+                    parts_lo, parts_hi, labor_lo, labor_hi = COST_RANGES[service_type]
+                    service_date = (created_at + timedelta(days=rng.randint(0, 3))).date()
+                    age_fraction = max(0.0, 1 - (self.now - created_at).days / 3650)
+                    records.append(ServiceRecord(
+                        vehicle_id=vehicle_id,
+                        service_type=service_type,
+                        service_date=min(service_date, self.now.date()),
+                        odometer_reading=int(mileage * age_fraction),
+                        issues_reported=rng.choice(ISSUES) if rng.random() < 0.3 else None,
+                        work_done=WORK_DONE[service_type],
+                        parts_cost=Decimal(rng.randint(parts_lo, parts_hi)),
+                        labor_cost=Decimal(rng.randint(labor_lo, labor_hi)),
+                        mechanic_id=mechanic_id,
+                        created_at=created_at,
+                    ))
+
+            with transaction.atomic(), explicit_created_at(Service, ServiceRecord):
+                Service.objects.bulk_create(services)
+                ServiceRecord.objects.bulk_create(records)
+                # Drawn from a separate RNG so the services themselves do not depend on it
+                event_rng = self.rng('event', chunk)
+                ServiceStatusEvent.objects.bulk_create(
+                    [event for service in services for event in self.status_events(event_rng, service)],
+                    batch_size=self.chunk_size,
+                )
+            created += len(services)
+        return created
@@ -0,0 +1,190 @@
+"""
+Concurrency-safe Service writes.
+Every Service write bumps `version` (Service.save() does it, set-based writers must too),
+so a write conditioned on the version a user read fails instead of silently overwriting
+a concurrent edit. Such conditional writes are queryset updates, which skip the save()
+signals; record_updates() then maintains the derived state once per batch: rollups,
+status events and turnaround statistics, customer dashboard snapshots and the
+analytics cache version.
+update_statuses applies a batch of status changes with one UPDATE per target status.
+Mechanics pull work with claim_next_job: with SELECT ... FOR UPDATE SKIP LOCKED where
+the database supports it (PostgreSQL), so concurrent claimers never wait on each other,
+and with compare-and-set on the version elsewhere (SQLite).
+"""
+
+import random
+from collections import Counter, defaultdict
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import dashboard_snapshots, turnaround
+from .response_cache import bump_data_version
+from .rollups import BATCH_SIZE, apply_rollup_deltas, rollup_key
+
+# Oldest candidates a compare-and-set claimer tries before looking again
+CLAIM_WINDOW = 16
+CLAIM_ATTEMPTS = 5
+
+# Most status changes accepted in one batch
+MAX_BATCH_STATUS_UPDATES = 500
+
+# Fields loaded for services whose writes are recorded
+SERVICE_FIELDS = ('customer', 'service_type', 'status', 'assigned_mechanic', 'created_at', 'version')
+
+
+class StaleServiceError(Exception):
+    """The service was changed by someone else since it was read."""
+
+
+def record_updates(changes):
+    """
+    Maintain derived state for services written with queryset.update().
+    `changes` holds (service, previous_status, previous_mechanic_id), each service
+    carrying its new state. Call inside the writing transaction.
+    """
+    if not changes:
+        return
+    deltas = Counter()
+    for service, previous_status, previous_mechanic_id in changes:
+        month, _, service_type, _ = key = rollup_key(service)
+        deltas[(month, previous_status, service_type, previous_mechanic_id)] -= 1
+        deltas[key] += 1
+    apply_rollup_deltas(deltas)
+    turnaround.record_transitions(changes)
+
+    dashboard_snapshots.invalidate_customers_on_commit(service.customer_id for service, _, _ in changes)
+    transaction.on_commit(bump_data_version)
+
+
+def _compare_and_set(service, now, **changes):
+    """Write `changes` if the stored version still equals service.version; record them on success."""
+    from .models import Service
+
+    previous = (service.status, service.assigned_mechanic_id)
+    with transaction.atomic():
+        updated = Service.objects.filter(pk=service.pk, version=service.version).update(
+            version=F('version') + 1, updated_at=now, **changes
+        )
+        if not updated:
+            return False
+        for field, value in changes.items():
+            setattr(service, field, value)
+        service.version += 1
+        service.updated_at = now
+        record_updates([(service, *previous)])
+    return True
+
+
+def update_service(service_id, expected_version, **changes):
+    """
+    Apply `changes` (status and/or assigned_mechanic) to a service only if it is still at
+    `expected_version`, the version the caller read. Raises StaleServiceError otherwise.
+    Returns the updated Service.
+    """
+    from .models import Service
+
+    service = Service.objects.only(*SERVICE_FIELDS).get(pk=service_id)
+    # Every write bumps the version, so a matching version means `service` is the state being replaced
+    if service.version != expected_version or not _compare_and_set(service, timezone.now(), **changes):
+        raise StaleServiceError(f'Service #{service_id} was changed by someone else')
+    return service
+
+
+def _claimable(service_type=None):
+    from .models import Service
+
+    services = Service.objects.filter(status=Service.STATUS_PENDING, assigned_mechanic__isnull=True)
+    if service_type:
+        services = services.filter(service_type=service_type)
+    return services.only(*SERVICE_FIELDS).order_by('created_at', 'id')
+
+
+def claim_next_job(mechanic, service_type=None):
+    """
+    Assign the oldest unassigned pending service (of `service_type` if given) to `mechanic`.
+    Returns the claimed Service, or None when no matching job is left (or, without
+    SKIP LOCKED, every candidate kept being taken by other claimers).
+    """
+    now = timezone.now()
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            service = _claimable(service_type).select_for_update(skip_locked=True).first()
+            if service is not None:
+                # The row lock keeps the version unchanged, so this always succeeds
+                _compare_and_set(service, now, assigned_mechanic=mechanic)
+            return service
+
+    # Candidates are read outside the write transaction: on SQLite a transaction that
+    # reads before writing cannot wait for the write lock and fails as "database is locked"
+    for _ in range(CLAIM_ATTEMPTS):
+        candidates = list(_claimable(service_type)[:CLAIM_WINDOW])
+        if not candidates:
+            return None
+        # Claimers start at different points of the window instead of all racing for the oldest
+        start = random.randrange(len(candidates))
+        for service in candidates[start:] + candidates[:start]:
+            try:
+                if _compare_and_set(service, now, assigned_mechanic=mechanic):
+                    return service
+            except OperationalError as e:
+                # SQLite hands the write lock out unfairly, so under heavy contention a claimer
+                # can time out waiting for it; nothing was written, so count it as a lost race
+                if 'locked' not in str(e):
+                    raise
+    return None
+
+
+def update_statuses(changes, mechanic=None):
+    """
+    Apply a batch of (service_id, status, expected_version) changes in one transaction;
+    expected_version may be None to skip the concurrency check. With `mechanic`, only
+    services assigned to them can be changed. The services are loaded and locked with one
+    query and written with one UPDATE per target status; derived state is updated once.
+    Returns one result per change, in order: {'id', 'ok', 'status', 'version'} or {'id', 'ok', 'error'}.
+    """
+    from .models import Service
+
+    statuses = dict(Service.STATUS_CHOICES)
+    with transaction.atomic():
+        services = Service.objects.select_for_update().filter(pk__in={service_id for service_id, _, _ in changes})
+        if mechanic is not None:
+            services = services.filter(assigned_mechanic=mechanic)
+        services = {service.pk: service for service in services.only(*SERVICE_FIELDS)}
+
+        results, seen, by_status = [], set(), defaultdict(list)
+        for service_id, status, expected_version in changes:
+            service = services.get(service_id)
+            if service_id in seen:
+                error = 'Service appears more than once in the batch'
+            elif status not in statuses:
+                error = f'Unknown status {status}'
+            elif service is None:
+                error = 'Service not found' if mechanic is None else 'Service not found or not assigned to you'
+            elif expected_version is not None and service.version != expected_version:
+                error = 'Service was changed by someone else'
+            else:
+                error = None
+            seen.add(service_id)
+            if error:
+                results.append({'id': service_id, 'ok': False, 'error': error})
+                continue
+            by_status[status].append(service)
+            results.append({'id': service_id, 'ok': True, 'status': status, 'version': service.version + 1})
+
+        now = timezone.now()
+        updated = []
+        for status, group in by_status.items():
+            ids = [service.pk for service in group]
+            for offset in range(0, len(ids), BATCH_SIZE):
+                Service.objects.filter(pk__in=ids[offset:offset + BATCH_SIZE]).update(
+                    status=status, updated_at=now, version=F('version') + 1
+                )
+            for service in group:
+                updated.append((service, service.status, service.assigned_mechanic_id))
+                service.status = status
+                service.version += 1
+                service.updated_at = now
+        record_updates(updated)
+    return results
@@ -1,18 +1,226 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save, pre_delete, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import Profile
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Profile, RecordImport, ReportJob, Service, StoredFile, ServiceRecord, ServicePrediction, TurnaroundStatistic, Vehicle
+from .rollups import rollup_key, move_service, grouped_counts, apply_rollup_delta
+from .cost_stats import record_cost, record_segments, add_cost, remove_cost, move_vehicle_costs
+from .response_cache import bump_data_version
+from .user_search import SEARCH_FIELDS, index_user, unindex_user
+from .turnaround import record_transitions
+from . import dashboard_snapshots
 
 User = get_user_model()
 
 @receiver(post_save, sender=User)
-def create_or_update_user_profile(sender, instance, created, **kwargs):
+def create_or_update_user_profile(sender, instance, created, update_fields=None, **kwargs):
     """
     When a User is created, create a Profile.
     If the user is updated, save the profile (safe if already exists).
+    Logins only touch last_login and leave the profile alone.
     """
     if created:
         Profile.objects.create(user=instance)
+    elif update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
     else:
         # Ensure profile exists and save updates if needed
         Profile.objects.get_or_create(user=instance)[0].save()
+
+
+@receiver(post_save, sender=User)
+def update_user_search_index(sender, instance, update_fields=None, **kwargs):
+    """Keep the user search index in step; logins only touch last_login and are skipped."""
+    if update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS):
+        return
+    index_user(instance)
+
+
+@receiver(post_delete, sender=User)
+def remove_user_from_search_index(sender, instance, **kwargs):
+    unindex_user(instance.pk)
+
+
+@receiver(pre_save, sender=Service)
+def remember_service_rollup_key(sender, instance, **kwargs):
+    """Capture the rollup key the stored row is currently counted under, and its status and mechanic."""
+    previous = None
+    if instance.pk:
+        previous = Service.objects.filter(pk=instance.pk).only(
+            'created_at', 'status', 'service_type', 'assigned_mechanic'
+        ).first()
+    instance._rollup_previous_key = rollup_key(previous) if previous else None
+    instance._status_previous = (previous.status, previous.assigned_mechanic_id) if previous else None
+
+
+@receiver(post_save, sender=Service)
+def update_service_rollups(sender, instance, created, **kwargs):
+    """Move the service between rollup rows when it is created, reassigned or changes status."""
+    previous_key = None if created else getattr(instance, '_rollup_previous_key', None)
+    move_service(previous_key, rollup_key(instance))
+
+
+@receiver(post_save, sender=Service)
+def log_status_transition(sender, instance, created, **kwargs):
+    """Append a status event when a service is booked, changes status or is reassigned."""
+    previous = None if created else getattr(instance, '_status_previous', None)
+    previous_status, previous_mechanic_id = previous or (None, None)
+    record_transitions([(instance, previous_status, previous_mechanic_id)])
+
+
+@receiver(pre_delete, sender=Service)
+def remove_service_from_rollups(sender, instance, **kwargs):
+    move_service(rollup_key(instance), None)
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def mark_prediction_stale(sender, instance, created=True, **kwargs):
+    """New or deleted services change the customer's service intervals."""
+    if created:
+        ServicePrediction.objects.filter(customer_id=instance.customer_id).update(is_stale=True)
+
+
+@receiver(pre_delete, sender=User)
+def unassign_mechanic_rollups(sender, instance, **kwargs):
+    """
+    Deleting a mechanic sets assigned_mechanic to NULL on their services without
+    sending save signals; count the surviving services as unassigned.
+    Their own rollup rows are removed by the cascade.
+    """
+    surviving = Service.objects.filter(assigned_mechanic=instance).exclude(customer=instance)
+    for (month, status, service_type, _), count in grouped_counts(surviving).items():
+        apply_rollup_delta((month, status, service_type, None), count)
+
+
+@receiver(pre_delete, sender=User)
+def touch_unassigned_services(sender, instance, **kwargs):
+    """
+    The SET NULL cascade bypasses auto_now and the version bump; stamp the rows so snapshot
+    refreshes see them and edits of the old assignment are refused.
+    """
+    Service.objects.filter(assigned_mechanic=instance).exclude(customer=instance).update(
+        updated_at=timezone.now(), version=F('version') + 1
+    )
+
+
+@receiver(pre_delete, sender=User)
+def log_unassigned_services(sender, instance, **kwargs):
+    """Log the SET NULL cascade as unassignments; the mechanic's own statistics go with them."""
+    services = list(Service.objects.filter(assigned_mechanic=instance).exclude(customer=instance).only(
+        'created_at', 'status', 'service_type', 'assigned_mechanic'
+    ))
+    for service in services:
+        service.assigned_mechanic_id = None
+    record_transitions([(service, service.status, instance.pk) for service in services])
+    TurnaroundStatistic.objects.filter(segment=TurnaroundStatistic.mechanic_segment(instance.pk)).delete()
+
+
+def _contribution(record):
+    """(cost, segments) a record contributes to the cost statistics, or None."""
+    cost = record_cost(record)
+    return (cost, record_segments(record)) if cost is not None else None
+
+
+@receiver(pre_save, sender=ServiceRecord)
+def remember_record_cost(sender, instance, **kwargs):
+    """Capture the cost and segments the stored record currently contributes."""
+    previous = None
+    if instance.pk:
+        previous = ServiceRecord.objects.filter(pk=instance.pk).only(
+            'vehicle', 'service_type', 'parts_cost', 'labor_cost'
+        ).first()
+    instance._cost_previous = _contribution(previous) if previous is not None else None
+
+
+@receiver(post_save, sender=ServiceRecord)
+def update_cost_stats(sender, instance, created, **kwargs):
+    previous = None if created else getattr(instance, '_cost_previous', None)
+    current = _contribution(instance)
+    if previous == current:
+        return
+    if previous is not None:
+        remove_cost(*previous)
+    if current is not None:
+        add_cost(*current)
+
+
+@receiver(pre_delete, sender=ServiceRecord)
+def remember_deleted_record_cost(sender, instance, **kwargs):
+    instance._cost_previous = _contribution(instance)
+
+
+@receiver(post_delete, sender=ServiceRecord)
+def remove_deleted_record_cost(sender, instance, **kwargs):
+    """Runs after the row is gone so min/max recomputation no longer sees it."""
+    previous = getattr(instance, '_cost_previous', None)
+    if previous is not None:
+        remove_cost(*previous)
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_analytics_cache(sender, **kwargs):
+    """
+    Service and Profile (role, mechanic names) writes change analytics payloads.
+    The version moves after commit: bumped earlier, a concurrent request could cache
+    a payload computed from the pre-commit data under the new version.
+    """
+    transaction.on_commit(bump_data_version)
+
+
+def _invalidate_dashboard_on_commit(*customer_ids):
+    for customer_id in set(customer_ids):
+        if customer_id is not None:
+            transaction.on_commit(lambda customer_id=customer_id: dashboard_snapshots.invalidate(customer_id))
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_customer_dashboard(sender, instance, **kwargs):
+    _invalidate_dashboard_on_commit(instance.customer_id)
+
+
+@receiver(pre_save, sender=Vehicle)
+def remember_vehicle_owner(sender, instance, **kwargs):
+    """A vehicle moving to another owner changes both customers' dashboards and cost statistics."""
+    instance._previous_owner_id = None
+    if instance.pk:
+        instance._previous_owner_id = Vehicle.objects.filter(pk=instance.pk).values_list(
+            'owner_id', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Vehicle)
+def move_vehicle_cost_segment(sender, instance, created, **kwargs):
+    """The vehicle's records now count toward the new owner's cost statistics."""
+    previous_owner_id = getattr(instance, '_previous_owner_id', None)
+    if not created and previous_owner_id is not None and previous_owner_id != instance.owner_id:
+        move_vehicle_costs(instance.pk, previous_owner_id, instance.owner_id)
+
+
+@receiver(post_save, sender=Vehicle)
+@receiver(post_delete, sender=Vehicle)
+def invalidate_vehicle_owner_dashboard(sender, instance, **kwargs):
+    _invalidate_dashboard_on_commit(instance.owner_id, getattr(instance, '_previous_owner_id', None))
+
+
+@receiver(post_save, sender=ServiceRecord)
+@receiver(post_delete, sender=ServiceRecord)
+def invalidate_record_owner_dashboard(sender, instance, **kwargs):
+    if ServiceRecord.vehicle.is_cached(instance):
+        owner_id = instance.vehicle.owner_id
+    else:
+        owner_id = Vehicle.objects.filter(pk=instance.vehicle_id).values_list('owner_id', flat=True).first()
+    _invalidate_dashboard_on_commit(owner_id)
+
+
+@receiver(post_delete, sender=ReportJob)
+@receiver(post_delete, sender=RecordImport)
+def delete_job_file(sender, instance, **kwargs):
+    # The job only points at its file, so the file outlives it unless removed here
+    StoredFile.objects.filter(pk=instance.file_id).delete()
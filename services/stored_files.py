@@ -0,0 +1,52 @@
+"""
+Files kept in the database (StoredFile / StoredFileChunk).
+Background jobs may run on a different host than the web process that queued them
+or serves their result (on Vercel they always do), and the database is the only
+storage both share. Files are written and read one chunk at a time, so memory stays
+bounded by CHUNK_BYTES whatever the file size.
+"""
+
+import tempfile
+
+from django.db import transaction
+
+from .models import StoredFile, StoredFileChunk
+
+CHUNK_BYTES = 1024 * 1024
+
+
+def save_file(name, fileobj):
+    """Store the rest of a binary file object under `name`; returns the StoredFile."""
+    with transaction.atomic():
+        stored = StoredFile.objects.create(name=name)
+        index = size = 0
+        while True:
+            data = fileobj.read(CHUNK_BYTES)
+            if not data:
+                break
+            StoredFileChunk.objects.create(file=stored, index=index, data=data)
+            index += 1
+            size += len(data)
+        stored.size = size
+        stored.save(update_fields=['size'])
+    return stored
+
+
+def iter_chunks(stored):
+    """Yield the content of a StoredFile as bytes, one chunk per query."""
+    chunk_ids = list(stored.chunks.order_by('index').values_list('pk', flat=True))
+    for chunk_id in chunk_ids:
+        yield bytes(StoredFileChunk.objects.values_list('data', flat=True).get(pk=chunk_id))
+
+
+def open_local(stored):
+    """A temporary local copy of a StoredFile (binary, seekable), positioned at the start."""
+    fileobj = tempfile.TemporaryFile()
+    try:
+        for data in iter_chunks(stored):
+            fileobj.write(data)
+        fileobj.seek(0)
+    except Exception:
+        fileobj.close()
+        raise
+    return fileobj
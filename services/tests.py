@@ -1,3 +1,1036 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import threading
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import dashboard_snapshots, response_cache
+from .cost_stats import rebuild_cost_stats
+from .logic import calculate_health_score
+from .models import (
+    CostStatistic, Profile, RecordImport, ReportJob, Service, ServiceRecord, ServiceRollup, ServiceStatusEvent,
+    StoredFile, TurnaroundStatistic, Vehicle,
+)
+from .pagination import decode_cursor, keyset_page
+from .predictions import ServicePredictor
+from .report_jobs import claim_next_job as claim_next_report_job, run_job
+from .record_import import claim_next_import, create_import, resume_import, run_import
+from .rollups import rebuild_rollups
+from .service_updates import StaleServiceError, claim_next_job, update_service, update_statuses
+from .timeseries import MAX_BUCKETS, calendar
+from .turnaround import completions_since, rebuild_turnaround_stats
+
+
+def make_user(username, role=Profile.ROLE_CUSTOMER):
+    user = User.objects.create_user(username=username)
+    user.profile.role = role
+    user.profile.save()
+    return user
+
+
+def make_vehicle(owner, registration='KA01AB1234'):
+    return Vehicle.objects.create(
+        owner=owner, make='Maruti', model='Swift', year=2020, vin=f'VIN{registration}', registration_number=registration
+    )
+
+
+def rollup_counts():
+    """{(month, status, service_type, mechanic id): count} of the non-empty rollup rows."""
+    return {
+        (row.month, row.status, row.service_type, row.assigned_mechanic_id): row.count
+        for row in ServiceRollup.objects.exclude(count=0)
+    }
+
+
+def reference_health_score(vehicle):
+    """The per-vehicle Python health score that Vehicle.objects.with_health_score() replaced."""
+    score = 100
+    now = timezone.now()
+    mileage = vehicle.mileage or 0
+    if mileage > 30000:
+        score -= min(20, (mileage - 30000) // 10000 * 2)
+    last_service = ServiceRecord.objects.filter(vehicle=vehicle).order_by('-service_date').first()
+    if last_service:
+        if (now.date() - last_service.service_date).days > 180:
+            score -= 15
+    elif (now - vehicle.created_at).days > 180:
+        score -= 15
+    recent_issues = ServiceRecord.objects.filter(
+        vehicle=vehicle, service_date__gte=now.date() - timedelta(days=365), issues_reported__isnull=False
+    ).exclude(issues_reported='').count()
+    score -= min(30, recent_issues * 10)
+    pending = Service.objects.filter(customer=vehicle.owner, status=Service.STATUS_PENDING).count()
+    score -= min(15, pending * 5)
+    return max(0, min(100, score))
+
+
+class AuthenticationBackendTests(TestCase):
+    def test_sessions_from_model_backend_stay_logged_in(self):
+        customer = make_user('customer')
+        self.client.force_login(customer, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get(reverse('dashboard_customer'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, customer)
+
+
+class HealthScoreTests(TestCase):
+    """The SQL health score agrees with the Python score it replaced."""
+
+    def test_matches_the_python_score(self):
+        today = timezone.now().date()
+        mileages = [None, 0, 30000, 39999, 40000, 65000, 130000, 900000]
+        # (days ago of each record, which of them reported issues)
+        histories = [
+            ([], []), ([10], []), ([180], [0]), ([181], [0]), ([400, 30], [0, 1]),
+            ([5, 50, 100, 200, 300], [0, 1, 2, 3]), ([364, 365, 366], [0, 1, 2]),
+        ]
+        ages = [0, 180, 181, 900]
+        owners = [make_user(f'owner{pending}') for pending in range(5)]
+        for pending, owner in enumerate(owners):
+            for _ in range(pending):
+                Service.objects.create(customer=owner, service_type=Service.SERVICE_OIL_CHANGE)
+            Service.objects.create(customer=owner, service_type=Service.SERVICE_OIL_CHANGE,
+                                   status=Service.STATUS_COMPLETED)
+
+        index = 0
+        for mileage in mileages:
+            for days_ago, issues in histories:
+                age = ages[index % len(ages)]
+                vehicle = make_vehicle(owners[index % len(owners)], registration=f'KA01{index:06d}')
+                Vehicle.objects.filter(pk=vehicle.pk).update(
+                    mileage=mileage, created_at=timezone.now() - timedelta(days=age, minutes=1)
+                )
+                for position, days in enumerate(days_ago):
+                    ServiceRecord.objects.create(
+                        vehicle=vehicle, service_date=today - timedelta(days=days), odometer_reading=1000,
+                        issues_reported='Noise' if position in issues else ('' if position % 2 else None),
+                    )
+                index += 1
+
+        scores = dict(Vehicle.objects.with_health_score().values_list('pk', 'health_score'))
+        self.assertGreater(len(set(scores.values())), 5)
+        for vehicle in Vehicle.objects.select_related('owner'):
+            with self.subTest(vehicle=vehicle.registration_number):
+                expected = reference_health_score(vehicle)
+                self.assertEqual(scores[vehicle.pk], expected)
+                self.assertEqual(calculate_health_score(vehicle), expected)
+
+
+class ServiceRollupTests(TestCase):
+    """The incrementally maintained rollups always equal a rebuild from the Service table."""
+
+    def setUp(self):
+        self.customer = make_user('customer')
+        self.mechanic = make_user('mechanic', Profile.ROLE_MECHANIC)
+        self.other_mechanic = make_user('other_mechanic', Profile.ROLE_MECHANIC)
+
+    def assertRollupsMatchRebuild(self):
+        incremental = rollup_counts()
+        rebuild_rollups()
+        self.assertEqual(incremental, rollup_counts())
+
+    def test_create_update_and_delete(self):
+        services = [
+            Service.objects.create(customer=self.customer, service_type=service_type)
+            for service_type in (Service.SERVICE_OIL_CHANGE, Service.SERVICE_OIL_CHANGE, Service.SERVICE_AC_SERVICE)
+        ]
+        self.assertEqual(sum(rollup_counts().values()), 3)
+
+        services[0].assigned_mechanic = self.mechanic
+        services[0].status = Service.STATUS_IN_PROGRESS
+        services[0].save()
+        services[1].assigned_mechanic = self.other_mechanic
+        services[1].save(update_fields=['assigned_mechanic'])
+        services[1].status = Service.STATUS_COMPLETED
+        services[1].save()
+        services[2].delete()
+        self.assertRollupsMatchRebuild()
+        self.assertEqual(sum(rollup_counts().values()), 2)
+
+    def test_save_without_changes_keeps_counts(self):
+        service = Service.objects.create(customer=self.customer, service_type=Service.SERVICE_OIL_CHANGE)
+        service.save()
+        Service.objects.get(pk=service.pk).save()
+        self.assertEqual(list(rollup_counts().values()), [1])
+        self.assertRollupsMatchRebuild()
+
+    def test_deleting_a_mechanic_moves_their_services_to_unassigned(self):
+        for _ in range(2):
+            Service.objects.create(
+                customer=self.customer, service_type=Service.SERVICE_BRAKE_INSPECTION, assigned_mechanic=self.mechanic
+            )
+        self.mechanic.delete()
+        self.assertEqual([key[3] for key in rollup_counts()], [None])
+        self.assertRollupsMatchRebuild()
+
+
+class ReportJobTests(TestCase):
+    """Report exports run in the background, and a worker whose lease expired cannot finish a reclaimed job."""
+
+    def setUp(self):
+        self.manager = make_user('manager', Profile.ROLE_MANAGER)
+        customer = make_user('customer')
+        for status in (Service.STATUS_PENDING, Service.STATUS_PENDING, Service.STATUS_COMPLETED):
+            Service.objects.create(customer=customer, service_type=Service.SERVICE_OIL_CHANGE, status=status)
+
+    def queue(self, **filters):
+        return ReportJob.objects.create(requested_by=self.manager, filters=filters)
+
+    def expire_lease(self, job):
+        ReportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+
+    def test_csv_export_end_to_end(self):
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('export_report'), {'format': 'csv', 'status': 'pending', 'mode': 'async'})
+        self.assertEqual(response.status_code, 202)
+        queued = response.json()
+        self.assertEqual(self.client.get(queued['download_url']).status_code, 409)
+
+        job = run_job(claim_next_report_job(), chunk_size=1)
+        self.assertEqual((job.status, job.total_rows, job.rows_written, job.attempts), (ReportJob.STATUS_DONE, 2, 2, 1))
+        self.assertIsNone(claim_next_report_job())
+        status = self.client.get(queued['status_url']).json()
+        self.assertEqual((status['status'], status['progress']), (ReportJob.STATUS_DONE, 100.0))
+
+        response = self.client.get(status['download_url'])
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content)
+        self.assertEqual(int(response['Content-Length']), len(content))
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8'))))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(
+            sorted(int(row[0]) for row in rows[1:]),
+            sorted(Service.objects.filter(status=Service.STATUS_PENDING).values_list('pk', flat=True)),
+        )
+
+        # The stored file goes with its job
+        ReportJob.objects.get(pk=job.pk).delete()
+        self.assertFalse(StoredFile.objects.exists())
+
+    @override_settings(BACKGROUND_JOB_LEASE_SECONDS=60)
+    def test_live_lease_is_not_reclaimed(self):
+        self.queue()
+        self.assertIsNotNone(claim_next_report_job())
+        self.assertIsNone(claim_next_report_job())
+
+    @override_settings(BACKGROUND_JOB_LEASE_SECONDS=60)
+    def test_expired_lease_is_requeued_and_the_stale_worker_fenced_off(self):
+        self.queue()
+        zombie = claim_next_report_job()
+        self.expire_lease(zombie)
+        owner = claim_next_report_job()
+        self.assertEqual((owner.pk, owner.attempts), (zombie.pk, 2))
+
+        # The old worker's first progress write is refused and it stores nothing
+        job = run_job(zombie)
+        self.assertEqual((job.status, job.attempts), (ReportJob.STATUS_RUNNING, 2))
+        self.assertFalse(StoredFile.objects.exists())
+
+        job = run_job(owner)
+        self.assertEqual((job.status, job.rows_written), (ReportJob.STATUS_DONE, 3))
+        self.assertEqual(StoredFile.objects.get().size, job.file.size)
+
+    @override_settings(BACKGROUND_JOB_LEASE_SECONDS=60, BACKGROUND_JOB_MAX_ATTEMPTS=2)
+    def test_job_fails_after_too_many_lost_leases(self):
+        job = self.queue()
+        for attempt in (1, 2):
+            claimed = claim_next_report_job()
+            self.assertEqual((claimed.pk, claimed.attempts), (job.pk, attempt))
+            self.expire_lease(claimed)
+        self.assertIsNone(claim_next_report_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.STATUS_FAILED)
+        self.assertEqual(job.error, 'The worker stopped responding on each of 2 attempts')
+
+
+def cost_statistics():
+    """{segment: CostStatistic} of the segments with contributing records."""
+    return {stat.segment: stat for stat in CostStatistic.objects.filter(count__gt=0)}
+
+
+class CostStatisticTests(TestCase):
+    """The running cost statistics follow record writes and agree with a rebuild, in every segment."""
+
+    def setUp(self):
+        self.customer = make_user('customer')
+        self.vehicle = make_vehicle(self.customer)
+
+    def add_record(self, parts, labor, service_type=None, vehicle=None):
+        return ServiceRecord.objects.create(
+            vehicle=vehicle or self.vehicle, odometer_reading=1000, service_type=service_type,
+            parts_cost=Decimal(parts), labor_cost=Decimal(labor),
+        )
+
+    def assertStatsMatchRebuild(self):
+        incremental = cost_statistics()
+        rebuild_cost_stats()
+        rebuilt = cost_statistics()
+        self.assertEqual(sorted(incremental), sorted(rebuilt))
+        for segment, stats in incremental.items():
+            with self.subTest(segment=segment):
+                expected = rebuilt[segment]
+                self.assertEqual(
+                    (stats.count, stats.total, stats.min_cost, stats.max_cost),
+                    (expected.count, expected.total, expected.min_cost, expected.max_cost),
+                )
+                self.assertAlmostEqual(stats.mean, expected.mean, places=6)
+                self.assertAlmostEqual(stats.variance, expected.variance, places=4)
+        return rebuilt
+
+    def test_add_update_and_delete(self):
+        records = [self.add_record(parts, labor, service_type) for parts, labor, service_type in [
+            ('100.00', '50.00', Service.SERVICE_OIL_CHANGE), ('20.00', '0.00', None),
+            ('900.50', '99.50', Service.SERVICE_ENGINE_TUNEUP), ('0.00', '0.00', Service.SERVICE_OIL_CHANGE),
+            ('310.25', '10.00', Service.SERVICE_OIL_CHANGE),
+        ]]
+        stats = self.assertStatsMatchRebuild()
+        self.assertEqual(sorted(stats), [
+            'all', f'customer:{self.customer.pk}', 'service_type:engine_tuneup', 'service_type:oil_change',
+        ])
+        everything = stats[CostStatistic.SEGMENT_ALL]
+        self.assertEqual(
+            (everything.count, everything.min_cost, everything.max_cost), (4, Decimal('20.00'), Decimal('1000.00'))
+        )
+        self.assertEqual(stats['service_type:oil_change'].count, 2)
+
+        records[0].labor_cost = Decimal('75.00')
+        records[0].save()
+        # A record dropping to zero stops contributing, one rising from zero starts
+        records[4].parts_cost = records[4].labor_cost = Decimal('0')
+        records[4].save()
+        records[3].parts_cost = Decimal('42.00')
+        records[3].save()
+        # A change of type moves the record between type segments only
+        records[2].service_type = Service.SERVICE_OIL_CHANGE
+        records[2].save()
+        self.assertStatsMatchRebuild()
+
+    def test_deleting_the_extremes_recomputes_min_and_max(self):
+        low = self.add_record('5.00', '0.00')
+        self.add_record('60.00', '0.00')
+        self.add_record('70.00', '0.00')
+        high = self.add_record('800.00', '0.00')
+        low.delete()
+        high.delete()
+        stats = self.assertStatsMatchRebuild()[CostStatistic.SEGMENT_ALL]
+        self.assertEqual((stats.count, stats.min_cost, stats.max_cost), (2, Decimal('60.00'), Decimal('70.00')))
+
+    def test_deleting_the_last_record_resets_the_statistics(self):
+        record = self.add_record('10.00', '5.00', Service.SERVICE_AC_SERVICE)
+        record.delete()
+        for stats in CostStatistic.objects.all():
+            self.assertEqual((stats.count, stats.total, stats.min_cost, stats.max_cost), (0, 0, None, None))
+            self.assertEqual((stats.mean, stats.m2), (0.0, 0.0))
+
+    def test_customers_and_vehicle_owner_changes(self):
+        other = make_user('other')
+        other_vehicle = make_vehicle(other, registration='KA02CD5678')
+        for parts in ('10.00', '500.00', '45.50'):
+            self.add_record(parts, '0.00')
+        self.add_record('99.00', '1.00', vehicle=other_vehicle)
+        self.assertStatsMatchRebuild()
+
+        self.vehicle.owner = other
+        self.vehicle.save()
+        stats = self.assertStatsMatchRebuild()
+        self.assertEqual(list(stats), ['all', f'customer:{other.pk}'])
+        self.assertEqual(stats[f'customer:{other.pk}'].count, 4)
+
+        other_vehicle.delete()
+        self.assertStatsMatchRebuild()
+
+    def test_import_merges_its_segments(self):
+        self.add_record('30.00', '0.00', Service.SERVICE_OIL_CHANGE)
+        rows = '\n'.join([
+            'registration_number,service_date,odometer_reading,parts_cost,labor_cost,service_type',
+            'KA01AB1234,2024-01-01,1000,100,20,oil_change',
+            'KA01AB1234,2024-02-01,2000,800,200,tyre_replacement',
+            'KA01AB1234,2024-03-01,3000,5,0,',
+            'KA01AB1234,2024-04-01,4000,5,0,hovercraft_tuning',
+        ]) + '\n'
+        job = run_import(create_import('records.csv', ContentFile(rows.encode('utf-8')), claim=True), chunk_size=2)
+        self.assertEqual((job.rows_inserted, job.rows_rejected), (3, 1))
+        self.assertEqual(job.rejections[0]['error'], 'Unknown service_type hovercraft_tuning')
+        stats = self.assertStatsMatchRebuild()
+        self.assertEqual(stats['service_type:oil_change'].count, 2)
+
+    def test_prediction_uses_the_most_specific_segment_with_enough_records(self):
+        self.assertEqual(ServicePredictor.predict_service_cost(self.customer)['segment'], None)
+        for cost in ('1000', '1100', '1200', '1300', '1400'):
+            self.add_record(cost, '0', Service.SERVICE_TYRE_REPLACEMENT)
+        for cost in ('100', '200'):
+            self.add_record(cost, '0', Service.SERVICE_OIL_CHANGE)
+
+        tyres = ServicePredictor.predict_service_cost(self.customer, Service.SERVICE_TYRE_REPLACEMENT)
+        self.assertEqual((tyres['segment'], tyres['min'], tyres['max'], tyres['avg']),
+                         ('service_type:tyre_replacement', 1000, 1400, 1200))
+        # Two oil changes are too few; the customer's own seven records are used
+        oil = ServicePredictor.predict_service_cost(self.customer, Service.SERVICE_OIL_CHANGE)
+        self.assertEqual((oil['segment'], oil['data_points']), (f'customer:{self.customer.pk}', 7))
+        self.assertEqual(ServicePredictor.predict_service_cost()['segment'], CostStatistic.SEGMENT_ALL)
+        # A new customer with no records of their own gets the overall figures
+        newcomer = ServicePredictor.predict_service_cost(make_user('newcomer'), Service.SERVICE_AC_SERVICE)
+        self.assertEqual((newcomer['segment'], newcomer['data_points']), (CostStatistic.SEGMENT_ALL, 7))
+
+
+class ServicePredictionTests(TestCase):
+    def test_customer_without_services_is_refreshed_once(self):
+        customer = make_user('newcomer')
+        with mock.patch.object(
+            ServicePredictor, 'refresh_predictions', wraps=ServicePredictor.refresh_predictions
+        ) as refresh:
+            for _ in range(3):
+                prediction = ServicePredictor.predict_next_service_date(customer)
+                self.assertEqual((prediction['method'], prediction['data_points']), ('Default (no history)', 0))
+            self.assertEqual(refresh.call_count, 1)
+
+            # The first booking marks the empty row stale, so the next visit refreshes it
+            for _ in range(2):
+                Service.objects.create(customer=customer, service_type=Service.SERVICE_OIL_CHANGE)
+            self.assertEqual(ServicePredictor.predict_next_service_date(customer)['data_points'], 2)
+            self.assertEqual(refresh.call_count, 2)
+
+
+class AnalyticsResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = make_user('customer')
+        Service.objects.create(customer=self.customer, service_type=Service.SERVICE_OIL_CHANGE)
+        self.client.force_login(make_user('manager', Profile.ROLE_MANAGER))
+        self.url = reverse('analytics_data_api')
+
+    def get_status(self, **headers):
+        return self.client.get(self.url, {'type': 'status'}, **headers)
+
+    def test_matching_etag_gets_not_modified(self):
+        response = self.get_status()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {Service.STATUS_PENDING: 1})
+        etag = response['ETag']
+
+        response = self.get_status(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get_status(HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+        counters = response_cache.stats()
+        self.assertEqual((counters['misses'], counters['hits'], counters['not_modified']), (1, 1, 1))
+
+    def test_service_change_invalidates_the_cached_payload(self):
+        etag = self.get_status()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.create(customer=self.customer, service_type=Service.SERVICE_OIL_CHANGE)
+
+        response = self.get_status(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json(), {Service.STATUS_PENDING: 2})
+        self.assertEqual(response_cache.stats()['hits'], 0)
+
+
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = make_user('customer')
+        self.vehicle = make_vehicle(self.customer)
+        self.other = make_user('other')
+        patcher = mock.patch.object(
+            dashboard_snapshots, 'build_context', wraps=dashboard_snapshots.build_context
+        )
+        self.build_context = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertRebuilt(self, rebuilt):
+        """Serve the dashboard twice, expecting one rebuild if `rebuilt`, none otherwise."""
+        self.build_context.reset_mock()
+        context = dashboard_snapshots.get_context(self.customer)
+        self.assertEqual(dashboard_snapshots.get_context(self.customer), context)
+        self.assertEqual(self.build_context.call_count, int(rebuilt))
+        return context
+
+    def test_snapshot_is_reused_until_the_customer_changes(self):
+        self.assertRebuilt(True)
+        self.assertRebuilt(False)
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.create(customer=self.other, service_type=Service.SERVICE_OIL_CHANGE)
+        self.assertRebuilt(False)
+
+    def test_service_change_invalidates_the_snapshot(self):
+        self.assertRebuilt(True)
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.create(customer=self.customer, service_type=Service.SERVICE_OIL_CHANGE)
+        self.assertEqual(len(self.assertRebuilt(True)['recent_services']), 1)
+
+    def test_record_change_invalidates_the_snapshot(self):
+        self.assertRebuilt(True)
+        with self.captureOnCommitCallbacks(execute=True):
+            record = ServiceRecord.objects.create(
+                vehicle=self.vehicle, odometer_reading=1000, issues_reported='Brake noise'
+            )
+        self.assertRebuilt(True)
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delete()
+        self.assertRebuilt(True)
+
+    def test_prediction_refresh_invalidates_the_snapshot(self):
+        self.assertRebuilt(True)
+        with self.captureOnCommitCallbacks(execute=True):
+            ServicePredictor.refresh_predictions([self.customer.pk])
+        self.assertRebuilt(True)
+
+    def test_invalidate_all(self):
+        self.assertRebuilt(True)
+        dashboard_snapshots.invalidate_all()
+        self.assertRebuilt(True)
+
+
+class TimeSeriesTests(TestCase):
+    def setUp(self):
+        self.client.force_login(make_user('manager', Profile.ROLE_MANAGER))
+
+    def get_series(self, start, end, granularity):
+        return self.client.get(reverse('analytics_data_api'), {
+            'type': 'timeseries', 'start': start, 'end': end, 'granularity': granularity,
+        })
+
+    def test_calendar_limits(self):
+        buckets, stop = calendar(date(2024, 1, 31), date(2024, 3, 1), 'month')
+        self.assertEqual((buckets, stop), ([date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)], date(2024, 4, 1)))
+        self.assertEqual(len(calendar(date(2024, 1, 1), date(2026, 9, 26), 'day')[0]), MAX_BUCKETS)
+        with self.assertRaisesMessage(ValueError, 'Range spans 3652059 day buckets'):
+            calendar(date.min, date.max, 'day')
+        buckets, stop = calendar(date(9999, 12, 1), date(9999, 12, 30), 'day')
+        self.assertEqual((len(buckets), stop), (30, date.max))
+        for granularity in ('day', 'week', 'month', 'quarter', 'year'):
+            with self.subTest(granularity=granularity):
+                with self.assertRaisesMessage(ValueError, 'Range must end before'):
+                    calendar(date(9999, 12, 1), date.max, granularity)
+
+    def test_unsupported_ranges_are_bad_requests(self):
+        response = self.get_series('2024-01-01', '2024-12-31', 'month')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['buckets']), 12)
+        for start, end, granularity in [
+            ('0001-01-01', '9999-12-31', 'day'),
+            ('9999-12-01', '9999-12-31', 'day'),
+            ('9999-12-01', '9999-12-31', 'week'),
+        ]:
+            with self.subTest(start=start, end=end, granularity=granularity):
+                response = self.get_series(start, end, granularity)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages cover every row once, newest first, whatever is inserted meanwhile."""
+
+    def setUp(self):
+        self.customer = make_user('customer')
+        for _ in range(7):
+            Service.objects.create(customer=self.customer, service_type=Service.SERVICE_OIL_CHANGE)
+        # Ties on created_at are broken by id
+        now = timezone.now()
+        ids = list(Service.objects.order_by('id').values_list('id', flat=True))
+        Service.objects.filter(id__in=ids[:4]).update(created_at=now - timedelta(hours=1))
+        Service.objects.filter(id__in=ids[4:]).update(created_at=now)
+        self.expected = ids[4:][::-1] + ids[:4][::-1]
+
+    def walk(self, page_size, between_pages=None):
+        seen, cursor = [], None
+        while True:
+            page = keyset_page(Service.objects.all(), 'created_at', cursor=cursor, page_size=page_size)
+            seen.extend(service.pk for service in page)
+            if not page.has_next:
+                return seen
+            cursor = page.next_cursor
+            if between_pages:
+                between_pages()
+
+    def test_pages_cover_every_row_once_in_order(self):
+        for page_size in (1, 2, 3, 7, 50):
+            self.assertEqual(self.walk(page_size), self.expected)
+
+    def test_rows_inserted_between_pages_do_not_shift_later_pages(self):
+        def book():
+            Service.objects.create(customer=self.customer, service_type=Service.SERVICE_AC_SERVICE)
+
+        self.assertEqual(self.walk(2, between_pages=book), self.expected)
+
+    def test_last_full_page_has_no_next_cursor(self):
+        page = keyset_page(Service.objects.all(), 'created_at', page_size=7)
+        self.assertEqual(len(page), 7)
+        self.assertIsNone(page.next_cursor)
+
+    def test_malformed_cursor(self):
+        for cursor in ('not-a-cursor', 'W10', 'WyJ4IiwgMV0'):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+    def test_pending_services_api(self):
+        self.client.force_login(make_user('manager', Profile.ROLE_MANAGER))
+        url = reverse('pending_services_api')
+        seen, params = [], {'page_size': 3}
+        while True:
+            data = self.client.get(url, params).json()
+            seen.extend(result['id'] for result in data['results'])
+            if data['next_cursor'] is None:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(self.client.get(url, {'cursor': 'bogus'}).status_code, 400)
+
+    def test_users_api(self):
+        manager = make_user('manager', Profile.ROLE_MANAGER)
+        for index in range(4):
+            make_user(f'mechanic{index}', Profile.ROLE_MECHANIC)
+        self.client.force_login(manager)
+        url = reverse('users_api')
+        first = self.client.get(url, {'role': Profile.ROLE_MECHANIC, 'page_size': 3}).json()
+        second = self.client.get(
+            url, {'role': Profile.ROLE_MECHANIC, 'page_size': 3, 'cursor': first['next_cursor']}
+        ).json()
+        self.assertIsNone(second['next_cursor'])
+        usernames = [user['username'] for user in first['results'] + second['results']]
+        self.assertEqual(sorted(usernames), [f'mechanic{index}' for index in range(4)])
+        self.assertEqual(len(set(usernames)), 4)
+
+    def test_pending_services_api_requires_a_manager(self):
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(reverse('pending_services_api')).status_code, 403)
+
+
+def turnaround_stats():
+    """{(metric, segment): (count, total seconds, min, max, sketch)} of every TurnaroundStatistic row."""
+    return {
+        (stat.metric, stat.segment): (
+            stat.count, round(stat.total_seconds, 3), stat.min_seconds, stat.max_seconds,
+            {key: count for key, count in stat.sketch.items() if count},
+        )
+        for stat in TurnaroundStatistic.objects.all()
+    }
+
+
+class TurnaroundTests(TestCase):
+    """Status changes are logged and the turnaround statistics agree with a replay of the log."""
+
+    def setUp(self):
+        self.customer = make_user('customer')
+        self.mechanic = make_user('mechanic', Profile.ROLE_MECHANIC)
+
+    def book(self, hours_ago=0, service_type=Service.SERVICE_OIL_CHANGE):
+        service = Service.objects.create(customer=self.customer, service_type=service_type)
+        if hours_ago:
+            Service.objects.filter(pk=service.pk).update(created_at=timezone.now() - timedelta(hours=hours_ago))
+            service.refresh_from_db()
+        return service
+
+    def move(self, service, status=None, mechanic=None):
+        if status is not None:
+            service.status = status
+        if mechanic is not None:
+            service.assigned_mechanic = mechanic
+        service.save()
+
+    def stat(self, metric, segment=TurnaroundStatistic.SEGMENT_ALL):
+        return TurnaroundStatistic.objects.get(metric=metric, segment=segment)
+
+    def test_transitions_are_logged(self):
+        service = self.book()
+        self.move(service, mechanic=self.mechanic)
+        service.save()
+        self.move(service, status=Service.STATUS_IN_PROGRESS)
+        self.move(service, status=Service.STATUS_COMPLETED)
+        events = list(ServiceStatusEvent.objects.filter(service=service).order_by('created_at', 'id').values_list(
+            'previous_status', 'status', 'previous_mechanic', 'mechanic'
+        ))
+        self.assertEqual(events, [
+            (None, Service.STATUS_PENDING, None, None),
+            (Service.STATUS_PENDING, Service.STATUS_PENDING, None, self.mechanic.pk),
+            (Service.STATUS_PENDING, Service.STATUS_IN_PROGRESS, self.mechanic.pk, self.mechanic.pk),
+            (Service.STATUS_IN_PROGRESS, Service.STATUS_COMPLETED, self.mechanic.pk, self.mechanic.pk),
+        ])
+        self.assertEqual(completions_since(timezone.now() - timedelta(hours=1)), {self.mechanic.pk: 1})
+
+    def test_durations_are_measured_from_booking(self):
+        service = self.book(hours_ago=3)
+        self.move(service, mechanic=self.mechanic)
+        self.move(service, status=Service.STATUS_IN_PROGRESS)
+        self.move(service, status=Service.STATUS_COMPLETED)
+
+        to_assign = self.stat(TurnaroundStatistic.METRIC_TIME_TO_ASSIGN)
+        to_complete = self.stat(TurnaroundStatistic.METRIC_TIME_TO_COMPLETE)
+        self.assertEqual((to_assign.count, to_complete.count), (1, 1))
+        self.assertAlmostEqual(to_assign.average, 3 * 3600, delta=60)
+        self.assertAlmostEqual(to_complete.average, 3 * 3600, delta=60)
+        self.assertEqual(self.stat(TurnaroundStatistic.METRIC_TIME_IN_PROGRESS).count, 1)
+        mechanic_segment = TurnaroundStatistic.mechanic_segment(self.mechanic.pk)
+        self.assertEqual(self.stat(TurnaroundStatistic.METRIC_TIME_TO_COMPLETE, mechanic_segment).count, 1)
+
+    def test_statistics_match_a_rebuild(self):
+        other_mechanic = make_user('other_mechanic', Profile.ROLE_MECHANIC)
+        first = self.book(hours_ago=5)
+        second = self.book(hours_ago=2, service_type=Service.SERVICE_AC_SERVICE)
+        self.book(hours_ago=1)
+        self.move(first, Service.STATUS_IN_PROGRESS, self.mechanic)
+        # Back to pending and reassigned: a second stint in progress, no second time to assign
+        self.move(first, Service.STATUS_PENDING, other_mechanic)
+        self.move(first, Service.STATUS_IN_PROGRESS)
+        self.move(first, Service.STATUS_COMPLETED)
+        # Reopened and completed again: time to complete counts only the first completion
+        self.move(first, Service.STATUS_IN_PROGRESS)
+        self.move(first, Service.STATUS_COMPLETED)
+        self.move(second, Service.STATUS_COMPLETED, self.mechanic)
+
+        incremental = turnaround_stats()
+        rebuild_turnaround_stats()
+        self.assertEqual(incremental, turnaround_stats())
+        self.assertEqual(self.stat(TurnaroundStatistic.METRIC_TIME_TO_ASSIGN).count, 2)
+        self.assertEqual(self.stat(TurnaroundStatistic.METRIC_TIME_IN_PROGRESS).count, 3)
+        self.assertEqual(self.stat(TurnaroundStatistic.METRIC_TIME_TO_COMPLETE).count, 2)
+
+
+class ServiceVersionTests(TestCase):
+    """Writes conditioned on the version a user read refuse to overwrite a concurrent change."""
+
+    def setUp(self):
+        self.mechanic = make_user('mechanic', Profile.ROLE_MECHANIC)
+        self.service = Service.objects.create(
+            customer=make_user('customer'), service_type=Service.SERVICE_OIL_CHANGE, assigned_mechanic=self.mechanic
+        )
+
+    def test_every_save_bumps_the_version(self):
+        version = self.service.version
+        self.service.save()
+        self.assertEqual(self.service.version, version + 1)
+        self.assertEqual(Service.objects.get(pk=self.service.pk).version, version + 1)
+
+    def test_update_with_the_current_version(self):
+        service = update_service(self.service.pk, self.service.version, status=Service.STATUS_IN_PROGRESS)
+        self.assertEqual(service.version, self.service.version + 1)
+        stored = Service.objects.get(pk=self.service.pk)
+        self.assertEqual((stored.status, stored.version), (Service.STATUS_IN_PROGRESS, service.version))
+        self.assertEqual(sum(rollup_counts().values()), 1)
+
+    def test_update_with_a_stale_version_is_refused(self):
+        stale = self.service.version
+        update_service(self.service.pk, stale, status=Service.STATUS_IN_PROGRESS)
+        with self.assertRaises(StaleServiceError):
+            update_service(self.service.pk, stale, status=Service.STATUS_COMPLETED)
+        self.assertEqual(Service.objects.get(pk=self.service.pk).status, Service.STATUS_IN_PROGRESS)
+
+    def test_status_form_refuses_a_stale_save(self):
+        self.client.force_login(self.mechanic)
+        url = reverse('services_update_status', args=[self.service.pk])
+        stale = self.service.version
+        Service.objects.get(pk=self.service.pk).save()
+
+        response = self.client.post(url, {'status': Service.STATUS_COMPLETED, 'version': stale})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'changed by someone else')
+        self.assertEqual(Service.objects.get(pk=self.service.pk).status, Service.STATUS_PENDING)
+
+        response = self.client.post(url, {'status': Service.STATUS_COMPLETED, 'version': stale + 1})
+        self.assertRedirects(response, reverse('dashboard_mechanic'), fetch_redirect_response=False)
+        self.assertEqual(Service.objects.get(pk=self.service.pk).status, Service.STATUS_COMPLETED)
+
+
+class ClaimNextJobTests(TestCase):
+    def setUp(self):
+        self.customer = make_user('customer')
+        self.mechanic = make_user('mechanic', Profile.ROLE_MECHANIC)
+
+    def test_claims_each_matching_job_once(self):
+        oil_changes = {
+            Service.objects.create(customer=self.customer, service_type=Service.SERVICE_OIL_CHANGE).pk
+            for _ in range(2)
+        }
+        Service.objects.create(customer=self.customer, service_type=Service.SERVICE_AC_SERVICE)
+
+        claimed = {claim_next_job(self.mechanic, Service.SERVICE_OIL_CHANGE).pk for _ in range(2)}
+        self.assertEqual(claimed, oil_changes)
+        self.assertIsNone(claim_next_job(self.mechanic, Service.SERVICE_OIL_CHANGE))
+        self.assertEqual(claim_next_job(self.mechanic).service_type, Service.SERVICE_AC_SERVICE)
+        self.assertIsNone(claim_next_job(self.mechanic))
+        self.assertEqual(Service.objects.filter(assigned_mechanic=self.mechanic).count(), 3)
+
+    def test_claim_endpoint(self):
+        self.client.force_login(self.mechanic)
+        url = reverse('services_claim_job')
+        self.assertEqual(self.client.post(url).status_code, 404)
+        service = Service.objects.create(customer=self.customer, service_type=Service.SERVICE_OIL_CHANGE)
+        data = self.client.post(url).json()
+        self.assertEqual((data['id'], data['version']), (service.pk, service.version + 1))
+        self.assertEqual(self.client.post(url, {'service_type': 'warp_drive'}).status_code, 400)
+
+
+class ConcurrentClaimTests(TransactionTestCase):
+    """Many mechanics claiming at once never get the same job, and every job is claimed."""
+
+    WORKERS = 8
+    JOBS = 80
+
+    def setUp(self):
+        self.mechanics = [make_user(f'mechanic{index}', Profile.ROLE_MECHANIC) for index in range(self.WORKERS)]
+        customer = make_user('customer')
+        now = timezone.now()
+        for index in range(self.JOBS):
+            service = Service.objects.create(customer=customer, service_type=Service.SERVICE_OIL_CHANGE)
+            Service.objects.filter(pk=service.pk).update(created_at=now - timedelta(minutes=self.JOBS - index))
+
+    def test_no_job_is_claimed_twice(self):
+        claims, errors = [], []
+        lock = threading.Lock()
+        barrier = threading.Barrier(self.WORKERS)
+
+        def work(mechanic):
+            try:
+                barrier.wait()
+                while True:
+                    try:
+                        service = claim_next_job(mechanic)
+                    except Exception as e:
+                        with lock:
+                            errors.append(e)
+                        return
+                    if service is not None:
+                        with lock:
+                            claims.append((service.pk, mechanic.pk))
+                    elif not Service.objects.filter(assigned_mechanic__isnull=True).exists():
+                        return
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(mechanic,)) for mechanic in self.mechanics]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        claimed = Counter(service_id for service_id, _ in claims)
+        self.assertEqual(len(claimed), self.JOBS)
+        self.assertEqual(max(claimed.values()), 1)
+        self.assertEqual(dict(claims), dict(Service.objects.values_list('pk', 'assigned_mechanic')))
+        assignments = Counter(ServiceStatusEvent.objects.filter(
+            previous_mechanic__isnull=True, mechanic__isnull=False
+        ).values_list('service_id', flat=True))
+        self.assertEqual(set(assignments.values()), {1})
+        self.assertEqual(len(assignments), self.JOBS)
+        incremental = rollup_counts()
+        rebuild_rollups()
+        self.assertEqual(incremental, rollup_counts())
+
+
+class BatchStatusUpdateTests(TestCase):
+    """A batch of status changes is applied together, with a result per item."""
+
+    def setUp(self):
+        self.customer = make_user('customer')
+        self.mechanic = make_user('mechanic', Profile.ROLE_MECHANIC)
+        self.services = [
+            Service.objects.create(customer=self.customer, service_type=Service.SERVICE_OIL_CHANGE,
+                                   assigned_mechanic=self.mechanic)
+            for _ in range(4)
+        ]
+        self.unassigned = Service.objects.create(customer=self.customer, service_type=Service.SERVICE_AC_SERVICE)
+
+    def test_valid_items_are_applied_and_invalid_ones_reported(self):
+        first, second, third, stale = self.services
+        # Someone else saves `stale` after it was read
+        Service.objects.get(pk=stale.pk).save()
+        results = update_statuses([
+            (first.pk, Service.STATUS_IN_PROGRESS, first.version),
+            (second.pk, Service.STATUS_COMPLETED, None),
+            (third.pk, Service.STATUS_IN_PROGRESS, None),
+            (first.pk, Service.STATUS_COMPLETED, None),
+            (third.pk + 1000, Service.STATUS_COMPLETED, None),
+            (stale.pk, Service.STATUS_COMPLETED, stale.version),
+            (stale.pk + 2000, 'cancelled', None),
+            (self.unassigned.pk, Service.STATUS_IN_PROGRESS, None),
+        ], mechanic=self.mechanic)
+
+        self.assertEqual([result['ok'] for result in results], [True, True, True, False, False, False, False, False])
+        self.assertEqual([result.get('error') for result in results[3:]], [
+            'Service appears more than once in the batch',
+            'Service not found or not assigned to you',
+            'Service was changed by someone else',
+            'Unknown status cancelled',
+            'Service not found or not assigned to you',
+        ])
+        stored = {service.pk: service for service in Service.objects.all()}
+        for service, result in zip(self.services[:3], results):
+            self.assertEqual(stored[service.pk].status, result['status'])
+            self.assertEqual(stored[service.pk].version, service.version + 1)
+            self.assertEqual(result['version'], service.version + 1)
+        self.assertEqual(
+            (stored[stale.pk].status, stored[stale.pk].version), (Service.STATUS_PENDING, stale.version + 1)
+        )
+        self.assertEqual(stored[self.unassigned.pk].status, Service.STATUS_PENDING)
+
+    def test_one_update_per_target_status(self):
+        changes = [(service.pk, Service.STATUS_IN_PROGRESS, None) for service in self.services[:3]]
+        changes.append((self.services[3].pk, Service.STATUS_COMPLETED, None))
+        with CaptureQueriesContext(connection) as queries:
+            update_statuses(changes)
+        service_updates = [
+            query for query in queries.captured_queries if query['sql'].startswith('UPDATE "services_service"')
+        ]
+        self.assertEqual(len(service_updates), 2)
+
+    def test_derived_state_is_maintained(self):
+        update_statuses([(service.pk, Service.STATUS_IN_PROGRESS, None) for service in self.services])
+        update_statuses([(self.services[0].pk, Service.STATUS_COMPLETED, None)])
+
+        self.assertEqual(ServiceStatusEvent.objects.filter(previous_status=Service.STATUS_PENDING).count(), 4)
+        self.assertEqual(ServiceStatusEvent.objects.filter(status=Service.STATUS_COMPLETED).count(), 1)
+        rollups, stats = rollup_counts(), turnaround_stats()
+        rebuild_rollups()
+        rebuild_turnaround_stats()
+        self.assertEqual(rollups, rollup_counts())
+        self.assertEqual(stats, turnaround_stats())
+
+    def post(self, body):
+        return self.client.post(
+            reverse('services_batch_update_status'), json.dumps(body), content_type='application/json'
+        )
+
+    def test_endpoint(self):
+        self.client.force_login(self.mechanic)
+        response = self.post({'updates': [
+            {'id': self.services[0].pk, 'status': Service.STATUS_COMPLETED, 'version': self.services[0].version},
+            {'id': self.unassigned.pk, 'status': Service.STATUS_COMPLETED},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['updated'], data['failed']), (1, 1))
+
+        # Managers may change any service
+        self.client.force_login(make_user('manager', Profile.ROLE_MANAGER))
+        data = self.post({'updates': [{'id': self.unassigned.pk, 'status': Service.STATUS_COMPLETED}]}).json()
+        self.assertEqual(data['updated'], 1)
+
+    def test_endpoint_rejects_malformed_batches(self):
+        self.client.force_login(self.mechanic)
+        for body in [{}, {'updates': []}, {'updates': [{'id': '1', 'status': 'completed'}]},
+                     {'updates': [{'id': 1, 'status': 'completed', 'version': 'x'}]}]:
+            self.assertEqual(self.post(body).status_code, 400)
+        self.assertEqual(self.client.get(reverse('services_batch_update_status')).status_code, 405)
+        self.client.force_login(self.customer)
+        self.assertEqual(self.post({'updates': [{'id': 1, 'status': 'completed'}]}).status_code, 403)
+
+
+class Interrupted(Exception):
+    pass
+
+
+class RecordImportTests(TestCase):
+    """Imports resume from their checkpoint without inserting a row twice, and reclaimed workers are fenced off."""
+
+    ROWS = 10
+
+    def setUp(self):
+        self.vehicle = make_vehicle(make_user('customer'))
+        lines = ['registration_number,service_date,odometer_reading,parts_cost,labor_cost,work_done']
+        for index in range(self.ROWS):
+            # Quoted fields spanning lines must not throw the checkpoint offsets off
+            work_done = f'"Oil change\nand filter {index}"' if index % 3 == 0 else f'Check {index}'
+            lines.append(f'KA01AB1234,2024-01-{index + 1:02d},{1000 + index},{index}.50,10,{work_done}')
+        lines.append('UNKNOWN,2024-02-01,1,0,0,Rejected')
+        self.csv = ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def import_job(self, claim=True):
+        return create_import('records.csv', ContentFile(self.csv), claim=claim)
+
+    def assertImportedOnce(self, job):
+        self.assertEqual(job.status, RecordImport.STATUS_DONE)
+        self.assertEqual((job.rows_read, job.rows_inserted, job.rows_rejected), (self.ROWS + 1, self.ROWS, 1))
+        self.assertEqual(job.byte_offset, len(self.csv))
+        self.assertEqual(ServiceRecord.objects.count(), self.ROWS)
+        self.assertEqual(
+            sorted(ServiceRecord.objects.values_list('odometer_reading', flat=True)),
+            [1000 + index for index in range(self.ROWS)],
+        )
+        stats = CostStatistic.objects.get(segment=CostStatistic.SEGMENT_ALL)
+        self.assertEqual(stats.count, self.ROWS)
+
+    def test_import(self):
+        job = run_import(self.import_job(), chunk_size=4)
+        self.assertImportedOnce(job)
+        self.assertEqual(job.rejections, [{'row': self.ROWS + 1, 'error': 'Unknown registration_number UNKNOWN'}])
+        self.assertTrue(ServiceRecord.objects.filter(work_done='Oil change\nand filter 3').exists())
+
+    def test_resume_after_a_failure(self):
+        def interrupt(counters):
+            if counters['rows_read'] >= 8:
+                raise Interrupted('worker crashed')
+
+        job = run_import(self.import_job(), chunk_size=4, progress=interrupt)
+        self.assertEqual(job.status, RecordImport.STATUS_FAILED)
+        self.assertEqual((job.rows_read, ServiceRecord.objects.count()), (8, 8))
+
+        job = run_import(resume_import(job.pk), chunk_size=4)
+        self.assertImportedOnce(job)
+        self.assertEqual(job.attempts, 2)
+        with self.assertRaisesMessage(ValueError, 'already finished'):
+            resume_import(job.pk)
+
+    def test_running_import_cannot_be_resumed(self):
+        job = self.import_job()
+        with self.assertRaisesMessage(ValueError, 'running in another worker'):
+            resume_import(job.pk)
+
+    @override_settings(BACKGROUND_JOB_LEASE_SECONDS=60)
+    def test_reclaimed_worker_is_fenced_off(self):
+        zombie = self.import_job()
+        # The worker stops heartbeating and its lease runs out
+        RecordImport.objects.filter(pk=zombie.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+        owner = claim_next_import()
+        self.assertEqual((owner.pk, owner.attempts), (zombie.pk, 2))
+
+        # The old worker wakes up: its first checkpoint is refused and nothing it read is inserted
+        job = run_import(zombie, chunk_size=4)
+        self.assertEqual((job.status, ServiceRecord.objects.count()), (RecordImport.STATUS_RUNNING, 0))
+        self.assertEqual((job.rows_read, job.attempts), (0, 2))
+
+        self.assertImportedOnce(run_import(owner, chunk_size=4))
+
+    @override_settings(BACKGROUND_JOB_LEASE_SECONDS=60, BACKGROUND_JOB_MAX_ATTEMPTS=2)
+    def test_import_fails_after_too_many_lost_leases(self):
+        job = self.import_job()
+        RecordImport.objects.filter(pk=job.pk).update(attempts=2, heartbeat_at=timezone.now() - timedelta(minutes=5))
+        self.assertIsNone(claim_next_import())
+        job.refresh_from_db()
+        self.assertEqual(job.status, RecordImport.STATUS_FAILED)
+        self.assertIn('2 attempts', job.error)
+
+    def test_upload_is_stored_and_queued(self):
+        manager = make_user('manager', Profile.ROLE_MANAGER)
+        self.client.force_login(manager)
+        url = reverse('record_import')
+        response = self.client.post(url, {'file': SimpleUploadedFile('history.csv', self.csv)})
+        self.assertEqual(response.status_code, 202)
+        job = RecordImport.objects.get(pk=response.json()['import_id'])
+        self.assertEqual(
+            (job.status, job.requested_by, job.total_bytes), (RecordImport.STATUS_QUEUED, manager, len(self.csv))
+        )
+        self.assertEqual(job.file.name, 'history.csv')
+
+        self.assertImportedOnce(run_import(claim_next_import(), chunk_size=4))
+        job.delete()
+        self.assertFalse(StoredFile.objects.exists())
+        self.assertEqual(
+            self.client.post(url, {'file': SimpleUploadedFile('history.txt', self.csv)}).status_code, 400
+        )
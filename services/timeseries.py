@@ -0,0 +1,143 @@
+"""
+Time-bucketed service counts for any date range and granularity.
+Bucketing happens in SQL: day and week series truncate Service.created_at in the
+current timezone; month, quarter and year series are summed from the ServiceRollup
+table, which is already bucketed by local month, so their cost depends on the
+number of months rather than services. Empty buckets are filled from a calendar
+computed arithmetically, so every series has one value per bucket.
+"""
+
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+MONTH_STEPS = {'month': 1, 'quarter': 3, 'year': 12}
+BREAKDOWNS = {
+    'status': 'status',
+    'service_type': 'service_type',
+    'mechanic': 'assigned_mechanic',
+}
+TOTAL = 'total'
+UNASSIGNED = 'unassigned'
+
+# Day-granularity series over ~2.7 years at most; coarser granularities reach much further
+MAX_BUCKETS = 1000
+
+
+def bucket_start(day, granularity):
+    """First day of the bucket containing `day`."""
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    ordinal = day.year * 12 + day.month - 1
+    ordinal -= ordinal % MONTH_STEPS[granularity]
+    return date(ordinal // 12, ordinal % 12 + 1, 1)
+
+
+def calendar(start, end, granularity):
+    """
+    Bucket start dates covering start..end (inclusive), plus the first day after the last bucket.
+    Raises ValueError for over MAX_BUCKETS buckets, or when that day is past date.max.
+    """
+    first = bucket_start(start, granularity)
+    if granularity in ('day', 'week'):
+        step = 1 if granularity == 'day' else 7
+        count = (end - first).days // step + 1
+    else:
+        step = MONTH_STEPS[granularity]
+        origin = first.year * 12 + first.month - 1
+        count = (end.year * 12 + end.month - 1 - origin) // step + 1
+    # Counted arithmetically so an oversized range is rejected before any bucket is built
+    if count > MAX_BUCKETS:
+        raise ValueError(f'Range spans {count} {granularity} buckets; the limit is {MAX_BUCKETS}')
+    try:
+        if granularity in ('day', 'week'):
+            days = [first + timedelta(days=step * i) for i in range(count + 1)]
+        else:
+            ordinals = range(origin, origin + step * (count + 1), step)
+            days = [date(ordinal // 12, ordinal % 12 + 1, 1) for ordinal in ordinals]
+    except (OverflowError, ValueError):
+        raise ValueError(f'Range must end before the {granularity} bucket containing {date.max}') from None
+    return days[:-1], days[-1]
+
+
+def _rollup_rows(first, stop, field):
+    from .models import ServiceRollup
+
+    # Grouped by month only; quarters and years are folded from months in Python,
+    # which avoids truncating every rollup row in SQL
+    rows = ServiceRollup.objects.filter(month__gte=first, month__lt=stop).values(
+        'month', *([field] if field else [])
+    ).annotate(total=Sum('count')).order_by()
+    return ((row['month'], row[field] if field else TOTAL, row['total']) for row in rows)
+
+
+def _service_rows(first, stop, granularity, field):
+    from .models import Service
+
+    tz = timezone.get_current_timezone()
+    rows = Service.objects.filter(
+        created_at__gte=timezone.make_aware(datetime.combine(first, time.min), tz),
+        created_at__lt=timezone.make_aware(datetime.combine(stop, time.min), tz),
+    ).annotate(
+        bucket=Trunc('created_at', granularity, output_field=DateField(), tzinfo=tz)
+    ).values('bucket', *([field] if field else [])).annotate(total=Count('id')).order_by()
+    return ((row['bucket'], row[field] if field else TOTAL, row['total']) for row in rows)
+
+
+def _mechanic_names(series):
+    """Re-key a mechanic breakdown from user ids to usernames."""
+    from django.contrib.auth import get_user_model
+
+    ids = [key for key in series if key != UNASSIGNED]
+    names = dict(get_user_model().objects.filter(pk__in=ids).values_list('pk', 'username'))
+    names[UNASSIGNED] = UNASSIGNED
+    return {names[key]: values for key, values in series.items()}
+
+
+def service_time_series(start, end, granularity='month', breakdown=None):
+    """
+    Count services created between the local dates `start` and `end`, per bucket.
+    The range is widened to whole buckets. `breakdown` splits the counts by
+    'status', 'service_type' or 'mechanic' (username). Raises ValueError on bad
+    arguments or a range over MAX_BUCKETS buckets.
+    Returns {'granularity', 'breakdown', 'buckets': [iso dates], 'series': {key: [counts]}}.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'granularity must be one of {", ".join(GRANULARITIES)}')
+    if breakdown and breakdown not in BREAKDOWNS:
+        raise ValueError(f'breakdown must be one of {", ".join(BREAKDOWNS)}')
+    if start > end:
+        raise ValueError('start must not be after end')
+
+    buckets, stop = calendar(start, end, granularity)
+    field = BREAKDOWNS.get(breakdown)
+    if granularity in MONTH_STEPS:
+        rows = _rollup_rows(buckets[0], stop, field)
+    else:
+        rows = _service_rows(buckets[0], stop, granularity, field)
+
+    position = {bucket: i for i, bucket in enumerate(buckets)}
+    series = {} if breakdown else {TOTAL: [0] * len(buckets)}
+    for bucket, key, total in rows:
+        if isinstance(bucket, datetime):
+            bucket = bucket.date()
+        if granularity in MONTH_STEPS:
+            bucket = bucket_start(bucket, granularity)
+        key = UNASSIGNED if key is None else key
+        if key not in series:
+            series[key] = [0] * len(buckets)
+        series[key][position[bucket]] += total
+    if breakdown == 'mechanic':
+        series = _mechanic_names(series)
+
+    return {
+        'granularity': granularity,
+        'breakdown': breakdown,
+        'buckets': [bucket.isoformat() for bucket in buckets],
+        'series': series,
+    }
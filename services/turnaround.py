@@ -0,0 +1,297 @@
+"""
+Service status-transition log and incrementally maintained turnaround statistics.
+Every change to a Service's status or assigned mechanic appends a ServiceStatusEvent.
+Three durations are measured as transitions happen:
+time_to_assign (booking to first mechanic), time_in_progress (each stint in progress)
+and time_to_complete (booking to first completion). Each duration is added to the
+'all', 'mechanic:<id>' and 'service_type:<type>' TurnaroundStatistic rows: exact count,
+sum, min and max plus a log-bucketed histogram whose percentile estimates are within
+SKETCH_ACCURACY relative error, so analytics read a few rows instead of the history.
+Deleting a service keeps its past durations until `manage.py rebuild_turnaround_stats`.
+"""
+
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+SKETCH_ACCURACY = 0.02
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+# Services looked up per history query
+HISTORY_BATCH = 1000
+
+STAT_FIELDS = ['count', 'total_seconds', 'min_seconds', 'max_seconds', 'sketch', 'updated_at']
+# Statistic rows written with one UPDATE each rather than one bulk_update
+SMALL_UPDATE = 5
+
+
+def sketch_key(seconds):
+    """Histogram bucket of a duration; durations under a second share bucket 0."""
+    return math.ceil(math.log(max(seconds, 1.0)) / _LOG_GAMMA)
+
+
+def sketch_quantile(sketch, q):
+    """Estimated q-quantile (0 <= q <= 1) of the durations in a sketch, or None when empty."""
+    buckets = sorted((int(key), count) for key, count in sketch.items() if count)
+    total = sum(count for _, count in buckets)
+    if not total:
+        return None
+    rank, seen = q * (total - 1), 0
+    for key, count in buckets:
+        seen += count
+        if seen > rank:
+            return 2 * _GAMMA ** key / (_GAMMA + 1)
+    return 2 * _GAMMA ** buckets[-1][0] / (_GAMMA + 1)
+
+
+class _Totals:
+    """Durations for one (metric, segment), merged into its statistic row in one write."""
+
+    def __init__(self):
+        self.count, self.total, self.low, self.high = 0, 0.0, None, None
+        self.sketch = defaultdict(int)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.low = seconds if self.low is None else min(self.low, seconds)
+        self.high = seconds if self.high is None else max(self.high, seconds)
+        self.sketch[sketch_key(seconds)] += 1
+
+    def merge_into(self, stat):
+        stat.count += self.count
+        stat.total_seconds += self.total
+        stat.min_seconds = self.low if stat.min_seconds is None else min(stat.min_seconds, self.low)
+        stat.max_seconds = self.high if stat.max_seconds is None else max(stat.max_seconds, self.high)
+        sketch = dict(stat.sketch)
+        for key, count in self.sketch.items():
+            sketch[str(key)] = sketch.get(str(key), 0) + count
+        stat.sketch = sketch
+
+
+def _durations(state, event, booked_at):
+    """
+    (metric, seconds) pairs a transition completes, advancing the per-service `state`
+    ({'assigned', 'completed', 'started'}). The booking event only seeds the state.
+    """
+    from .models import Service, TurnaroundStatistic
+
+    durations = []
+    booking = event.previous_status is None
+    if event.mechanic_id is not None and not state['assigned']:
+        state['assigned'] = True
+        if not booking:
+            durations.append((TurnaroundStatistic.METRIC_TIME_TO_ASSIGN, event.created_at - booked_at))
+    if event.previous_status == Service.STATUS_IN_PROGRESS and event.status != Service.STATUS_IN_PROGRESS:
+        if state['started'] is not None:
+            durations.append((TurnaroundStatistic.METRIC_TIME_IN_PROGRESS, event.created_at - state['started']))
+        state['started'] = None
+    if event.status == Service.STATUS_IN_PROGRESS and event.previous_status != Service.STATUS_IN_PROGRESS:
+        state['started'] = event.created_at
+    if event.status == Service.STATUS_COMPLETED and not state['completed']:
+        state['completed'] = True
+        if not booking:
+            durations.append((TurnaroundStatistic.METRIC_TIME_TO_COMPLETE, event.created_at - booked_at))
+    return [(metric, max(delta.total_seconds(), 0.0)) for metric, delta in durations]
+
+
+def _segments(mechanic_id, service_type):
+    from .models import TurnaroundStatistic
+
+    segments = [TurnaroundStatistic.SEGMENT_ALL, TurnaroundStatistic.service_type_segment(service_type)]
+    if mechanic_id is not None:
+        segments.append(TurnaroundStatistic.mechanic_segment(mechanic_id))
+    return segments
+
+
+def _history(service_ids):
+    """
+    Replay state of services with logged events, as {service id: state}:
+    whether they were ever assigned or completed and when their current stint in progress began.
+    """
+    from .models import Service, ServiceStatusEvent
+
+    states = {}
+    service_ids = list(service_ids)
+    for offset in range(0, len(service_ids), HISTORY_BATCH):
+        rows = ServiceStatusEvent.objects.filter(
+            service_id__in=service_ids[offset:offset + HISTORY_BATCH]
+        ).values('service_id').annotate(
+            assigned=Count('id', filter=Q(mechanic__isnull=False) | Q(previous_mechanic__isnull=False)),
+            completed=Count('id', filter=Q(status=Service.STATUS_COMPLETED) | Q(
+                previous_status=Service.STATUS_COMPLETED
+            )),
+            started=Max('created_at', filter=Q(status=Service.STATUS_IN_PROGRESS) & ~Q(
+                previous_status=Service.STATUS_IN_PROGRESS
+            )),
+        ).order_by()
+        for row in rows:
+            states[row['service_id']] = {
+                'assigned': row['assigned'] > 0,
+                'completed': row['completed'] > 0,
+                'started': row['started'],
+            }
+    return states
+
+
+def _locked_statistics(keys):
+    """TurnaroundStatistic rows for (metric, segment) keys, created if missing and locked in key order."""
+    from .models import TurnaroundStatistic
+
+    def locked():
+        rows = TurnaroundStatistic.objects.select_for_update().filter(
+            metric__in={metric for metric, _ in keys}, segment__in={segment for _, segment in keys}
+        ).order_by('metric', 'segment')
+        return {(stat.metric, stat.segment): stat for stat in rows}
+
+    stats = locked()
+    if any(key not in stats for key in keys):
+        # Rows another transaction creates first are kept
+        missing = [key for key in keys if key not in stats]
+        TurnaroundStatistic.objects.bulk_create(
+            [TurnaroundStatistic(metric=metric, segment=segment) for metric, segment in missing],
+            ignore_conflicts=True,
+        )
+        stats = locked()
+    return stats
+
+
+def _add_durations(totals):
+    """Merge {(metric, segment): _Totals} into the statistic rows."""
+    from .models import TurnaroundStatistic
+
+    with transaction.atomic():
+        stats = _locked_statistics(list(totals))
+        now = timezone.now()
+        for key, total in totals.items():
+            total.merge_into(stats[key])
+            stats[key].updated_at = now
+        if len(totals) <= SMALL_UPDATE:
+            # Building bulk_update's CASE expressions costs more than a few plain UPDATEs
+            for key in totals:
+                stat = stats[key]
+                TurnaroundStatistic.objects.filter(pk=stat.pk).update(**{
+                    field: getattr(stat, field) for field in STAT_FIELDS
+                })
+            return
+        TurnaroundStatistic.objects.bulk_update([stats[key] for key in totals], STAT_FIELDS, batch_size=100)
+
+
+def record_transitions(changes, at=None):
+    """
+    Log status/mechanic changes of saved services and add the durations they complete.
+    `changes` holds (service, previous_status, previous_mechanic_id) tuples, the service
+    already carrying its new state; previous_status is None for a newly booked service.
+    Changes that alter neither field are skipped. Bulk writers (queryset.update()) call
+    this directly since they bypass the signals. Returns the created events.
+    """
+    from .models import Service, ServiceStatusEvent
+
+    at = at or timezone.now()
+    events = [
+        ServiceStatusEvent(
+            service=service,
+            status=service.status,
+            previous_status=previous_status,
+            mechanic_id=service.assigned_mechanic_id,
+            previous_mechanic_id=previous_mechanic_id,
+            created_at=at,
+        )
+        for service, previous_status, previous_mechanic_id in changes
+        if previous_status is None
+        or (previous_status, previous_mechanic_id) != (service.status, service.assigned_mechanic_id)
+    ]
+    if not events:
+        return []
+
+    states = _history(event.service_id for event in events if event.previous_status is not None)
+    totals = defaultdict(_Totals)
+    for event in events:
+        service = event.service
+        state = states.get(service.pk)
+        if state is None:
+            # Booked now, or booked before the log existed: infer what we can from the previous state
+            state = states[service.pk] = {
+                'assigned': event.previous_mechanic_id is not None,
+                'completed': event.previous_status == Service.STATUS_COMPLETED,
+                'started': None,
+            }
+        for metric, seconds in _durations(state, event, service.created_at):
+            mechanic_id = event.mechanic_id if event.mechanic_id is not None else event.previous_mechanic_id
+            for segment in _segments(mechanic_id, service.service_type):
+                totals[metric, segment].add(seconds)
+
+    with transaction.atomic():
+        ServiceStatusEvent.objects.bulk_create(events, batch_size=1000)
+        if totals:
+            _add_durations(totals)
+    return events
+
+
+def completions_since(start, mechanic_ids=None):
+    """Services each mechanic moved to completed since `start`, as {mechanic id: count}."""
+    from .models import Service, ServiceStatusEvent
+
+    events = ServiceStatusEvent.objects.filter(
+        status=Service.STATUS_COMPLETED, created_at__gte=start, mechanic__isnull=False
+    ).exclude(previous_status=Service.STATUS_COMPLETED)
+    if mechanic_ids is not None:
+        events = events.filter(mechanic_id__in=mechanic_ids)
+    rows = events.values('mechanic_id').annotate(total=Count('service_id', distinct=True)).order_by()
+    return {row['mechanic_id']: row['total'] for row in rows}
+
+
+def summarize(stat):
+    """Display summary of a TurnaroundStatistic (or None): count plus average/p50/p90 in hours."""
+    if stat is None or not stat.count:
+        return {'count': 0, 'average_hours': None, 'p50_hours': None, 'p90_hours': None}
+
+    def hours(seconds):
+        # Bucket midpoints can overshoot the observed range slightly
+        return round(min(max(seconds, stat.min_seconds), stat.max_seconds) / 3600, 2)
+
+    return {
+        'count': stat.count,
+        'average_hours': hours(stat.average),
+        'p50_hours': hours(sketch_quantile(stat.sketch, 0.5)),
+        'p90_hours': hours(sketch_quantile(stat.sketch, 0.9)),
+    }
+
+
+def rebuild_turnaround_stats(chunk_size=5000):
+    """Recompute every TurnaroundStatistic row by replaying ServiceStatusEvent. Returns the number of rows."""
+    from .models import Service, ServiceStatusEvent, TurnaroundStatistic
+
+    totals = defaultdict(_Totals)
+    events = ServiceStatusEvent.objects.order_by('service_id', 'created_at', 'id').values_list(
+        'service_id', 'status', 'previous_status', 'mechanic_id', 'previous_mechanic_id', 'created_at',
+        'service__created_at', 'service__service_type', named=True,
+    )
+
+    current, state = None, None
+    with transaction.atomic():
+        for event in events.iterator(chunk_size=chunk_size):
+            if event.service_id != current:
+                current = event.service_id
+                state = {
+                    'assigned': event.previous_mechanic_id is not None,
+                    'completed': event.previous_status == Service.STATUS_COMPLETED,
+                    'started': None,
+                }
+            for metric, seconds in _durations(state, event, event.service__created_at):
+                mechanic_id = event.mechanic_id if event.mechanic_id is not None else event.previous_mechanic_id
+                for segment in _segments(mechanic_id, event.service__service_type):
+                    totals[metric, segment].add(seconds)
+
+        TurnaroundStatistic.objects.all().delete()
+        stats = []
+        for (metric, segment), total in totals.items():
+            stat = TurnaroundStatistic(metric=metric, segment=segment)
+            total.merge_into(stat)
+            stats.append(stat)
+        TurnaroundStatistic.objects.bulk_create(stats, batch_size=1000)
+    return len(stats)
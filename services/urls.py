@@ -16,8 +16,12 @@ urlpatterns = [
     path('dashboard/customer/', views.dashboard_customer, name='dashboard_customer'),
     path('dashboard/mechanic/', views.dashboard_mechanic, name='dashboard_mechanic'),
     path('dashboard/manager/', views.dashboard_manager, name='dashboard_manager'),
+    path('dashboard/manager/pending/', views.pending_services_api, name='pending_services_api'),
     path('services/book/', views.book_service, name='services_book'),
     path('services/<int:service_id>/assign/', views.assign_mechanic, name='services_assign'),
+    path('services/auto-assign/', views.auto_assign_backlog, name='services_auto_assign'),
+    path('services/claim/', views.claim_job, name='services_claim_job'),
+    path('services/status/batch/', views.batch_update_status, name='services_batch_update_status'),
     path('services/<int:service_id>/status/', views.update_service_status, name='services_update_status'),
     
     # Analytics URLs
@@ -27,11 +31,18 @@ urlpatterns = [
     path('analytics/mechanic/', views.mechanic_analytics, name='mechanic_analytics'),
     path('analytics/api/data/', views.analytics_data_api, name='analytics_data_api'),
     path('analytics/export/', views.export_report, name='export_report'),
+    path('analytics/export/jobs/<int:job_id>/', views.report_job_status, name='report_job_status'),
+    path('analytics/export/jobs/<int:job_id>/download/', views.report_job_download, name='report_job_download'),
+    path('records/import/', views.import_service_records, name='record_import'),
+    path('records/import/<int:import_id>/', views.record_import_status, name='record_import_status'),
     
     # Admin/Manager routes
     path('dashboard/users/', views.manage_users, name='manage_users'),
+    path('dashboard/users/api/', views.users_api, name='users_api'),
     path('dashboard/users/update-role/', views.update_user_role, name='update_user_role'),
+    path('dashboard/vehicles/at-risk/', views.at_risk_vehicles, name='at_risk_vehicles'),
     
+    path('metrics/', views.metrics_view, name='metrics'),
     path('db-sync-trigger/', views.db_sync_view, name='db_sync_trigger'),
     path('', views.home, name='home'),
 ]
@@ -0,0 +1,158 @@
+"""
+Indexed user search for the manager's user list.
+SQLite uses an FTS5 table (services_user_fts, one row per user keyed by user id) kept
+in sync by signals; PostgreSQL uses a GIN index on a tsvector expression over
+auth_user (maintained by the database itself), with a trigram fallback on
+username/email when pg_trgm is installed. Other databases fall back to icontains.
+Every backend supports prefix matching, ranking and role filtering.
+"""
+
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Q, When
+
+FTS_TABLE = 'services_user_fts'
+SEARCH_FIELDS = ('username', 'email', 'first_name', 'last_name')
+SEARCH_RESULT_LIMIT = 100
+
+# Must match the expression indexed by migration 0011 for PostgreSQL to use the index
+PG_VECTOR = (
+    "to_tsvector('simple', coalesce(auth_user.username, '') || ' ' || coalesce(auth_user.email, '') "
+    "|| ' ' || coalesce(auth_user.first_name, '') || ' ' || coalesce(auth_user.last_name, ''))"
+)
+
+# Databases known to have the FTS table (only positive results are cached)
+_fts_databases = set()
+
+# Same token boundaries as the FTS5 unicode61 tokenizer and the PostgreSQL parser
+_TOKEN = re.compile(r'[^\W_]+')
+
+
+def tokens(query):
+    return _TOKEN.findall(query.lower())
+
+
+def fts_available():
+    """Whether the SQLite FTS table exists (FTS5 may be missing from the SQLite build)."""
+    if connection.vendor != 'sqlite':
+        return False
+    database = connection.settings_dict['NAME']
+    if database not in _fts_databases:
+        with connection.cursor() as cursor:
+            if FTS_TABLE not in connection.introspection.table_names(cursor):
+                return False
+        _fts_databases.add(database)
+    return True
+
+
+def _trigram_available(cursor):
+    cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+    return cursor.fetchone() is not None
+
+
+def search_user_ids(query, role=None, limit=SEARCH_RESULT_LIMIT):
+    """Ids of users matching every token of `query` by prefix, best match first."""
+    words = tokens(query)
+    if not words:
+        return []
+    role_join = 'JOIN services_profile p ON p.user_id = {user_id}' if role else ''
+    role_filter = 'AND p.role = %s' if role else ''
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite' and fts_available():
+            match = ' '.join(f'"{word}"*' for word in words)
+            cursor.execute(
+                f'SELECT f.rowid FROM {FTS_TABLE} f {role_join.format(user_id="f.rowid")} '
+                f'WHERE {FTS_TABLE} MATCH %s {role_filter} ORDER BY f.rank LIMIT %s',
+                [match] + ([role] if role else []) + [limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+        if connection.vendor == 'postgresql':
+            tsquery = ' & '.join(f'{word}:*' for word in words)
+            cursor.execute(
+                f"SELECT auth_user.id FROM auth_user {role_join.format(user_id='auth_user.id')} "
+                f"WHERE {PG_VECTOR} @@ to_tsquery('simple', %s) {role_filter} "
+                f"ORDER BY ts_rank({PG_VECTOR}, to_tsquery('simple', %s)) DESC, auth_user.id LIMIT %s",
+                [tsquery] + ([role] if role else []) + [tsquery, limit]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if ids or not _trigram_available(cursor):
+                return ids
+            # No whole-word prefix hit: fall back to fuzzy/infix trigram matching
+            cursor.execute(
+                f"SELECT auth_user.id FROM auth_user {role_join.format(user_id='auth_user.id')} "
+                f"WHERE (auth_user.username %% %s OR auth_user.email %% %s) {role_filter} "
+                f"ORDER BY greatest(similarity(auth_user.username, %s), similarity(auth_user.email, %s)) DESC, "
+                f"auth_user.id LIMIT %s",
+                [query, query] + ([role] if role else []) + [query, query, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    # No search index for this database
+    User = get_user_model()
+    users = User.objects.all()
+    for word in words:
+        users = users.filter(
+            Q(username__icontains=word) | Q(email__icontains=word) |
+            Q(first_name__icontains=word) | Q(last_name__icontains=word)
+        )
+    if role:
+        users = users.filter(profile__role=role)
+    return list(users.order_by('username').values_list('id', flat=True)[:limit])
+
+
+def search_users(queryset, query, role=None, limit=SEARCH_RESULT_LIMIT):
+    """Restrict a User queryset to the search results, ordered by rank."""
+    ids = search_user_ids(query, role=role, limit=limit)
+    ranking = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(pk__in=ids).annotate(search_rank=ranking).order_by('search_rank') if ids else queryset.none()
+
+
+def index_user(user):
+    """Insert or refresh one user's FTS row (SQLite only; PostgreSQL indexes itself)."""
+    if not fts_available():
+        return
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [user.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, username, email, first_name, last_name) VALUES (%s, %s, %s, %s, %s)',
+            [user.pk] + [getattr(user, field) or '' for field in SEARCH_FIELDS]
+        )
+
+
+def unindex_user(user_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [user_id])
+
+
+def rebuild_index(batch_size=5000):
+    """Repopulate the FTS table from auth_user. Returns the number of users indexed."""
+    if not fts_available():
+        return 0
+    User = get_user_model()
+    indexed = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        rows = User.objects.order_by('pk').values_list('pk', *SEARCH_FIELDS)
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append([value or '' for value in row])
+            if len(batch) >= batch_size:
+                indexed += _insert_batch(cursor, batch)
+                batch = []
+        indexed += _insert_batch(cursor, batch)
+    return indexed
+
+
+def _insert_batch(cursor, rows):
+    if rows:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, username, email, first_name, last_name) VALUES (%s, %s, %s, %s, %s)',
+            rows
+        )
+    return len(rows)
@@ -1,18 +1,34 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
-from django.db.models import Q
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.urls import reverse
+from django.core.paginator import Paginator
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 import json
+import mimetypes
 from .forms import SignUpForm, BookServiceForm, AssignMechanicForm, UpdateServiceStatusForm
 from .models import Profile, Service
 from .decorators import role_required
+from .roles import get_role
 from .analytics import ServiceAnalytics, ReportGenerator
-from .predictions import ServicePredictor
-from .logic import calculate_health_score, get_recommendations
-from .models import Profile, Service, Vehicle, User
+from . import dashboard_snapshots, response_cache, metrics, record_import, stored_files
+from .pagination import KeysetPage, keyset_page, page_size_from
+from .user_search import search_users
+from .timeseries import service_time_series
+from .logic import HEALTH_SCORE_AT_RISK
+from .scheduler import auto_assign
+from .service_updates import (
+    MAX_BATCH_STATUS_UPDATES, StaleServiceError, claim_next_job, update_service, update_statuses,
+)
+from .models import Profile, Service, Vehicle, User, ReportJob, RecordImport
 from django.core.management import call_command
 
+STALE_SERVICE_MESSAGE = "This service was changed by someone else. Reload the page and try again."
+
 def db_sync_view(request):
     """
     Utility view to run migrations on the remote Vercel database.
@@ -29,6 +45,21 @@ def db_sync_view(request):
         return HttpResponse(f"Error during synchronization: {str(e)}", status=500)
 
 
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint for this process's request metrics.
+    With METRICS_TOKEN set, send it as a bearer token; otherwise only managers may read it.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return HttpResponse("Unauthorized. Invalid metrics token.", status=403)
+    else:
+        if get_role(request) != Profile.ROLE_MANAGER:
+            return HttpResponse("Permission Denied", status=403)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def signup_view(request):
     if request.method == "POST":
         form = SignUpForm(request.POST)
@@ -68,14 +99,12 @@ def home(request):
 
 @login_required
 def dashboard_redirect(request):
-    profile = getattr(request.user, 'profile', None)
-    if not profile:
-        return redirect('home')
-    if profile.role == Profile.ROLE_CUSTOMER:
+    role = get_role(request)
+    if role == Profile.ROLE_CUSTOMER:
         return redirect('dashboard_customer')
-    if profile.role == Profile.ROLE_MECHANIC:
+    if role == Profile.ROLE_MECHANIC:
         return redirect('dashboard_mechanic')
-    if profile.role == Profile.ROLE_MANAGER:
+    if role == Profile.ROLE_MANAGER:
         return redirect('dashboard_manager')
     return redirect('home')
 
@@ -83,31 +112,9 @@ def dashboard_redirect(request):
 @login_required
 @role_required([Profile.ROLE_CUSTOMER])
 def dashboard_customer(request):
-    recent_services = Service.objects.filter(customer=request.user).order_by('-created_at')[:3]
-
-    # ML Predictions
-    try:
-        prediction = ServicePredictor.get_customer_predictions(request.user)
-    except Exception:
-        prediction = None
-
-    # Health Score & Recommendations
-    vehicles = Vehicle.objects.filter(owner=request.user)
-    vehicle_data = []
-    for v in vehicles:
-        vehicle_data.append({
-            'vehicle': v,
-            'health_score': calculate_health_score(v),
-            'recommendations': get_recommendations(v)
-        })
-
-    context = {
-        "welcome_name": request.user.first_name or request.user.username,
-        "recent_services_note": f"Your past {recent_services.count()} services are listed here.",
-        "recent_services": recent_services,
-        "prediction": prediction,
-        "vehicle_data": vehicle_data,
-    }
+    # Recent services, predictions and vehicle health come from the precomputed snapshot
+    context = dashboard_snapshots.get_context(request.user)
+    context["welcome_name"] = request.user.first_name or request.user.username
     return render(request, 'services/dashboards/customer.html', context)
 
 
@@ -124,15 +131,91 @@ def dashboard_mechanic(request):
 @login_required
 @role_required([Profile.ROLE_MANAGER])
 def dashboard_manager(request):
+    try:
+        pending_page = keyset_page(
+            _pending_queryset(), 'created_at',
+            cursor=request.GET.get('cursor'),
+            page_size=page_size_from(request.GET.get('page_size'))
+        )
+    except ValueError:
+        pending_page = keyset_page(_pending_queryset(), 'created_at')
+    # Counters come from the rollup table instead of counting the Service table
+    status_counts = ServiceAnalytics.get_service_status_distribution()
     context = {
-        "total_services": Service.objects.count(),
-        "pending_jobs": Service.objects.filter(status=Service.STATUS_PENDING).count(),
-        "completed_jobs": Service.objects.filter(status=Service.STATUS_COMPLETED).count(),
-        "pending_list": Service.objects.filter(status=Service.STATUS_PENDING).order_by('-created_at'),
+        "total_services": sum(status_counts.values()),
+        "pending_jobs": status_counts.get(Service.STATUS_PENDING, 0),
+        "completed_jobs": status_counts.get(Service.STATUS_COMPLETED, 0),
+        "pending_list": pending_page,
     }
     return render(request, 'services/dashboards/manager.html', context)
 
 
+def _pending_queryset():
+    """Pending services with only the columns the queue shows."""
+    return Service.objects.filter(status=Service.STATUS_PENDING).select_related(
+        'customer', 'assigned_mechanic'
+    ).only(
+        'service_type', 'custom_description', 'status', 'created_at',
+        'customer__username', 'customer__first_name',
+        'assigned_mechanic__username', 'assigned_mechanic__first_name',
+    )
+
+
+@login_required
+@role_required([Profile.ROLE_MANAGER])
+def pending_services_api(request):
+    """JSON page of the pending queue, newest first; pass next_cursor back as ?cursor=."""
+    try:
+        page = keyset_page(
+            _pending_queryset(), 'created_at',
+            cursor=request.GET.get('cursor'),
+            page_size=page_size_from(request.GET.get('page_size'))
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    results = []
+    for service in page:
+        mechanic = service.assigned_mechanic
+        results.append({
+            'id': service.pk,
+            'service_type': service.service_type,
+            'service_type_display': service.get_service_type_display(),
+            'custom_description': service.custom_description,
+            'created_at': service.created_at,
+            'customer': service.customer.first_name or service.customer.username,
+            'assigned_mechanic': (mechanic.first_name or mechanic.username) if mechanic else None,
+            'assign_url': reverse('services_assign', args=[service.pk]),
+        })
+    return JsonResponse(
+        {'results': results, 'next_cursor': page.next_cursor, 'page_size': page.page_size},
+        encoder=DjangoJSONEncoder
+    )
+
+
+@login_required
+@role_required([Profile.ROLE_MANAGER])
+def at_risk_vehicles(request):
+    """List vehicles whose health score is below the at-risk threshold, worst first."""
+    try:
+        threshold = int(request.GET.get('threshold', HEALTH_SCORE_AT_RISK))
+    except ValueError:
+        threshold = HEALTH_SCORE_AT_RISK
+
+    vehicles = Vehicle.objects.select_related('owner').with_health_score().filter(
+        health_score__lt=threshold
+    ).order_by('health_score', 'id')
+
+    page_obj = Paginator(vehicles, 25).get_page(request.GET.get('page'))
+
+    context = {
+        'page_obj': page_obj,
+        'vehicles': page_obj.object_list,
+        'threshold': threshold,
+    }
+    return render(request, 'services/dashboards/at_risk_vehicles.html', context)
+
+
 @login_required
 @role_required([Profile.ROLE_CUSTOMER])
 def book_service(request):
@@ -156,13 +239,36 @@ def assign_mechanic(request, service_id):
     if request.method == "POST":
         form = AssignMechanicForm(request.POST, instance=service)
         if form.is_valid():
-            form.save()
-            return redirect('dashboard_manager')
+            try:
+                update_service(
+                    service.pk, form.cleaned_data['version'],
+                    assigned_mechanic=form.cleaned_data['assigned_mechanic'],
+                )
+            except StaleServiceError:
+                form.add_error(None, STALE_SERVICE_MESSAGE)
+            else:
+                return redirect('dashboard_manager')
     else:
         form = AssignMechanicForm(instance=service)
     return render(request, 'services/services_assign.html', {"form": form, "service": service})
 
 
+@login_required
+@role_required([Profile.ROLE_MANAGER])
+def auto_assign_backlog(request):
+    """POST: assign the whole unassigned pending backlog to the least-loaded mechanics; JSON report."""
+    if request.method != "POST":
+        return JsonResponse({'error': 'POST required'}, status=405)
+    try:
+        report = auto_assign(
+            weighted=request.POST.get('weighted') in ('1', 'true', 'on'),
+            dry_run=request.POST.get('dry_run') in ('1', 'true', 'on'),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(report)
+
+
 @login_required
 @role_required([Profile.ROLE_MECHANIC])
 def update_service_status(request, service_id):
@@ -170,13 +276,72 @@ def update_service_status(request, service_id):
     if request.method == "POST":
         form = UpdateServiceStatusForm(request.POST, instance=service)
         if form.is_valid():
-            form.save()
-            return redirect('dashboard_mechanic')
+            try:
+                update_service(service.pk, form.cleaned_data['version'], status=form.cleaned_data['status'])
+            except StaleServiceError:
+                form.add_error(None, STALE_SERVICE_MESSAGE)
+            else:
+                return redirect('dashboard_mechanic')
     else:
         form = UpdateServiceStatusForm(instance=service)
     return render(request, 'services/services_update_status.html', {"form": form, "service": service})
 
 
+@login_required
+@role_required([Profile.ROLE_MECHANIC, Profile.ROLE_MANAGER])
+def batch_update_status(request):
+    """
+    POST a JSON body {"updates": [{"id": <service id>, "status": <status>, "version": <optional>}, ...]}.
+    Mechanics may change only their assigned services; managers any. Valid items are applied
+    together; the JSON response has one result per item plus updated/failed counts.
+    """
+    if request.method != "POST":
+        return JsonResponse({'error': 'POST required'}, status=405)
+    try:
+        updates = json.loads(request.body)['updates']
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'error': 'Body must be JSON of the form {"updates": [...]}'}, status=400)
+    if not isinstance(updates, list) or not updates:
+        return JsonResponse({'error': 'updates must be a non-empty list'}, status=400)
+    if len(updates) > MAX_BATCH_STATUS_UPDATES:
+        return JsonResponse({'error': f'At most {MAX_BATCH_STATUS_UPDATES} updates per batch'}, status=400)
+
+    changes = []
+    for item in updates:
+        if not isinstance(item, dict) or not isinstance(item.get('id'), int) or not isinstance(item.get('status'), str):
+            return JsonResponse({'error': 'Each update needs an integer id and a status'}, status=400)
+        version = item.get('version')
+        if version is not None and not isinstance(version, int):
+            return JsonResponse({'error': 'version must be an integer'}, status=400)
+        changes.append((item['id'], item['status'], version))
+
+    mechanic = request.user if get_role(request) == Profile.ROLE_MECHANIC else None
+    results = update_statuses(changes, mechanic=mechanic)
+    updated = sum(1 for result in results if result['ok'])
+    return JsonResponse({'updated': updated, 'failed': len(results) - updated, 'results': results})
+
+
+@login_required
+@role_required([Profile.ROLE_MECHANIC])
+def claim_job(request):
+    """POST: take the oldest unassigned pending job (optionally of `service_type`); JSON with the claimed service."""
+    if request.method != "POST":
+        return JsonResponse({'error': 'POST required'}, status=405)
+    service_type = request.POST.get('service_type') or None
+    if service_type and service_type not in dict(Service.SERVICE_TYPE_CHOICES):
+        return JsonResponse({'error': f'Unknown service_type {service_type}'}, status=400)
+    service = claim_next_job(request.user, service_type)
+    if service is None:
+        return JsonResponse({'error': 'No unassigned pending jobs to claim'}, status=404)
+    return JsonResponse({
+        'id': service.pk,
+        'service_type': service.service_type,
+        'status': service.status,
+        'created_at': service.created_at,
+        'version': service.version,
+    }, encoder=DjangoJSONEncoder)
+
+
 # Analytics Views
 
 @login_required
@@ -185,13 +350,9 @@ def analytics_dashboard(request):
     """Manager analytics dashboard with charts and insights."""
     insights = ServiceAnalytics.get_manager_insights()
     
-    # Mechanic Rankings
-    mechanic_performance = ServiceAnalytics.get_mechanic_performance()
-    # Sort by completion_rate (desc) and total_assigned (desc)
-    mechanic_rankings = sorted(
-        mechanic_performance, 
-        key=lambda x: (x['completion_rate'], x['total_assigned']), 
-        reverse=True
+    # Mechanic Rankings, sorted by completion_rate (desc) and total_assigned (desc) in the database
+    mechanic_rankings = ServiceAnalytics.get_mechanic_performance(
+        order_by=('-completion_rate', '-total_assigned')
     )
 
     context = {
@@ -208,43 +369,205 @@ def analytics_dashboard(request):
 @login_required
 @role_required([Profile.ROLE_MANAGER])
 def analytics_data_api(request):
-    """API endpoint for analytics data (for AJAX requests)."""
+    """
+    API endpoint for analytics data (for AJAX requests).
+    Payloads are cached per data version and carry an ETag; a matching If-None-Match
+    gets 304 without recomputing. type=cache_stats reports cache counters.
+    type=timeseries takes start/end (YYYY-MM-DD), granularity and breakdown; see services.timeseries.
+    """
     data_type = request.GET.get('type', 'monthly')
     
-    if data_type == 'monthly':
-        data = ServiceAnalytics.get_monthly_service_counts()
-    elif data_type == 'status':
-        data = ServiceAnalytics.get_service_status_distribution()
-    elif data_type == 'service_types':
-        data = ServiceAnalytics.get_service_type_distribution()
-    elif data_type == 'mechanic_performance':
-        data = ServiceAnalytics.get_mechanic_performance()
-    else:
-        data = {}
+    if data_type == 'cache_stats':
+        return JsonResponse(response_cache.stats())
+    
+    etag = response_cache.response_key(data_type, request.GET.dict(), response_cache.data_version())
+    if response_cache.etag_matches(request, etag):
+        response_cache.record_not_modified()
+        response = HttpResponseNotModified()
+        response['ETag'] = f'"{etag}"'
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    payload = response_cache.get_payload(etag)
+    
+    if payload is None:
+        if data_type == 'monthly':
+            data = ServiceAnalytics.get_monthly_service_counts()
+        elif data_type == 'status':
+            data = ServiceAnalytics.get_service_status_distribution()
+        elif data_type == 'service_types':
+            data = ServiceAnalytics.get_service_type_distribution()
+        elif data_type == 'timeseries':
+            today = timezone.localdate()
+            try:
+                start = parse_date(request.GET.get('start', '')) or today.replace(year=today.year - 1, day=1)
+                end = parse_date(request.GET.get('end', '')) or today
+                data = service_time_series(
+                    start, end,
+                    granularity=request.GET.get('granularity', 'month'),
+                    breakdown=request.GET.get('breakdown') or None
+                )
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+        elif data_type == 'mechanic_performance':
+            try:
+                limit = int(request.GET['limit']) if request.GET.get('limit') else None
+                offset = int(request.GET.get('offset', 0))
+            except ValueError:
+                return JsonResponse({'error': 'limit and offset must be integers'}, status=400)
+            data = ServiceAnalytics.get_mechanic_performance(
+                order_by=request.GET.get('order', '-completion_rate').split(','),
+                limit=limit,
+                offset=offset
+            )
+        else:
+            data = {}
+        payload = json.dumps(data, cls=DjangoJSONEncoder)
+        response_cache.set_payload(etag, payload)
+    response = HttpResponse(payload, content_type='application/json')
     
-    return JsonResponse(data)
+    response['ETag'] = f'"{etag}"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 @login_required
 @role_required([Profile.ROLE_MANAGER])
 def export_report(request):
-    """Export services report in various formats."""
+    """
+    Export services report in various formats.
+    Optional filters: status, start/end (YYYY-MM-DD, on created date) and
+    limit (capped by settings.REPORT_EXPORT_MAX_ROWS).
+    With mode=async the report is queued as a ReportJob and its id returned immediately.
+    """
     format_type = request.GET.get('format', 'csv')
     status_filter = request.GET.get('status', 'all')
     
-    # Build queryset based on filters
-    services = Service.objects.all()
+    if format_type not in (ReportJob.FORMAT_CSV, ReportJob.FORMAT_EXCEL):
+        return JsonResponse({'error': 'Unsupported format'}, status=400)
+    
+    dates = {}
+    for param in ('start', 'end'):
+        value = request.GET.get(param)
+        if not value:
+            continue
+        dates[param] = parse_date(value)
+        if dates[param] is None:
+            return JsonResponse({'error': f'Invalid {param} date, expected YYYY-MM-DD'}, status=400)
+    
+    max_rows = settings.REPORT_EXPORT_MAX_ROWS
+    try:
+        row_limit = min(int(request.GET.get('limit', max_rows)), max_rows)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    
+    if request.GET.get('mode') == 'async':
+        job = ReportJob.objects.create(
+            requested_by=request.user,
+            format=format_type,
+            filters={
+                'status': status_filter,
+                'start': dates['start'].isoformat() if 'start' in dates else None,
+                'end': dates['end'].isoformat() if 'end' in dates else None,
+                'limit': row_limit,
+            }
+        )
+        return JsonResponse({
+            'job_id': job.pk,
+            'status': job.status,
+            'status_url': reverse('report_job_status', args=[job.pk]),
+            'download_url': reverse('report_job_download', args=[job.pk]),
+        }, status=202)
     
-    if status_filter != 'all':
-        services = services.filter(status=status_filter)
+    services = ReportGenerator.filter_services(
+        status=status_filter, start=dates.get('start'), end=dates.get('end'), limit=row_limit
+    )
     
     # Generate report based on format
-    if format_type == 'csv':
-        return ReportGenerator.generate_csv_report(services, f"services_report_{status_filter}.csv")
-    elif format_type == 'excel':
-        return ReportGenerator.generate_excel_report(services, f"services_report_{status_filter}.xlsx")
-    else:
-        return JsonResponse({'error': 'Unsupported format'}, status=400)
+    if format_type == ReportJob.FORMAT_CSV:
+        return ReportGenerator.stream_csv_report(
+            services, f"services_report_{status_filter}.csv", settings.REPORT_EXPORT_CHUNK_SIZE
+        )
+    return ReportGenerator.generate_excel_report(
+        services, f"services_report_{status_filter}.xlsx", settings.REPORT_EXPORT_CHUNK_SIZE
+    )
+
+
+@login_required
+@role_required([Profile.ROLE_MANAGER])
+def report_job_status(request, job_id):
+    """Poll the progress of a background report export."""
+    job = get_object_or_404(ReportJob, pk=job_id, requested_by=request.user)
+    return JsonResponse({
+        'job_id': job.pk,
+        'status': job.status,
+        'format': job.format,
+        'rows_written': job.rows_written,
+        'total_rows': job.total_rows,
+        'progress': job.progress,
+        'error': job.error or None,
+        'download_url': reverse('report_job_download', args=[job.pk]) if job.status == ReportJob.STATUS_DONE else None,
+    })
+
+
+@login_required
+@role_required([Profile.ROLE_MANAGER])
+def report_job_download(request, job_id):
+    """Download the file of a finished background report export."""
+    job = get_object_or_404(ReportJob, pk=job_id, requested_by=request.user)
+    if job.status != ReportJob.STATUS_DONE:
+        return JsonResponse({'error': f'Report is {job.get_status_display().lower()}'}, status=409)
+    if job.file is None:
+        return JsonResponse({'error': 'Report file is no longer available'}, status=410)
+    content_type = mimetypes.guess_type(job.filename)[0] or 'application/octet-stream'
+    response = StreamingHttpResponse(stored_files.iter_chunks(job.file), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{job.filename}"'
+    response['Content-Length'] = job.file.size
+    return response
+
+
+@login_required
+@role_required([Profile.ROLE_MANAGER])
+def import_service_records(request):
+    """
+    POST a CSV or JSONL file (`file`, optional `format`) of historical ServiceRecords.
+    The upload is stored in the database and queued as a RecordImport for
+    `manage.py import_service_records --queued`, which may run on another host.
+    """
+    if request.method != "POST":
+        return JsonResponse({'error': 'POST required'}, status=405)
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'Upload the records as `file`'}, status=400)
+    try:
+        format_type = record_import.format_for(upload.name, request.POST.get('format'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    job = record_import.create_import(upload.name, upload, format_type, requested_by=request.user)
+    return JsonResponse({
+        'import_id': job.pk,
+        'status': job.status,
+        'status_url': reverse('record_import_status', args=[job.pk]),
+    }, status=202)
+
+
+@login_required
+@role_required([Profile.ROLE_MANAGER])
+def record_import_status(request, import_id):
+    """Poll the progress of a ServiceRecord import."""
+    job = get_object_or_404(RecordImport, pk=import_id, requested_by=request.user)
+    return JsonResponse({
+        'import_id': job.pk,
+        'status': job.status,
+        'format': job.format,
+        'rows_read': job.rows_read,
+        'rows_inserted': job.rows_inserted,
+        'rows_rejected': job.rows_rejected,
+        'rows_per_second': job.rows_per_second,
+        'progress': round(job.progress, 1),
+        'rejections': job.rejections,
+        'error': job.error or None,
+    })
 
 
 @login_required
@@ -277,15 +600,12 @@ def mechanic_analytics(request):
 @login_required
 def analytics_redirect(request):
     """Redirect to appropriate analytics dashboard based on user role."""
-    profile = getattr(request.user, 'profile', None)
-    if not profile:
-        return redirect('home')
-    
-    if profile.role == Profile.ROLE_CUSTOMER:
+    role = get_role(request)
+    if role == Profile.ROLE_CUSTOMER:
         return redirect('customer_analytics')
-    elif profile.role == Profile.ROLE_MECHANIC:
+    elif role == Profile.ROLE_MECHANIC:
         return redirect('mechanic_analytics')
-    elif profile.role == Profile.ROLE_MANAGER:
+    elif role == Profile.ROLE_MANAGER:
         return redirect('analytics_dashboard')
     else:
         return redirect('home')
@@ -296,26 +616,76 @@ def analytics_redirect(request):
 def manage_users(request):
     """View to list and search all users for management."""
     query = request.GET.get('q', '')
-    users = User.objects.select_related('profile').all()
-    
-    if query:
-        users = users.filter(
-            Q(username__icontains=query) | 
-            Q(email__icontains=query) | 
-            Q(first_name__icontains=query) | 
-            Q(last_name__icontains=query)
-        )
-    
-    users = users.order_by('-date_joined')
+    role = request.GET.get('role', '')
+    try:
+        users = _user_list_page(request)
+    except ValueError:
+        users = keyset_page(_users_queryset(role), 'date_joined')
     
     context = {
         'users': users,
         'query': query,
+        'role': role,
         'role_choices': Profile.ROLE_CHOICES
     }
     return render(request, 'services/dashboards/manage_users.html', context)
 
 
+def _users_queryset(role=''):
+    """Users (with their profile) in an optional role, limited to the listed columns."""
+    users = User.objects.select_related('profile').only(
+        'username', 'email', 'first_name', 'last_name', 'date_joined', 'profile__role'
+    )
+    if role:
+        users = users.filter(profile__role=role)
+    return users
+
+
+def _user_list_page(request):
+    """
+    Page of the user list for ?q=, ?role=, ?cursor= and ?page_size=.
+    Searches return the best-ranked matches from the search index as a single page;
+    browsing pages newest first. Raises ValueError for a malformed cursor.
+    """
+    query = request.GET.get('q', '').strip()
+    role = request.GET.get('role', '')
+    if query:
+        matches = list(search_users(_users_queryset(), query, role=role or None))
+        return KeysetPage(matches, None, len(matches))
+    return keyset_page(
+        _users_queryset(role), 'date_joined',
+        cursor=request.GET.get('cursor'),
+        page_size=page_size_from(request.GET.get('page_size'))
+    )
+
+
+@login_required
+@role_required([Profile.ROLE_MANAGER])
+def users_api(request):
+    """JSON page of users with the same ?q= search and ?role= filter as manage_users."""
+    try:
+        page = _user_list_page(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    results = []
+    for user in page:
+        profile = getattr(user, 'profile', None)
+        results.append({
+            'id': user.pk,
+            'username': user.username,
+            'full_name': user.get_full_name(),
+            'email': user.email,
+            'role': profile.role if profile else None,
+            'role_display': profile.get_role_display() if profile else None,
+            'date_joined': user.date_joined,
+        })
+    return JsonResponse(
+        {'results': results, 'next_cursor': page.next_cursor, 'page_size': page.page_size},
+        encoder=DjangoJSONEncoder
+    )
+
+
 @login_required
 @role_required([Profile.ROLE_MANAGER])
 def update_user_role(request):
@@ -336,4 +706,4 @@ def update_user_role(request):
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
             
-    return JsonResponse({'status': 'error', 'message': 'Invalid request'}, status=400)
\ No newline at end of file
+    return JsonResponse({'status': 'error', 'message': 'Invalid request'}, status=400)
@@ -46,6 +46,7 @@ if not DEBUG:
     INSTALLED_APPS.insert(6, 'whitenoise.runserver_nostatic')
 
 MIDDLEWARE = [
+    'services.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,7 +57,7 @@ MIDDLEWARE = [
 ]
 
 if not DEBUG:
-    MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1, 'whitenoise.middleware.WhiteNoiseMiddleware')
 
 ROOT_URLCONF = 'vehicle_service_analytics.urls'
 
@@ -95,6 +96,9 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # A file rather than the shared in-memory database, so threads in the
+            # concurrency tests wait for locks as they do against db.sqlite3
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
         }
     }
 
@@ -145,6 +149,55 @@ if not DEBUG:
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Session users are loaded together with their Profile in one query. ModelBackend stays
+# listed so sessions created before ProfileModelBackend (which store its path) remain valid.
+AUTHENTICATION_BACKENDS = [
+    'services.backends.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 #This tells Django where to redirect after login/logout.
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
+
+# Report exports stream rows from the database in chunks; cap the rows per export.
+REPORT_EXPORT_MAX_ROWS = int(os.environ.get('REPORT_EXPORT_MAX_ROWS', 1000000))
+REPORT_EXPORT_CHUNK_SIZE = int(os.environ.get('REPORT_EXPORT_CHUNK_SIZE', 2000))
+
+# Background jobs (report exports, record imports) hold a lease renewed by their
+# progress writes; a running job silent for this long is requeued, and failed after
+# this many claims.
+BACKGROUND_JOB_LEASE_SECONDS = int(os.environ.get('BACKGROUND_JOB_LEASE_SECONDS', 300))
+BACKGROUND_JOB_MAX_ATTEMPTS = int(os.environ.get('BACKGROUND_JOB_MAX_ATTEMPTS', 3))
+
+# ServiceRecord imports insert and checkpoint this many rows per transaction.
+RECORD_IMPORT_CHUNK_SIZE = int(os.environ.get('RECORD_IMPORT_CHUNK_SIZE', 2000))
+
+# Cache used by the analytics API response cache and customer dashboard snapshots.
+# Both are keyed on versions held in the database, so any backend works; a backend
+# shared by the web workers (file-based, database or Redis, via CACHE_BACKEND and
+# CACHE_LOCATION) also shares the cached entries between them.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'vehicle-service-analytics'),
+    }
+}
+ANALYTICS_CACHE_TIMEOUT = int(os.environ.get('ANALYTICS_CACHE_TIMEOUT', 3600))
+# Customer dashboard snapshots are invalidated by signals; the timeout only bounds
+# how long the global cost estimate inside them may lag.
+CUSTOMER_SNAPSHOT_TIMEOUT = int(os.environ.get('CUSTOMER_SNAPSHOT_TIMEOUT', 3600))
+
+# Optional columnar (numpy, memory-mapped) snapshot of the Service table used by
+# ServiceAnalytics instead of the database. Point it at a directory on local disk
+# shared by the workers of one host; leave empty to disable.
+ANALYTICS_SNAPSHOT_DIR = os.environ.get('ANALYTICS_SNAPSHOT_DIR', '')
+ANALYTICS_SNAPSHOT_REFRESH_SECONDS = int(os.environ.get('ANALYTICS_SNAPSHOT_REFRESH_SECONDS', 30))
+# Re-read rows updated this many seconds before the watermark, for transactions committing late
+ANALYTICS_SNAPSHOT_LAG = int(os.environ.get('ANALYTICS_SNAPSHOT_LAG', 60))
+
+# Per-request query counting, Server-Timing headers and /metrics (Prometheus text format).
+# A request repeating one SQL template this many times is logged as a possible N+1.
+QUERY_INSTRUMENTATION_ENABLED = os.environ.get('QUERY_INSTRUMENTATION_ENABLED', 'True').lower() == 'true'
+QUERY_N_PLUS_ONE_THRESHOLD = int(os.environ.get('QUERY_N_PLUS_ONE_THRESHOLD', 10))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')